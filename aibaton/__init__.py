@@ -1,15 +1,136 @@
-from .process import start_process, ProcessHandle, ProcessResult
-from .runner import run, set_default, AgentRes
+"""
+aibaton: run codex/claude agent CLIs from Python.
+
+Subsystems are imported on first attribute access (PEP 562), so `import
+aibaton` and the `aibaton` command stay fast; `from aibaton import run`
+works as before.
+"""
+
+import importlib
+from typing import TYPE_CHECKING, Any, Dict, List
+
+# eager: these names shadow the aibaton.logger / aibaton.replay /
+# aibaton.checkpoint submodules, which would otherwise replace them once imported
 from .logger import setup_logger, logger, add_console_handler
+from .replay import load_run, replay, EventLog
+from .checkpoint import step, checkpoint, use_checkpoints
+
+if TYPE_CHECKING:
+    from .process import start_process, start_pipeline, ProcessHandle, ProcessResult
+    from .reactor import ProcessManager, get_process_manager
+    from .proctree import ResourceLimits
+    from .runner import run, set_default, AgentRes
+    from .storage import flush_storage
+    from .workflow import Workflow
+    from .files import map_files, scan_files
+    from .routing import RoutePolicy
+    from .context_index import ContextIndex
+    from .prompts import PromptTemplate
+    from .tracing import enable_tracing, disable_tracing, flush_tracing, span
+    from .metrics import enable_metrics, disable_metrics, render_metrics
+    from .hooks import on_event, on_tool_call, on_text, on_done, remove_hook
+    from .worktree import WorktreePool, get_worktree_pool
+    from .scheduler import set_rate_limit, get_scheduler, RateLimit, PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BULK
+
+_LAZY: Dict[str, str] = {
+    "start_process": ".process",
+    "start_pipeline": ".process",
+    "ProcessHandle": ".process",
+    "ProcessResult": ".process",
+    "ProcessManager": ".reactor",
+    "get_process_manager": ".reactor",
+    "ResourceLimits": ".proctree",
+    "run": ".runner",
+    "set_default": ".runner",
+    "AgentRes": ".runner",
+    "flush_storage": ".storage",
+    "Workflow": ".workflow",
+    "map_files": ".files",
+    "scan_files": ".files",
+    "RoutePolicy": ".routing",
+    "ContextIndex": ".context_index",
+    "PromptTemplate": ".prompts",
+    "enable_tracing": ".tracing",
+    "disable_tracing": ".tracing",
+    "flush_tracing": ".tracing",
+    "span": ".tracing",
+    "enable_metrics": ".metrics",
+    "disable_metrics": ".metrics",
+    "render_metrics": ".metrics",
+    "on_event": ".hooks",
+    "on_tool_call": ".hooks",
+    "on_text": ".hooks",
+    "on_done": ".hooks",
+    "remove_hook": ".hooks",
+    "WorktreePool": ".worktree",
+    "get_worktree_pool": ".worktree",
+    "set_rate_limit": ".scheduler",
+    "get_scheduler": ".scheduler",
+    "RateLimit": ".scheduler",
+    "PRIORITY_INTERACTIVE": ".scheduler",
+    "PRIORITY_NORMAL": ".scheduler",
+    "PRIORITY_BULK": ".scheduler",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY))
+
 
 __all__ = [
     "run",
     "set_default",
     "AgentRes",
     "start_process",
+    "start_pipeline",
     "ProcessHandle",
     "ProcessResult",
+    "ProcessManager",
+    "get_process_manager",
+    "ResourceLimits",
     "setup_logger",
     "logger",
     "add_console_handler",
+    "flush_storage",
+    "load_run",
+    "replay",
+    "EventLog",
+    "step",
+    "checkpoint",
+    "use_checkpoints",
+    "Workflow",
+    "map_files",
+    "scan_files",
+    "RoutePolicy",
+    "ContextIndex",
+    "PromptTemplate",
+    "enable_tracing",
+    "disable_tracing",
+    "flush_tracing",
+    "span",
+    "enable_metrics",
+    "disable_metrics",
+    "render_metrics",
+    "on_event",
+    "on_tool_call",
+    "on_text",
+    "on_done",
+    "remove_hook",
+    "WorktreePool",
+    "get_worktree_pool",
+    "set_rate_limit",
+    "get_scheduler",
+    "RateLimit",
+    "PRIORITY_INTERACTIVE",
+    "PRIORITY_NORMAL",
+    "PRIORITY_BULK",
 ]
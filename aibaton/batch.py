@@ -0,0 +1,113 @@
+"""
+Batch runs from a JSONL prompts file, behind `aibaton batch`.
+
+Each input line is a JSON object with a "prompt" plus optional run() options,
+or a bare JSON string:
+
+    {"id": "orders", "prompt": "Integrate the orders API", "provider": "claude", "timeout_s": 900}
+    "Summarize docs/help.md"
+
+`run_batch()` runs up to `parallel` prompts at a time in this process, so the
+whole batch shares one scheduler (rate limits), session and storage writer,
+and writes one JSON line per finished prompt as soon as it completes:
+
+    {"index": 0, "id": "orders", "status": "success", "text": "...", "artifacts": {"run_id": ...}, ...}
+
+Input is read lazily and at most 2 * parallel prompts are in flight, so a
+file with millions of lines doesn't sit in memory.
+"""
+
+import concurrent.futures
+import json
+from typing import IO, Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from .logger import logger
+from .runner import run
+from .storage import flush_storage
+from .tracing import bind, span
+
+# per-line keys passed through to run()
+RUN_KEYS = ("provider", "model", "cwd", "add_dirs", "timeout_s", "loop_max", "json_mode",
+            "dangerous_permissions", "options", "priority", "group", "template")
+
+
+def _parse_row(line: str) -> Dict[str, Any]:
+    try:
+        row = json.loads(line)
+    except ValueError as e:
+        return {"error": f"invalid JSON: {e}"}
+    if isinstance(row, str):
+        return {"prompt": row}
+    if not isinstance(row, dict):
+        return {"error": "expected an object or a string"}
+    if not isinstance(row.get("prompt"), str):
+        return dict(row, error='missing "prompt"')
+    unknown = sorted(set(row) - set(RUN_KEYS) - {"prompt", "id"})
+    if unknown:
+        return dict(row, error=f"unknown keys: {', '.join(unknown)}")
+    return row
+
+
+def read_prompts(lines: Iterable[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(index, row) per non-empty line; a bad line yields a row with an "error"."""
+    index = 0
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield index, _parse_row(line)
+            index += 1
+
+
+def _run_row(row: Dict[str, Any], defaults: Dict[str, Any]) -> Dict[str, Any]:
+    kwargs = dict(defaults)
+    kwargs.update({k: row[k] for k in RUN_KEYS if k in row})
+    kwargs.setdefault("stream", False)
+    try:
+        res = run(row["prompt"], **kwargs)
+    except Exception as e:
+        logger.exception("batch prompt failed: id=%s", row.get("id"))
+        return {"status": "exception", "error": f"{type(e).__name__}: {e}"}
+    return res.to_dict()
+
+
+def run_batch(
+    lines: Iterable[str],
+    out: IO[str],
+    parallel: int = 4,
+    defaults: Optional[Dict[str, Any]] = None,
+) -> Dict[str, int]:
+    """Run every prompt in lines, writing a JSON result line to out as each finishes; returns status counts."""
+    defaults = dict(defaults or {})
+    counts: Dict[str, int] = {}
+    window = max(1, parallel) * 2
+    pending: Dict[concurrent.futures.Future, Tuple[int, Dict[str, Any]]] = {}
+
+    def emit(index: int, row: Dict[str, Any], result: Dict[str, Any]) -> None:
+        line: Dict[str, Any] = {"index": index}
+        if "id" in row:
+            line["id"] = row["id"]
+        line.update(result)
+        out.write(json.dumps(line, ensure_ascii=False, default=str) + "\n")
+        out.flush()
+        status = result.get("status") or "error"
+        counts[status] = counts.get(status, 0) + 1
+
+    def drain(block_until: int) -> None:
+        while len(pending) > block_until:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for fut in done:
+                index, row = pending.pop(fut)
+                emit(index, row, fut.result())
+
+    with span("batch", parallel=parallel), \
+            concurrent.futures.ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+        for index, row in read_prompts(lines):
+            if "error" in row:
+                emit(index, row, {"status": "invalid", "error": row["error"]})
+                continue
+            pending[pool.submit(bind(_run_row), row, defaults)] = (index, row)
+            drain(window - 1)
+        drain(0)
+    flush_storage()
+    logger.info("batch done: %s", counts)
+    return counts
@@ -0,0 +1,239 @@
+"""
+Durable step checkpoints for linear workflow scripts.
+
+Each checkpointed step is recorded in order under the workspace directory
+(`~/.aibaton/workspaces/<id>/checkpoints/<workflow>.json`). On restart, steps are
+matched against the record in the same order: while name and inputs are
+unchanged the recorded result is returned without running anything; the first
+mismatch or missing step discards the rest of the record and execution resumes
+live from there. Inputs must be JSON-serializable; results of earlier steps
+passed as inputs are keyed by their run id, status and text, so a restored
+result matches the live one.
+
+    @checkpoint("implement")
+    def implement(section):
+        return run(run_plan_step.format(section=section))
+
+    with step("plan") as st:
+        if not st.done:
+            st.result = run(plan_prompt)
+    plan = st.result
+"""
+
+import dataclasses
+import functools
+import hashlib
+import json
+import os
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .logger import logger
+from .process import ProcessResult
+from .session import _workspace_dir
+from .storage import flush_storage
+from .utils import ensure_dir, now_ms, write_json_atomic
+
+_MISSING = object()
+
+
+def _input_key(value: Any) -> Any:
+    # results chained into later steps: only what survives a restart, not
+    # the live events/option of this process
+    from .runner import AgentRes
+
+    if isinstance(value, AgentRes):
+        return {"agent": (value.artifacts or {}).get("run_id"), "status": value.status, "text": value.text}
+    if isinstance(value, ProcessResult):
+        return {"process": value.cmd, "status": value.status, "returncode": value.returncode,
+                "stdout": value.stdout, "stderr": value.stderr}
+    raise TypeError(f"checkpoint input of type {type(value).__name__} is not JSON serializable")
+
+
+def _hash_inputs(inputs: Any) -> str:
+    data = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=_input_key)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def _encode_result(value: Any) -> Optional[Dict[str, Any]]:
+    from .runner import AgentRes
+
+    if isinstance(value, AgentRes):
+        return {"kind": "agent", "value": value.to_dict()}
+    if isinstance(value, ProcessResult):
+        return {"kind": "process", "value": dataclasses.asdict(value)}
+    try:
+        json.dumps(value)
+    except (TypeError, ValueError):
+        return None
+    return {"kind": "value", "value": value}
+
+
+def _decode_result(data: Dict[str, Any]) -> Any:
+    from .runner import AgentRes
+
+    kind = data.get("kind")
+    if kind == "agent":
+        return AgentRes.from_dict(data["value"])
+    if kind == "process":
+        return ProcessResult(**data["value"])
+    return data.get("value")
+
+
+def _default_workflow_name() -> str:
+    script = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else ""
+    name = os.path.splitext(script)[0]
+    return name if name and name != "-c" else "default"
+
+
+class Checkpointer:
+    def __init__(self, name: Optional[str] = None, cwd: Optional[str] = None) -> None:
+        if cwd is None:
+            from . import runner
+
+            cwd = runner._DEFAULT_CWD or os.getcwd()
+        self.name = name or _default_workflow_name()
+        ckpt_dir = os.path.join(_workspace_dir(os.path.abspath(cwd)), "checkpoints")
+        ensure_dir(ckpt_dir)
+        self.path = os.path.join(ckpt_dir, f"{self.name}.json")
+        self._lock = threading.Lock()
+        self._records: List[Dict[str, Any]] = self._load()
+        self._cursor = 0
+        self._replaying = True
+
+    def _load(self) -> List[Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        steps = data.get("steps") if isinstance(data, dict) else None
+        return steps if isinstance(steps, list) else []
+
+    def _save(self) -> None:
+        # run artifacts referenced by the record must be on disk before it is
+        flush_storage()
+        write_json_atomic(self.path, {"workflow": self.name, "updated_at": now_ms(), "steps": self._records})
+
+    def lookup(self, name: str, inputs_hash: str) -> Tuple[int, Any]:
+        """Claim the next step slot; returns (slot, recorded result or _MISSING)."""
+        with self._lock:
+            slot = self._cursor
+            self._cursor += 1
+            if self._replaying and slot < len(self._records):
+                rec = self._records[slot]
+                if rec.get("name") == name and rec.get("inputs") == inputs_hash:
+                    logger.info("checkpoint hit: %s #%d", name, slot)
+                    return slot, _decode_result(rec.get("result") or {})
+            if self._replaying:
+                if slot < len(self._records):
+                    logger.info("checkpoint resume at: %s #%d", name, slot)
+                self._replaying = False
+                del self._records[slot:]
+                self._save()
+            return slot, _MISSING
+
+    def record(self, slot: int, name: str, inputs_hash: str, value: Any) -> None:
+        from .runner import AgentRes
+
+        if isinstance(value, AgentRes) and value.status != "success":
+            logger.debug("checkpoint not recorded: %s status=%s", name, value.status)
+            return
+        encoded = _encode_result(value)
+        if encoded is None:
+            logger.warning("checkpoint result not serializable: %s", name)
+            return
+        with self._lock:
+            if slot != len(self._records):
+                # an earlier step failed to record; later ones cannot be replayed in order
+                return
+            self._records.append({"name": name, "inputs": inputs_hash, "result": encoded, "ts": now_ms()})
+            self._save()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._records = []
+            self._cursor = 0
+            self._replaying = False
+            self._save()
+
+    def step(self, name: str, **inputs: Any) -> "Step":
+        return Step(self, name, inputs)
+
+    def checkpoint(self, name: Optional[str] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+            step_name = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                inputs_hash = _hash_inputs({"args": args, "kwargs": kwargs})
+                slot, value = self.lookup(step_name, inputs_hash)
+                if value is not _MISSING:
+                    return value
+                value = fn(*args, **kwargs)
+                self.record(slot, step_name, inputs_hash, value)
+                return value
+
+            return wrapper
+
+        return decorator
+
+
+class Step:
+    def __init__(self, owner: Checkpointer, name: str, inputs: Dict[str, Any]) -> None:
+        self.name = name
+        self.done = False
+        self.result: Any = None
+        self._owner = owner
+        self._inputs_hash = _hash_inputs(inputs)
+        self._slot = -1
+
+    def __enter__(self) -> "Step":
+        self._slot, value = self._owner.lookup(self.name, self._inputs_hash)
+        if value is not _MISSING:
+            self.done = True
+            self.result = value
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None and not self.done:
+            self._owner.record(self._slot, self.name, self._inputs_hash, self.result)
+        return False
+
+
+_default: Optional[Checkpointer] = None
+_default_lock = threading.Lock()
+
+
+def get_checkpointer() -> Checkpointer:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Checkpointer()
+        return _default
+
+
+def use_checkpoints(name: Optional[str] = None, cwd: Optional[str] = None, reset: bool = False) -> Checkpointer:
+    """Select the workflow record used by step()/checkpoint(); reset=True starts over."""
+    global _default
+    with _default_lock:
+        _default = Checkpointer(name, cwd)
+    if reset:
+        _default.reset()
+    return _default
+
+
+def step(name: str, **inputs: Any) -> Step:
+    return get_checkpointer().step(name, **inputs)
+
+
+def checkpoint(name: Optional[str] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return get_checkpointer().checkpoint(name or fn.__name__)(fn)(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
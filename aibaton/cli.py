@@ -0,0 +1,279 @@
+"""
+Command line entry point: `aibaton <command>` or `python -m aibaton <command>`.
+
+    aibaton run "PROMPT" [--provider codex] [--cwd DIR] [--json]     (prompt "-" reads stdin)
+    aibaton batch prompts.jsonl [--parallel 8] [--provider codex] [--output results.jsonl]
+    aibaton runs ls [--cwd DIR | --all] [-n 20] [--json]
+    aibaton runs show RUN_ID [--json | --events]
+    aibaton serve [--socket PATH] [--workers N] [--limit codex:4:20:400000] [--log FILE]
+                  [--metrics-port 9464] [--metrics-file PATH]
+    aibaton stop
+    AIBATON_CLUSTER_TOKEN=... aibaton coordinator [--host 0.0.0.0] [--port 8765]   (token required off loopback)
+    aibaton worker --url http://coord:8765 [--capacity 2] [--providers codex,claude] [--metrics-port 9464]
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+from .logger import setup_logger
+
+
+def _parse_limit(spec: str):
+    # PROVIDER:CONCURRENT[:RUNS_PER_MIN[:TOKENS_PER_MIN]], empty fields mean unlimited
+    parts = spec.split(":")
+    if len(parts) < 2 or len(parts) > 4 or not parts[0]:
+        raise argparse.ArgumentTypeError(f"bad limit: {spec}")
+    try:
+        nums = [float(p) if p else None for p in parts[1:]] + [None] * (4 - len(parts))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad limit: {spec}")
+    concurrent = int(nums[0]) if nums[0] is not None else None
+    return parts[0], concurrent, nums[1], nums[2]
+
+
+def _add_metrics_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on 127.0.0.1:PORT/metrics")
+    p.add_argument("--metrics-file", help="rewrite Prometheus metrics to this file periodically")
+
+
+def _enable_metrics(args: argparse.Namespace) -> None:
+    if args.metrics_port is None and not args.metrics_file:
+        return
+    from .metrics import enable_metrics
+
+    enable_metrics(port=args.metrics_port, path=args.metrics_file)
+
+
+def _cmd_serve(args: argparse.Namespace) -> int:
+    from .daemon import DaemonError, serve
+    from .scheduler import set_rate_limit
+
+    setup_logger(args.log, level=args.level)
+    _enable_metrics(args)
+    for provider, concurrent, rpm, tpm in args.limit:
+        set_rate_limit(provider, runs_per_min=rpm, concurrent=concurrent, tokens_per_min=tpm)
+    try:
+        serve(args.socket, max_workers=args.workers)
+    except DaemonError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+def _cmd_stop(args: argparse.Namespace) -> int:
+    from .daemon import DaemonClient, DaemonError
+
+    try:
+        DaemonClient(args.socket).shutdown()
+    except (OSError, DaemonError) as e:
+        print(f"no daemon running: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def _cmd_coordinator(args: argparse.Namespace) -> int:
+    from .cluster import ClusterError, serve_coordinator
+
+    setup_logger(args.log, level=args.level)
+    try:
+        serve_coordinator(args.host, args.port, worker_ttl_s=args.worker_ttl)
+    except ClusterError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+def _cmd_worker(args: argparse.Namespace) -> int:
+    from .cluster import serve_worker
+
+    setup_logger(args.log, level=args.level)
+    _enable_metrics(args)
+    providers = [p for p in args.providers.split(",") if p]
+    serve_worker(args.url, name=args.name, capacity=args.capacity, providers=providers)
+    return 0
+
+
+def _add_run_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--provider", help="codex, claude or fake (default: set_default / codex)")
+    p.add_argument("--model")
+    p.add_argument("--cwd", help="working directory of the agent (default: current directory)")
+    p.add_argument("--timeout", type=int, dest="timeout_s", help="seconds before a run is killed")
+    p.add_argument("--loop-max", type=int, default=1, help="iterations until <promise>DONE</promise>")
+    p.add_argument("--dangerous", action="store_true", default=None, dest="dangerous_permissions",
+                   help="bypass the agent's approvals and sandbox")
+    p.add_argument("--log", help="log file")
+    p.add_argument("--level", default="INFO")
+
+
+def _run_defaults(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.log:
+        # stdout carries the results, so logs only go to the file
+        setup_logger(args.log, level=args.level, console=False)
+    keys = ("provider", "model", "cwd", "timeout_s", "loop_max", "dangerous_permissions")
+    return {k: getattr(args, k) for k in keys if getattr(args, k) is not None}
+
+
+def _cmd_run(args: argparse.Namespace) -> int:
+    from .runner import run
+
+    prompt = sys.stdin.read() if args.prompt == "-" else args.prompt
+    res = run(prompt, stream=not args.json, **_run_defaults(args))
+    if args.json:
+        print(json.dumps(res.to_dict(), ensure_ascii=False, default=str))
+    return 0 if res.status == "success" else 1
+
+
+def _cmd_batch(args: argparse.Namespace) -> int:
+    from .batch import run_batch
+    from .scheduler import set_rate_limit
+
+    defaults = _run_defaults(args)
+    if not args.daemon:
+        # one process-wide scheduler and storage writer for the whole batch
+        os.environ["AIBATON_NO_DAEMON"] = "1"
+    for provider, concurrent, rpm, tpm in args.limit:
+        set_rate_limit(provider, runs_per_min=rpm, concurrent=concurrent, tokens_per_min=tpm)
+    src = sys.stdin if args.prompts == "-" else open(args.prompts, encoding="utf-8")
+    out = sys.stdout if not args.output else open(args.output, "a", encoding="utf-8")
+    try:
+        counts = run_batch(src, out, parallel=args.parallel, defaults=defaults)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
+    print("batch: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())), file=sys.stderr)
+    return 0 if set(counts) <= {"success"} else 1
+
+
+def _cmd_runs_ls(args: argparse.Namespace) -> int:
+    from .replay import _read_summary
+    from .session import list_run_dirs
+
+    run_dirs = list_run_dirs(None if args.all else os.path.abspath(args.cwd or os.getcwd()))
+    for run_dir in run_dirs[:args.n]:
+        summary = _read_summary(run_dir)
+        run_id = summary.get("run_id") or os.path.basename(run_dir)
+        prompt = " ".join(str(summary.get("prompt") or "").split())
+        if args.json:
+            row = {k: summary.get(k) for k in ("provider", "model", "status", "elapsed_ms", "cwd", "usage")}
+            print(json.dumps(dict(row, run_id=run_id, run_dir=run_dir, prompt=prompt[:200]), ensure_ascii=False))
+        else:
+            elapsed = f"{int(summary.get('elapsed_ms') or 0) / 1000:.1f}s"
+            print(f"{run_id:28s} {str(summary.get('status') or '?'):9s} {str(summary.get('provider') or '?'):7s} "
+                  f"{elapsed:>8s}  {prompt[:60]}")
+    return 0
+
+
+def _cmd_runs_show(args: argparse.Namespace) -> int:
+    from .replay import _read_summary, _resolve_run_dir
+
+    try:
+        run_dir = _resolve_run_dir(args.run, args.cwd or os.getcwd())
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.events:
+        with open(os.path.join(run_dir, "events.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                sys.stdout.write(line)
+        return 0
+    summary = _read_summary(run_dir)
+    text = ""
+    out_path = os.path.join(run_dir, "output.txt")
+    if os.path.exists(out_path):
+        with open(out_path, encoding="utf-8") as f:
+            text = f.read()
+    if args.json:
+        print(json.dumps(dict(summary, run_dir=run_dir, text=text), ensure_ascii=False))
+        return 0
+    for key in ("run_id", "status", "provider", "model", "elapsed_ms", "cwd", "usage", "template"):
+        if summary.get(key) is not None:
+            print(f"{key}: {summary[key]}")
+    print(f"run_dir: {run_dir}")
+    print(f"prompt:\n{summary.get('prompt') or ''}\n")
+    print(f"output:\n{text}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="aibaton")
+    sub = parser.add_subparsers(dest="command")
+    sub.required = True
+
+    p = sub.add_parser("serve", help="run the local job daemon")
+    p.add_argument("--socket", help="unix socket path (default ~/.aibaton/daemon.sock)")
+    p.add_argument("--workers", type=int, default=8, help="jobs executed concurrently")
+    p.add_argument("--limit", type=_parse_limit, action="append", default=[],
+                   help="PROVIDER:CONCURRENT[:RUNS_PER_MIN[:TOKENS_PER_MIN]], repeatable")
+    p.add_argument("--log", help="log file")
+    p.add_argument("--level", default="INFO")
+    _add_metrics_args(p)
+    p.set_defaults(func=_cmd_serve)
+
+    p = sub.add_parser("stop", help="stop the local job daemon")
+    p.add_argument("--socket")
+    p.set_defaults(func=_cmd_stop)
+
+    p = sub.add_parser("coordinator", help="serve the job queue for remote workers")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--worker-ttl", type=float, default=30.0, help="seconds before a silent worker's jobs are requeued")
+    p.add_argument("--log", help="log file")
+    p.add_argument("--level", default="INFO")
+    p.set_defaults(func=_cmd_coordinator)
+
+    p = sub.add_parser("worker", help="pull and run jobs from a coordinator")
+    p.add_argument("--url", required=True, help="coordinator url, e.g. http://host:8765")
+    p.add_argument("--name", help="worker name (default host-pid)")
+    p.add_argument("--capacity", type=int, default=1, help="jobs run concurrently")
+    p.add_argument("--providers", default="codex", help="comma separated providers installed here")
+    p.add_argument("--log", help="log file")
+    p.add_argument("--level", default="INFO")
+    _add_metrics_args(p)
+    p.set_defaults(func=_cmd_worker)
+
+    p = sub.add_parser("run", help="run one prompt")
+    p.add_argument("prompt", help='prompt text, "-" reads it from stdin')
+    p.add_argument("--json", action="store_true", help="print the result as JSON instead of streaming text")
+    _add_run_args(p)
+    p.set_defaults(func=_cmd_run)
+
+    p = sub.add_parser("batch", help="run prompts from a JSONL file, results as JSONL")
+    p.add_argument("prompts", help='JSONL file of {"prompt": ..., "id": ..., run options} or strings, "-" for stdin')
+    p.add_argument("--parallel", type=int, default=4, help="prompts run concurrently")
+    p.add_argument("--output", help="append results to this file instead of stdout")
+    p.add_argument("--limit", type=_parse_limit, action="append", default=[],
+                   help="PROVIDER:CONCURRENT[:RUNS_PER_MIN[:TOKENS_PER_MIN]], repeatable")
+    p.add_argument("--daemon", action="store_true", help="submit runs to a running `aibaton serve` daemon")
+    _add_run_args(p)
+    p.set_defaults(func=_cmd_batch)
+
+    p = sub.add_parser("runs", help="inspect stored runs")
+    runs_sub = p.add_subparsers(dest="runs_command")
+    runs_sub.required = True
+    q = runs_sub.add_parser("ls", help="list runs, newest first")
+    q.add_argument("--cwd", help="workspace to list (default: current directory)")
+    q.add_argument("--all", action="store_true", help="list runs of every workspace")
+    q.add_argument("-n", type=int, default=20, help="number of runs shown")
+    q.add_argument("--json", action="store_true", help="one JSON object per line")
+    q.set_defaults(func=_cmd_runs_ls)
+    q = runs_sub.add_parser("show", help="show a run's summary and output")
+    q.add_argument("run", help="run_id or run directory")
+    q.add_argument("--cwd", help="workspace searched first")
+    q.add_argument("--json", action="store_true", help="run.json plus the output text as one JSON object")
+    q.add_argument("--events", action="store_true", help="print the raw events.jsonl")
+    q.set_defaults(func=_cmd_runs_show)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,569 @@
+"""
+Coordinator/worker mode for spreading runs over several machines.
+
+The coordinator is a small HTTP/JSON server holding the job queue and the run
+storage. Workers register with their capacity and providers, long-poll for
+jobs, stream events back while the job runs and upload the run's files when it
+finishes. Everything is stdlib; set AIBATON_CLUSTER_TOKEN on both sides to
+require a shared bearer token. Workers execute whatever the coordinator hands
+them, so it only listens beyond loopback when a token is set.
+
+    aibaton coordinator --port 8765
+    aibaton worker --url http://coord:8765 --capacity 2 --providers codex,claude
+
+    client = ClusterClient("http://coord:8765")
+    res = client.run("fix the flaky test", provider="codex",
+                     repo={"url": "git@host:org/repo.git", "ref": "main"})
+
+A job with `repo` runs in a detached worktree of the worker's clone at `ref`;
+the resulting diff is uploaded as `changes.patch` into the run directory.
+Jobs of a worker that stops polling for `worker_ttl_s` are queued again; the
+lost attempt's events are moved to `events.attempt<n>.jsonl` when the next
+attempt reports, so `events.jsonl` only holds the attempt that produced the result.
+"""
+
+import dataclasses
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
+
+from .logger import logger
+from .process import ProcessResult, start_process
+from .proctree import ResourceLimits
+from .session import _agent_root
+from .storage import flush_storage
+from .utils import ensure_dir, now_ms
+
+if TYPE_CHECKING:
+    from .runner import AgentRes
+
+TOKEN_ENV = "AIBATON_CLUSTER_TOKEN"
+
+# run files a worker uploads; events.jsonl is streamed separately
+_UPLOAD_FILES = ("run.json", "output.txt")
+
+
+class ClusterError(RuntimeError):
+    pass
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _append_events(run_dir: str, events: List[Dict[str, Any]]) -> None:
+    with open(os.path.join(run_dir, "events.jsonl"), "a", encoding="utf-8") as f:
+        for ev in events:
+            f.write(json.dumps(ev, ensure_ascii=False) + "\n")
+
+
+def _rotate_events(run_dir: str, attempt: int) -> None:
+    try:
+        os.replace(os.path.join(run_dir, "events.jsonl"), os.path.join(run_dir, f"events.attempt{attempt}.jsonl"))
+    except FileNotFoundError:
+        pass
+
+
+class Coordinator:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        root: Optional[str] = None,
+        token: Optional[str] = None,
+        worker_ttl_s: float = 30.0,
+    ) -> None:
+        self.root = root or os.path.join(_agent_root(), "cluster")
+        self.runs_dir = os.path.join(self.root, "runs")
+        ensure_dir(self.runs_dir)
+        self.token = token if token is not None else os.environ.get(TOKEN_ENV)
+        if not self.token and not _is_loopback(host):
+            raise ClusterError(f"refusing to listen on {host or 'all interfaces'} without {TOKEN_ENV}: "
+                               "workers run any job the coordinator accepts")
+        self.worker_ttl_s = worker_ttl_s
+        self._cond = threading.Condition()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._queue: List[str] = []
+        self._workers: Dict[str, Dict[str, Any]] = {}
+        self._seq = 0
+        # events.jsonl I/O runs outside _cond; job id -> attempt whose events the file holds
+        self._events_lock = threading.Lock()
+        self._events_attempt: Dict[str, int] = {}
+        self._server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "Coordinator":
+        """Serve on a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="aibaton-coordinator", daemon=True)
+        self._thread.start()
+        logger.info("coordinator listening: %s", self.url)
+        return self
+
+    def serve_forever(self) -> None:
+        logger.info("coordinator listening: %s", self.url)
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("coordinator interrupted")
+        finally:
+            self._server.server_close()
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        with self._cond:
+            self._cond.notify_all()
+
+    # ---- jobs ----
+
+    def submit(self, kind: str, args: Dict[str, Any]) -> str:
+        if kind not in ("run", "process"):
+            raise ClusterError(f"unknown job kind: {kind}")
+        with self._cond:
+            self._seq += 1
+            job_id = f"{now_ms()}_{self._seq}"
+            run_dir = os.path.join(self.runs_dir, job_id)
+            ensure_dir(run_dir)
+            self._jobs[job_id] = {
+                "id": job_id, "kind": kind, "args": args, "status": "queued",
+                "provider": args.get("provider") if kind == "run" else None,
+                "worker": None, "created_at": now_ms(), "run_dir": run_dir, "attempt": 0,
+            }
+            self._queue.append(job_id)
+            self._cond.notify_all()
+        logger.debug("coordinator: job queued id=%s kind=%s", job_id, kind)
+        return job_id
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise ClusterError(f"unknown job: {job_id}")
+            while job["status"] in ("queued", "running"):
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    break
+                self._cond.wait(left)
+            return dict(job)
+
+    def workers(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            return [dict(w, running=sorted(w["running"])) for w in self._workers.values()]
+
+    def _reap_workers(self) -> None:
+        # caller holds the lock
+        now = time.monotonic()
+        for wid, w in list(self._workers.items()):
+            if now - w["last_seen"] <= self.worker_ttl_s:
+                continue
+            logger.warning("coordinator: worker lost %s, requeue %d jobs", w["name"], len(w["running"]))
+            for job_id in w["running"]:
+                job = self._jobs[job_id]
+                job["status"] = "queued"
+                job["worker"] = None
+                self._queue.insert(0, job_id)
+            del self._workers[wid]
+            self._cond.notify_all()
+
+    def _register(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self._cond:
+            self._seq += 1
+            wid = f"w{self._seq}"
+            self._workers[wid] = {
+                "id": wid,
+                "name": body.get("name") or wid,
+                "capacity": max(1, int(body.get("capacity") or 1)),
+                "providers": list(body.get("providers") or []),
+                "running": set(),
+                "last_seen": time.monotonic(),
+            }
+        logger.info("coordinator: worker registered %s %s", wid, body.get("name"))
+        return {"worker_id": wid}
+
+    def _match(self, worker: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        for job_id in self._queue:
+            job = self._jobs[job_id]
+            if job["provider"] is None or job["provider"] in worker["providers"]:
+                self._queue.remove(job_id)
+                return job
+        return None
+
+    def _poll(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        # only hands out work while the worker is under capacity; the long poll
+        # doubles as its heartbeat when all of its slots are busy
+        wait_s = min(float(body.get("wait") or 0), 30.0)
+        deadline = time.monotonic() + wait_s
+        with self._cond:
+            while True:
+                worker = self._workers.get(body.get("worker_id"))
+                if worker is None:
+                    raise ClusterError("unknown worker, register again")
+                worker["last_seen"] = time.monotonic()
+                self._reap_workers()
+                job = None
+                if len(worker["running"]) < worker["capacity"]:
+                    job = self._match(worker)
+                if job is not None:
+                    job["status"] = "running"
+                    job["worker"] = worker["name"]
+                    job["started_at"] = now_ms()
+                    job["attempt"] += 1
+                    worker["running"].add(job["id"])
+                    logger.info("coordinator: job %s -> %s", job["id"], worker["name"])
+                    return {"job": {"id": job["id"], "kind": job["kind"], "args": job["args"]}}
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return {"job": None}
+                self._cond.wait(left)
+
+    def _running_job(self, job_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        # caller holds the lock
+        job = self._jobs.get(job_id)
+        worker = self._workers.get(body.get("worker_id"))
+        if job is None or worker is None or job_id not in worker["running"]:
+            raise ClusterError(f"job {job_id} is not assigned to this worker")
+        worker["last_seen"] = time.monotonic()
+        return job
+
+    def _claim_events(self, job_id: str, run_dir: str, attempt: int) -> bool:
+        # caller holds _events_lock; False for a late batch of a lost attempt
+        written = self._events_attempt.get(job_id)
+        if written is not None and attempt < written:
+            return False
+        if written is not None and attempt > written:
+            _rotate_events(run_dir, written)
+        self._events_attempt[job_id] = attempt
+        return True
+
+    def _events(self, job_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self._cond:
+            job = self._running_job(job_id, body)
+            run_dir, attempt = job["run_dir"], job["attempt"]
+        with self._events_lock:
+            if self._claim_events(job_id, run_dir, attempt):
+                _append_events(run_dir, body.get("events") or [])
+        return {}
+
+    def _complete(self, job_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self._cond:
+            job = self._running_job(job_id, body)
+            run_dir = job["run_dir"]
+            with self._events_lock:
+                # an attempt that sent no events must not leave a lost one's in events.jsonl
+                self._claim_events(job_id, run_dir, job["attempt"])
+                self._events_attempt.pop(job_id, None)
+            for name, content in (body.get("files") or {}).items():
+                with open(os.path.join(run_dir, os.path.basename(name)), "w", encoding="utf-8") as f:
+                    f.write(content)
+            result = body.get("result")
+            if job["kind"] == "run" and isinstance(result, dict):
+                artifacts = dict(result.get("artifacts") or {})
+                artifacts["worker_run_dir"] = artifacts.get("run_dir")
+                artifacts["run_dir"] = run_dir
+                artifacts["worker"] = job["worker"]
+                result["artifacts"] = artifacts
+            job["result"] = result
+            job["error"] = body.get("error")
+            job["status"] = "failed" if body.get("error") else "done"
+            job["finished_at"] = now_ms()
+            self._workers[body["worker_id"]]["running"].discard(job_id)
+            self._cond.notify_all()
+        logger.info("coordinator: job %s id=%s", job["status"], job_id)
+        return {}
+
+    def _route(self, method: str, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        parts = [p for p in path.split("?")[0].split("/") if p]
+        if method == "POST" and parts == ["workers", "register"]:
+            return self._register(body)
+        if method == "GET" and parts == ["workers"]:
+            return {"workers": self.workers()}
+        if method == "POST" and parts == ["jobs"]:
+            return {"job_id": self.submit(body.get("kind"), body.get("args") or {})}
+        if method == "POST" and parts == ["jobs", "poll"]:
+            return self._poll(body)
+        if len(parts) == 3 and parts[0] == "jobs" and method == "POST":
+            if parts[2] == "events":
+                return self._events(parts[1], body)
+            if parts[2] == "complete":
+                return self._complete(parts[1], body)
+            if parts[2] == "wait":
+                return {"job": self.wait(parts[1], body.get("timeout"))}
+        raise ClusterError(f"no route: {method} {path}")
+
+
+def _handler_for(coord: Coordinator):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code: int, data: Dict[str, Any]) -> None:
+            raw = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def _dispatch(self, method: str) -> None:
+            if coord.token and not hmac.compare_digest(
+                    (self.headers.get("Authorization") or "").encode("utf-8"),
+                    f"Bearer {coord.token}".encode("utf-8")):
+                self._reply(401, {"error": "unauthorized"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else {}
+                self._reply(200, coord._route(method, self.path, body))
+            except (ClusterError, ValueError, TypeError) as e:
+                self._reply(400, {"error": str(e)})
+
+        def do_GET(self) -> None:
+            self._dispatch("GET")
+
+        def do_POST(self) -> None:
+            self._dispatch("POST")
+
+        def log_message(self, fmt: str, *args: Any) -> None:
+            logger.debug("coordinator http: " + fmt, *args)
+
+    return Handler
+
+
+def _request(url: str, path: str, body: Optional[Dict[str, Any]] = None, token: Optional[str] = None,
+             timeout: Optional[float] = 30.0) -> Dict[str, Any]:
+    data = None if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+    req = urllib.request.Request(url.rstrip("/") + path, data=data, method="GET" if body is None else "POST")
+    req.add_header("Content-Type", "application/json")
+    token = token if token is not None else os.environ.get(TOKEN_ENV)
+    if token:
+        req.add_header("Authorization", f"Bearer {token}")
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read() or b"{}")
+    except urllib.error.HTTPError as e:
+        try:
+            msg = json.loads(e.read()).get("error")
+        except ValueError:
+            msg = None
+        raise ClusterError(msg or f"HTTP {e.code}") from None
+
+
+class ClusterClient:
+    def __init__(self, url: str, token: Optional[str] = None) -> None:
+        self.url = url
+        self.token = token
+
+    def submit(self, kind: str, args: Dict[str, Any]) -> str:
+        args = {k: dataclasses.asdict(v) if isinstance(v, ResourceLimits) else v for k, v in args.items()}
+        return _request(self.url, "/jobs", {"kind": kind, "args": args}, self.token)["job_id"]
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        # re-poll in slices so a long job doesn't hit the HTTP timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            left = 20.0 if deadline is None else min(20.0, max(0.0, deadline - time.monotonic()))
+            job = _request(self.url, f"/jobs/{job_id}/wait", {"timeout": left}, self.token, timeout=left + 30)["job"]
+            if job["status"] not in ("queued", "running"):
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"job not finished: {job_id}")
+        if job["status"] == "failed":
+            raise ClusterError(f"job {job_id} failed on {job.get('worker')}: {job.get('error')}")
+        return job
+
+    def run(self, prompt: str, **kwargs: Any) -> "AgentRes":
+        from .runner import AgentRes
+        job = self.wait(self.submit("run", dict(kwargs, prompt=prompt)))
+        return AgentRes.from_dict(job["result"])
+
+    def process(self, cmd: Any, **kwargs: Any) -> ProcessResult:
+        job = self.wait(self.submit("process", dict(kwargs, cmd=cmd)))
+        return ProcessResult(**job["result"])
+
+    def workers(self) -> List[Dict[str, Any]]:
+        return _request(self.url, "/workers", token=self.token)["workers"]
+
+
+class _EventSink:
+    """Buffers a job's events and ships them to the coordinator in batches."""
+
+    def __init__(self, worker: "Worker", job_id: str, interval_s: float = 0.2) -> None:
+        self.worker = worker
+        self.job_id = job_id
+        self.interval_s = interval_s
+        self._buf: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def add(self, ev: Dict[str, Any]) -> None:
+        with self._lock:
+            self._buf.append(ev)
+
+    def _ship(self) -> None:
+        with self._lock:
+            batch, self._buf = self._buf, []
+        if batch:
+            self.worker._call(f"/jobs/{self.job_id}/events", {"events": batch})
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self._ship()
+            except (OSError, ClusterError) as e:
+                logger.warning("worker: event upload failed: %s", e)
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._ship()
+
+
+class Worker:
+    def __init__(
+        self,
+        url: str,
+        name: Optional[str] = None,
+        capacity: int = 1,
+        providers: Sequence[str] = ("codex",),
+        root: Optional[str] = None,
+        token: Optional[str] = None,
+        poll_s: float = 10.0,
+    ) -> None:
+        self.url = url
+        self.name = name or f"{os.uname().nodename}-{os.getpid()}"
+        self.capacity = max(1, capacity)
+        self.providers = list(providers)
+        self.root = root or os.path.join(_agent_root(), "cluster", "worker")
+        self.token = token
+        self.poll_s = poll_s
+        self.worker_id: Optional[str] = None
+        self._stop = threading.Event()
+        self._repo_lock = threading.Lock()
+
+    def _call(self, path: str, body: Dict[str, Any], timeout: float = 30.0) -> Dict[str, Any]:
+        return _request(self.url, path, dict(body, worker_id=self.worker_id), self.token, timeout=timeout)
+
+    def register(self) -> None:
+        res = _request(self.url, "/workers/register",
+                       {"name": self.name, "capacity": self.capacity, "providers": self.providers}, self.token)
+        self.worker_id = res["worker_id"]
+        logger.info("worker registered: %s id=%s", self.name, self.worker_id)
+
+    def serve_forever(self) -> None:
+        self.register()
+        try:
+            while not self._stop.is_set():
+                try:
+                    job = self._call("/jobs/poll", {"wait": self.poll_s}, timeout=self.poll_s + 30)["job"]
+                except ClusterError as e:
+                    logger.warning("worker poll failed: %s", e)
+                    self.register()
+                    continue
+                except OSError as e:
+                    logger.warning("worker poll failed: %s", e)
+                    self._stop.wait(1.0)
+                    continue
+                if job is not None:
+                    threading.Thread(target=self._run_job, args=(job,), daemon=True).start()
+        except KeyboardInterrupt:
+            logger.info("worker interrupted")
+
+    def close(self) -> None:
+        self._stop.set()
+
+    def _checkout(self, repo: Dict[str, Any]):
+        from .worktree import _git, get_worktree_pool
+
+        url = repo["url"]
+        clone = os.path.join(self.root, "repos", hashlib.sha1(url.encode("utf-8")).hexdigest()[:12])
+        with self._repo_lock:
+            if not os.path.isdir(os.path.join(clone, ".git")):
+                ensure_dir(os.path.dirname(clone))
+                _git(self.root, "clone", "-q", url, clone)
+            else:
+                _git(clone, "fetch", "-q", "origin")
+        pool = get_worktree_pool(clone)
+        ref = repo.get("ref") or "HEAD"
+        remote_ref = f"origin/{ref}"
+        if _git(clone, "rev-parse", "--verify", "-q", remote_ref, check=False):
+            ref = remote_ref
+        return pool, pool.acquire(ref=ref)
+
+    def _run_job(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        args = dict(job["args"])
+        sink = _EventSink(self, job_id)
+        files: Dict[str, str] = {}
+        result: Any = None
+        error: Optional[str] = None
+        pool = wt = None
+        try:
+            repo = args.pop("repo", None)
+            if repo:
+                pool, wt = self._checkout(repo)
+                args["cwd"] = wt.path
+            if args.get("limits"):
+                args["limits"] = ResourceLimits(**args["limits"])
+            if job["kind"] == "process":
+                cmd = args.pop("cmd")
+                handle = start_process(cmd, **args)
+                for ev in handle.iter_events():
+                    sink.add(ev)
+                result = dataclasses.asdict(handle.result())
+            else:
+                from .runner import run
+                args["stream"] = False
+                args["on_event"] = sink.add
+                res = run(**args)
+                flush_storage()
+                result = res.to_dict()
+                run_dir = (res.artifacts or {}).get("run_dir")
+                for name in _UPLOAD_FILES:
+                    path = os.path.join(run_dir, name) if run_dir else ""
+                    if path and os.path.exists(path):
+                        with open(path, "r", encoding="utf-8") as f:
+                            files[name] = f.read()
+            if wt is not None:
+                from .worktree import _git
+                _git(wt.path, "add", "-A")
+                patch = _git(wt.path, "diff", "--cached", "--binary", wt.base)
+                if patch:
+                    files["changes.patch"] = patch + "\n"
+        except Exception as e:
+            logger.exception("worker: job failed id=%s", job_id)
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            if pool is not None and wt is not None:
+                pool.discard(wt)
+            try:
+                sink.close()
+                self._call(f"/jobs/{job_id}/complete", {"result": result, "error": error, "files": files})
+            except (OSError, ClusterError) as e:
+                logger.error("worker: could not report job %s: %s", job_id, e)
+
+
+def serve_coordinator(host: str = "127.0.0.1", port: int = 8765, **kwargs: Any) -> None:
+    Coordinator(host, port, **kwargs).serve_forever()
+
+
+def serve_worker(url: str, **kwargs: Any) -> None:
+    Worker(url, **kwargs).serve_forever()
@@ -0,0 +1,255 @@
+"""
+Cached workspace context index for prompts.
+
+`ContextIndex` keeps a one-line summary per file under a directory, together
+with each file's fingerprint (size, mtime, content hash). `update()` re-reads
+only files that were added or changed since the last call, so refreshing the
+index before every step costs a directory scan. `render()` produces a compact
+block that `run(prompt, context=index)` prepends to the prompt, or `write()`
+saves it as a file that prompts can reference with @path.
+
+    index = ContextIndex("docs/bybit_v5", "*.md")
+    run("Implement the kline endpoint.", context=index)
+
+Summaries are heuristic by default (first heading, docstring or comment, plus
+an HTTP endpoint line if one appears near the top). Pass a `summarizer` for
+anything smarter; it is only called for changed files.
+"""
+
+import concurrent.futures
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from .logger import logger
+from .session import _workspace_dir
+from .storage import flush_storage, get_writer
+from .utils import ensure_dir, now_ms, write_json_atomic
+
+_HEAD_LINES = 40
+_SUMMARY_CHARS = 120
+_ENDPOINT = re.compile(r"\b(GET|POST|PUT|PATCH|DELETE)\s+(/[\w/{}:.\-]+)")
+_COMMENT_PREFIX = re.compile(r"^\s*(#+|//+|/\*+|\*+|--|;+|<!--)\s*")
+
+
+def _read_head(path: str, max_lines: int) -> str:
+    lines = []
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            lines.append(line)
+            if len(lines) >= max_lines:
+                break
+    return "".join(lines)
+
+
+def _clip(text: str, limit: int = _SUMMARY_CHARS) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+def summarize_head(rel: str, head: str) -> str:
+    """Heuristic one-line summary from the first lines of a file."""
+    lines = [ln.strip() for ln in head.splitlines() if ln.strip()]
+    ext = os.path.splitext(rel)[1].lower()
+    summary = ""
+    if ext in (".md", ".markdown", ".rst", ".txt"):
+        for ln in lines:
+            if ln.startswith("#"):
+                summary = ln.lstrip("#").strip()
+                break
+        if not summary and lines:
+            summary = lines[0]
+    elif ext == ".py":
+        m = re.search(r'^\s*[rRuU]?("""|\'\'\')\s*(.*?)\s*(?:\1|$)', head, re.S | re.M)
+        if m:
+            body = [ln.strip() for ln in m.group(2).splitlines() if ln.strip()]
+            summary = body[0] if body else ""
+    if not summary:
+        for ln in lines:
+            if _COMMENT_PREFIX.match(ln):
+                body = _COMMENT_PREFIX.sub("", ln).strip(" */>-")
+                if body and not body.startswith("!") and not body.lower().startswith(("copyright", "license", "-*-")):
+                    summary = body
+                    break
+    if not summary:
+        for ln in lines:
+            if not _COMMENT_PREFIX.match(ln):
+                summary = ln
+                break
+    endpoint = _ENDPOINT.search(head)
+    if endpoint:
+        call = f"{endpoint.group(1)} {endpoint.group(2)}"
+        if call not in summary:
+            summary = f"{summary} — {call}" if summary else call
+    return _clip(summary)
+
+
+def _write_state(path: str, state: Dict[str, Any]) -> None:
+    write_json_atomic(path, state)
+
+
+class ContextIndex:
+    def __init__(
+        self,
+        root: str,
+        patterns: Union[str, Sequence[str]] = "*",
+        name: Optional[str] = None,
+        summarizer: Optional[Callable[[str, str], str]] = None,
+        head_lines: int = _HEAD_LINES,
+        gitignore: bool = True,
+        workers: int = 8,
+    ) -> None:
+        """
+        root: directory to index; patterns: as for scan_files().
+        summarizer(relpath, head) -> one-line summary, where head is the first
+        `head_lines` lines of the file; defaults to summarize_head().
+        State lives in the workspace of root under context/<name>.json.
+        """
+        self.root = os.path.abspath(root)
+        self.patterns = [patterns] if isinstance(patterns, str) else list(patterns)
+        self.summarizer = summarizer or summarize_head
+        self.head_lines = head_lines
+        self.gitignore = gitignore
+        self.workers = workers
+        if name is None:
+            seed = self.root + "\0" + "\0".join(self.patterns)
+            name = "ctx-" + hashlib.sha1(seed.encode("utf-8")).hexdigest()[:12]
+        self.name = name
+        self.path = os.path.join(_workspace_dir(self.root), "context", f"{name}.json")
+        ensure_dir(os.path.dirname(self.path))
+        self._lock = threading.Lock()
+        self.files: Dict[str, Dict[str, Any]] = {}
+        flush_storage()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files") or {}
+        except (OSError, ValueError):
+            pass
+
+    def _fresh(self, rel: str, path: str) -> Optional[Dict[str, Any]]:
+        """The stored record if the file is unchanged, refreshing its stat on a content-identical touch."""
+        from .files import file_hash
+
+        rec = self.files.get(rel)
+        if rec is None:
+            return None
+        st = os.stat(path)
+        if rec.get("size") == st.st_size and rec.get("mtime_ns") == st.st_mtime_ns:
+            return rec
+        if rec.get("hash") == file_hash(path):
+            return dict(rec, size=st.st_size, mtime_ns=st.st_mtime_ns)
+        return None
+
+    def _summarize(self, rel: str, path: str) -> Dict[str, Any]:
+        from .files import file_hash
+
+        st = os.stat(path)
+        try:
+            summary = self.summarizer(rel, _read_head(path, self.head_lines))
+        except Exception as e:
+            logger.warning("context summary failed: %s: %s", rel, e)
+            summary = ""
+        return {
+            "hash": file_hash(path),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "summary": _clip(summary or ""),
+            "at": now_ms(),
+        }
+
+    def update(self) -> Dict[str, int]:
+        """Rescan root and re-summarize added or changed files; returns counts by kind."""
+        from .files import scan_files
+
+        paths = scan_files(self.root, self.patterns, gitignore=self.gitignore, workers=self.workers)
+        current: Dict[str, str] = {os.path.relpath(p, self.root).replace(os.sep, "/"): p for p in paths}
+        files: Dict[str, Dict[str, Any]] = {}
+        todo: List[str] = []
+        touched = 0
+        for rel, path in current.items():
+            try:
+                rec = self._fresh(rel, path)
+            except OSError:
+                continue
+            if rec is None:
+                todo.append(rel)
+            else:
+                touched += rec is not self.files.get(rel)
+                files[rel] = rec
+        if todo:
+            with concurrent.futures.ThreadPoolExecutor(self.workers) as pool:
+                for rel, rec in zip(todo, pool.map(lambda r: self._summarize(r, current[r]), todo)):
+                    files[rel] = rec
+        removed = len(set(self.files) - set(current))
+        stats = {
+            "added": sum(1 for rel in todo if rel not in self.files),
+            "changed": sum(1 for rel in todo if rel in self.files),
+            "removed": removed,
+            "unchanged": len(files) - len(todo),
+        }
+        with self._lock:
+            self.files = files
+            snapshot = {"root": self.root, "patterns": self.patterns, "files": dict(files)}
+        if todo or removed or touched:
+            get_writer().submit(_write_state, self.path, snapshot)
+            logger.info("context index %s: %d added, %d changed, %d removed, %d unchanged",
+                        self.name, stats["added"], stats["changed"], stats["removed"], stats["unchanged"])
+        return stats
+
+    def render(self, base: Optional[str] = None, max_chars: Optional[int] = None) -> str:
+        """
+        Compact index block, one "path: summary" line per file grouped by directory.
+        Paths are relative to base (default: root). max_chars truncates the listing.
+        """
+        prefix = os.path.relpath(self.root, base).replace(os.sep, "/") if base else "."
+        header = f'<context_index root="{prefix}">'
+        lines = [header]
+        size = len(header) + len("</context_index>") + 2
+        last_dir = None
+        rels = sorted(self.files, key=lambda r: r.rpartition("/")[::2])
+        for i, rel in enumerate(rels):
+            dir_name, _, file_name = rel.rpartition("/")
+            entry = []
+            if dir_name != last_dir:
+                entry.append(f"{dir_name}/" if dir_name else "./")
+                last_dir = dir_name
+            summary = self.files[rel].get("summary") or ""
+            entry.append(f"  {file_name}: {summary}" if summary else f"  {file_name}")
+            cost = sum(len(e) + 1 for e in entry)
+            if max_chars is not None and size + cost > max_chars:
+                lines.append(f"... ({len(rels) - i} more files)")
+                break
+            lines.extend(entry)
+            size += cost
+        lines.append("</context_index>")
+        return "\n".join(lines)
+
+    def write(self, path: str, update: bool = True, max_chars: Optional[int] = None) -> str:
+        """Save the rendered index to path (paths relative to its directory) and return the text."""
+        if update:
+            self.update()
+        path = os.path.abspath(path)
+        text = self.render(base=os.path.dirname(path), max_chars=max_chars)
+        ensure_dir(os.path.dirname(path))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        return text
+
+
+def with_context(prompt: str, context: Union[str, ContextIndex, Sequence[Union[str, ContextIndex]]], cwd: str) -> str:
+    """Prompt with the context blocks in front; indexes are refreshed first."""
+    if isinstance(context, (str, ContextIndex)):
+        context = [context]
+    blocks = []
+    for item in context:
+        if isinstance(item, ContextIndex):
+            item.update()
+            item = item.render(base=cwd)
+        if item:
+            blocks.append(item)
+    if not blocks:
+        return prompt
+    return "\n\n".join(blocks) + "\n\n" + prompt
@@ -0,0 +1,510 @@
+"""
+Local daemon that runs jobs for many short-lived scripts.
+
+`aibaton serve` listens on a Unix socket (`~/.aibaton/daemon.sock`, or
+$AIBATON_SOCKET) and executes `run` and `process` jobs in one process, so all
+scripts share its rate limits, process manager, sessions and storage writer.
+Jobs are persisted under `~/.aibaton/daemon/jobs/` before they are accepted;
+queued or interrupted jobs are picked up again when the daemon restarts.
+
+While the daemon is up, `run()` submits to it transparently and blocks for the
+result; set AIBATON_NO_DAEMON=1 to always run in-process. Run jobs carry the
+caller's environment, so the agent sees the submitting script's PATH and keys;
+it is dropped from the job file once the job finishes. Finished jobs stay in
+memory up to a cap and on disk for a day, so a reconnecting client still gets
+its result.
+
+Protocol: one JSON object per line, one request per connection.
+    {"op": "submit", "kind": "run"|"process", "args": {...}} -> {"ok": true, "job_id": ...}
+    {"op": "wait", "job_id": ...}                             -> {"ok": true, "job": {...}}
+    {"op": "ping"} / {"op": "jobs"} / {"op": "shutdown"}
+"""
+
+import collections
+import dataclasses
+import glob
+import json
+import os
+import queue
+import re
+import socket
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from .logger import logger
+from .process import ProcessResult, _own_spill, start_process
+from .proctree import ResourceLimits
+from .reactor import get_process_manager
+from .session import _agent_root
+from .storage import flush_storage
+from .utils import ensure_dir, now_ms, write_json_atomic
+
+if TYPE_CHECKING:
+    from .runner import AgentRes
+
+# finished job records older than this are removed from disk and memory
+_KEEP_DONE_S = 24 * 3600
+# finished jobs kept in memory; older ones are served from their job file
+_MAX_DONE_IN_MEMORY = 256
+# how often a running daemon removes expired job files
+_SWEEP_S = 3600
+
+_JOB_ID_RE = re.compile(r"[0-9]+_[0-9]+")
+
+# set inside the daemon so its own run() calls never loop back to the socket
+_serving = False
+
+# how long a waiting client keeps reconnecting while the daemon is down
+_RECONNECT_S = 60.0
+
+
+class DaemonError(RuntimeError):
+    pass
+
+
+class DaemonUnavailable(DaemonError):
+    """The connection to the daemon was lost or refused."""
+
+
+class UnknownJob(DaemonError):
+    """The daemon has no record of the job (e.g. its job file was removed)."""
+
+
+def socket_path() -> str:
+    return os.environ.get("AIBATON_SOCKET") or os.path.join(_agent_root(), "daemon.sock")
+
+
+def _jobs_dir() -> str:
+    path = os.path.join(_agent_root(), "daemon", "jobs")
+    ensure_dir(path)
+    return path
+
+
+def _write_job(path: str, job: Dict[str, Any]) -> None:
+    # written synchronously: a job only counts as accepted once it is on disk;
+    # owner-only, run jobs carry the caller's environment (API keys)
+    write_json_atomic(path, job, mode=0o600)
+
+
+def _read_job(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _finished(job: Dict[str, Any]) -> bool:
+    return job.get("status") not in ("queued", "running")
+
+
+def _send(conn: socket.socket, msg: Dict[str, Any]) -> None:
+    conn.sendall(json.dumps(msg, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+def _recv(conn: socket.socket) -> Optional[Dict[str, Any]]:
+    buf = bytearray()
+    while not buf.endswith(b"\n"):
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        buf.extend(chunk)
+    if not buf:
+        return None
+    return json.loads(buf.decode("utf-8"))
+
+
+def _summary(job: Dict[str, Any]) -> Dict[str, Any]:
+    # job listing without results or the forwarded environment
+    out = {k: v for k, v in job.items() if k != "result"}
+    out["args"] = {k: v for k, v in (job.get("args") or {}).items() if k != "env"}
+    return out
+
+
+class Daemon:
+    def __init__(self, path: Optional[str] = None, max_workers: int = 8) -> None:
+        self.path = path or socket_path()
+        self.max_workers = max(1, max_workers)
+        self.jobs_dir = _jobs_dir()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._done: Dict[str, threading.Event] = {}
+        # finished job ids, oldest first, for evicting them from memory
+        self._finished: "collections.deque[str]" = collections.deque()
+        self._swept_at = 0
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._workers: List[threading.Thread] = []
+        self._seq = 0
+        self._stop = threading.Event()
+        self._sock: Optional[socket.socket] = None
+
+    # ---- jobs ----
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _save(self, job: Dict[str, Any]) -> None:
+        job["updated_at"] = now_ms()
+        _write_job(self._job_path(job["id"]), job)
+
+    def _recover(self) -> None:
+        self._swept_at = now_ms()
+        pending = []
+        finished = []
+        for path in glob.glob(os.path.join(self.jobs_dir, "*.json")):
+            job = _read_job(path)
+            if job is None:
+                logger.warning("daemon: unreadable job file %s", path)
+                continue
+            if not _finished(job):
+                job["status"] = "queued"
+                pending.append(job)
+            elif self._swept_at - int(job.get("updated_at") or 0) > _KEEP_DONE_S * 1000:
+                os.remove(path)
+            else:
+                if "env" in (job.get("args") or {}):
+                    self._strip_env(job)  # written by an older daemon
+                finished.append(job)
+        finished.sort(key=lambda j: j.get("updated_at") or 0)
+        for job in finished:
+            self._jobs[job["id"]] = job
+            self._done.setdefault(job["id"], threading.Event()).set()
+            self._finished.append(job["id"])
+        self._evict()
+        pending.sort(key=lambda j: j.get("created_at") or 0)
+        for job in pending:
+            self._jobs[job["id"]] = job
+            self._done[job["id"]] = threading.Event()
+            self._queue.put(job["id"])
+        if pending:
+            logger.info("daemon: recovered %d queued jobs", len(pending))
+
+    def submit(self, kind: str, args: Dict[str, Any]) -> str:
+        if kind not in ("run", "process"):
+            raise DaemonError(f"unknown job kind: {kind}")
+        with self._lock:
+            self._seq += 1
+            job_id = f"{now_ms()}_{self._seq}"
+            job = {"id": job_id, "kind": kind, "args": args, "status": "queued", "created_at": now_ms()}
+            self._save(job)
+            self._jobs[job_id] = job
+            self._done[job_id] = threading.Event()
+        self._queue.put(job_id)
+        logger.debug("daemon: job queued id=%s kind=%s", job_id, kind)
+        return job_id
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        with self._lock:
+            done = self._done.get(job_id)
+        if done is None:
+            return self._load_finished(job_id)
+        if not done.wait(timeout):
+            raise TimeoutError(f"job not finished: {job_id}")
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job if job is not None else self._load_finished(job_id)
+
+    def _load_finished(self, job_id: str) -> Dict[str, Any]:
+        # evicted from memory, but the job file is kept for _KEEP_DONE_S
+        job = None
+        if isinstance(job_id, str) and _JOB_ID_RE.fullmatch(job_id):
+            job = _read_job(self._job_path(job_id))
+        if job is None or not _finished(job):
+            raise UnknownJob(f"unknown job: {job_id}")
+        return job
+
+    def _strip_env(self, job: Dict[str, Any]) -> None:
+        # the forwarded environment (API keys) is only needed while the job can still run
+        job["args"] = {k: v for k, v in (job.get("args") or {}).items() if k != "env"}
+        self._save(job)
+
+    def _evict(self) -> None:
+        cutoff = now_ms() - _KEEP_DONE_S * 1000
+        with self._lock:
+            while self._finished:
+                oldest = self._jobs.get(self._finished[0])
+                if (oldest is not None and len(self._finished) <= _MAX_DONE_IN_MEMORY
+                        and int(oldest.get("updated_at") or 0) >= cutoff):
+                    break
+                job_id = self._finished.popleft()
+                self._jobs.pop(job_id, None)
+                self._done.pop(job_id, None)
+
+    def _sweep(self) -> None:
+        now = now_ms()
+        with self._lock:
+            if now - self._swept_at < _SWEEP_S * 1000:
+                return
+            self._swept_at = now
+        cutoff = now - _KEEP_DONE_S * 1000
+        for path in glob.glob(os.path.join(self.jobs_dir, "*.json")):
+            try:
+                if os.path.getmtime(path) * 1000 >= cutoff:
+                    continue
+            except OSError:
+                continue
+            job = _read_job(path)
+            if job is not None and _finished(job) and int(job.get("updated_at") or 0) < cutoff:
+                os.remove(path)
+
+    def _execute(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        args = dict(job["args"])
+        if args.get("limits"):
+            args["limits"] = ResourceLimits(**args["limits"])
+        if job["kind"] == "process":
+            cmd = args.pop("cmd")
+            args.setdefault("manager", get_process_manager())
+            # spill files outlive this result: the client takes them over
+            args["keep_spill"] = True
+            return dataclasses.asdict(start_process(cmd, **args).wait())
+        from .runner import run
+        args["stream"] = False  # nobody watches the daemon's terminal
+        res = run(**args)
+        flush_storage()  # the client reads events from run_dir
+        return res.to_dict()
+
+    def _worker(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            job = self._jobs[job_id]
+            job["status"] = "running"
+            self._save(job)
+            start = time.monotonic()
+            try:
+                job["result"] = self._execute(job)
+                job["status"] = "done"
+            except Exception as e:
+                logger.exception("daemon: job failed id=%s", job_id)
+                job["status"] = "failed"
+                job["error"] = f"{type(e).__name__}: {e}"
+            job["elapsed_ms"] = int((time.monotonic() - start) * 1000)
+            self._strip_env(job)
+            with self._lock:
+                self._finished.append(job_id)
+            self._done[job_id].set()
+            logger.info("daemon: job %s id=%s elapsed_ms=%d", job["status"], job_id, job["elapsed_ms"])
+            self._evict()
+            self._sweep()
+
+    # ---- socket ----
+
+    def _handle(self, conn: socket.socket) -> None:
+        with conn:
+            try:
+                msg = _recv(conn)
+                if msg is None:
+                    return
+                op = msg.get("op")
+                if op == "ping":
+                    _send(conn, {"ok": True, "pid": os.getpid()})
+                elif op == "submit":
+                    _send(conn, {"ok": True, "job_id": self.submit(msg.get("kind"), msg.get("args") or {})})
+                elif op == "wait":
+                    _send(conn, {"ok": True, "job": self.wait(msg.get("job_id"), msg.get("timeout"))})
+                elif op == "jobs":
+                    with self._lock:
+                        jobs = [_summary(j) for j in self._jobs.values()]
+                    _send(conn, {"ok": True, "jobs": jobs})
+                elif op == "shutdown":
+                    _send(conn, {"ok": True})
+                    self._stop.set()
+                    self._wake()
+                else:
+                    _send(conn, {"ok": False, "error": f"unknown op: {op}"})
+            except UnknownJob as e:
+                _send(conn, {"ok": False, "error": str(e), "unknown_job": True})
+            except (DaemonError, TimeoutError, TypeError, ValueError) as e:
+                _send(conn, {"ok": False, "error": str(e)})
+            except OSError as e:
+                logger.debug("daemon: client gone: %s", e)
+
+    def _wake(self) -> None:
+        # unblock accept() so serve_forever can notice the stop flag
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.connect(self.path)
+        except OSError:
+            pass
+
+    def _bind(self) -> socket.socket:
+        if os.path.exists(self.path):
+            if ping(self.path):
+                raise DaemonError(f"daemon already running on {self.path}")
+            os.remove(self.path)  # stale socket from a crashed daemon
+        ensure_dir(os.path.dirname(self.path))
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # the socket is created owner-only; a chmod after bind() would leave a
+        # window in which other users could connect and submit jobs
+        old_umask = os.umask(0o177)
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        sock.listen(64)
+        return sock
+
+    def serve_forever(self) -> None:
+        global _serving
+        _serving = True
+        self._sock = self._bind()
+        self._recover()
+        for i in range(self.max_workers):
+            t = threading.Thread(target=self._worker, name=f"aibaton-daemon-{i}", daemon=True)
+            t.start()
+            self._workers.append(t)
+        logger.info("daemon listening: %s workers=%d", self.path, self.max_workers)
+        try:
+            while not self._stop.is_set():
+                conn, _ = self._sock.accept()
+                if self._stop.is_set():
+                    conn.close()
+                    break
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        except KeyboardInterrupt:
+            logger.info("daemon interrupted")
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Stop accepting jobs and finish the running ones; queued jobs stay on disk for the next start."""
+        global _serving
+        self._stop.set()
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self._workers:
+            self._queue.put(None)
+        for t in self._workers:
+            t.join()
+        self._workers = []
+        flush_storage()
+        _serving = False
+
+
+def serve(path: Optional[str] = None, max_workers: int = 8) -> None:
+    Daemon(path, max_workers=max_workers).serve_forever()
+
+
+class DaemonClient:
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or socket_path()
+
+    def _call(self, msg: Dict[str, Any], timeout: Optional[float] = 5.0) -> Dict[str, Any]:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(timeout)
+            s.connect(self.path)
+            _send(s, msg)
+            reply = _recv(s)
+        if reply is None:
+            raise DaemonUnavailable("daemon closed the connection")
+        if not reply.get("ok"):
+            if reply.get("unknown_job"):
+                raise UnknownJob(reply.get("error") or "unknown job")
+            raise DaemonError(reply.get("error") or "daemon error")
+        return reply
+
+    def ping(self) -> bool:
+        try:
+            self._call({"op": "ping"}, timeout=1.0)
+            return True
+        except (OSError, DaemonError):
+            return False
+
+    def submit(self, kind: str, args: Dict[str, Any]) -> str:
+        return self._call({"op": "submit", "kind": kind, "args": args})["job_id"]
+
+    def wait(self, job_id: str, timeout: Optional[float] = None, reconnect_s: float = _RECONNECT_S) -> Dict[str, Any]:
+        """
+        Block until the job finishes. Jobs are durable, so when the daemon goes
+        away mid-wait (restart, crash) this reconnects with backoff for up to
+        reconnect_s and waits on the restarted daemon, which resumes the job.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        lost_at: Optional[float] = None
+        delay = 0.1
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                job = self._call({"op": "wait", "job_id": job_id, "timeout": remaining}, timeout=None)["job"]
+                break
+            except (OSError, DaemonUnavailable) as e:
+                now = time.monotonic()
+                if lost_at is None:
+                    lost_at = now
+                    logger.info("daemon connection lost while waiting for job %s: %s", job_id, e)
+                if now - lost_at > reconnect_s or (deadline is not None and now >= deadline):
+                    raise DaemonUnavailable(f"daemon unavailable while waiting for job {job_id}: {e}") from e
+                time.sleep(delay)
+                delay = min(delay * 2, 2.0)
+        if job.get("status") == "failed":
+            raise DaemonError(f"job {job_id} failed: {job.get('error')}")
+        return job
+
+    def run(self, prompt: str, **kwargs: Any) -> "AgentRes":
+        from .runner import AgentRes
+        job = self.wait(self.submit("run", _jsonable(dict(kwargs, prompt=prompt))))
+        return AgentRes.from_dict(job["result"])
+
+    def process(self, cmd: Any, keep_spill: bool = False, **kwargs: Any) -> ProcessResult:
+        job = self.wait(self.submit("process", _jsonable(dict(kwargs, cmd=cmd))))
+        res = ProcessResult(**job["result"])
+        return res if keep_spill else _own_spill(res)
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        return self._call({"op": "jobs"})["jobs"]
+
+    def shutdown(self) -> None:
+        self._call({"op": "shutdown"})
+
+
+def _jsonable(args: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for key, value in args.items():
+        if isinstance(value, ResourceLimits):
+            value = dataclasses.asdict(value)
+        out[key] = value
+    json.dumps(out)  # raises TypeError for anything the daemon can't receive
+    return out
+
+
+def ping(path: Optional[str] = None) -> bool:
+    return DaemonClient(path).ping()
+
+
+def submit_run(args: Dict[str, Any]) -> Optional["AgentRes"]:
+    """Run through the daemon if one is listening; None means run in-process."""
+    if _serving or os.environ.get("AIBATON_NO_DAEMON"):
+        return None
+    path = socket_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        payload = _jsonable(args)
+    except TypeError:
+        logger.debug("daemon: arguments not serializable, running in-process")
+        return None
+    client = DaemonClient(path)
+    try:
+        job_id = client.submit("run", payload)
+    except (OSError, DaemonError) as e:
+        logger.debug("daemon unavailable, running in-process: %s", e)
+        return None
+    logger.info("run submitted to daemon: job_id=%s", job_id)
+    from .runner import AgentRes
+    try:
+        job = client.wait(job_id)
+    except UnknownJob:
+        # the restarted daemon lost the job: nothing will run it, so do it here
+        logger.warning("daemon lost job %s, running in-process", job_id)
+        return None
+    return AgentRes.from_dict(job["result"])
@@ -1,16 +1,22 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, Optional
 
 from .utils import now_ms
 
 
-def normalize_event(raw: Dict[str, Any], source: str) -> Dict[str, Any]:
+def normalize_event(raw: Dict[str, Any], source: str, stream: Optional[str] = None, plain: bool = False) -> Dict[str, Any]:
     event_type = raw.get("type") or raw.get("event") or "message"
-    return {
+    ev = {
         "type": event_type,
         "ts": raw.get("ts") or now_ms(),
         "payload": raw,
         "source": source,
     }
+    if stream is not None:
+        # the pipe the line came from and whether it was JSON, so replay can reproduce it
+        ev["stream"] = stream
+        if plain:
+            ev["plain"] = True
+    return ev
 
 
 def _extract_content_text(content: Any) -> Optional[str]:
@@ -94,3 +100,37 @@ def extract_text(raw: Dict[str, Any]) -> Optional[str]:
                 return "".join(parts)
 
     return None
+
+
+def _int(value: Any) -> int:
+    return value if isinstance(value, int) else 0
+
+
+def extract_usage(events: Iterable[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+    """Token usage from normalized events: codex `turn.completed` (summed) or claude `result`."""
+    total: Optional[Dict[str, int]] = None
+    for ev in events:
+        raw = ev.get("payload") or {}
+        usage = raw.get("usage")
+        if not isinstance(usage, dict):
+            continue
+        if raw.get("type") == "turn.completed":
+            cur = {
+                "input_tokens": _int(usage.get("input_tokens")),
+                "cached_input_tokens": _int(usage.get("cached_input_tokens")),
+                "output_tokens": _int(usage.get("output_tokens")),
+            }
+            if total is not None:
+                cur = {k: v + total.get(k, 0) for k, v in cur.items()}
+            total = cur
+        elif raw.get("type") == "result":
+            # claude reports the whole session once; input_tokens excludes cache reads/writes
+            cached = _int(usage.get("cache_read_input_tokens"))
+            total = {
+                "input_tokens": _int(usage.get("input_tokens")) + cached + _int(usage.get("cache_creation_input_tokens")),
+                "cached_input_tokens": cached,
+                "output_tokens": _int(usage.get("output_tokens")),
+            }
+    if total is not None:
+        total["total_tokens"] = total["input_tokens"] + total["output_tokens"]
+    return total
@@ -0,0 +1,298 @@
+"""
+Incremental batch processing over files.
+
+`scan_files()` lists matching files quickly: `git ls-files` inside a git
+repository (so .gitignore is honoured), otherwise a parallel `os.scandir` walk.
+`map_files()` runs a prompt per file and records the content hash of every file
+that succeeded, so the next invocation skips files that haven't changed. With
+`shard="i/n"` each of n processes or machines takes a stable 1/n of the list.
+
+    map_files("**/*.go", "File path: {path}\\n\\nRefactor it.", root="/app/banbot",
+              min_lines=300, shard="2/4")
+"""
+
+import concurrent.futures
+import fnmatch
+import hashlib
+import json
+import os
+import subprocess
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .logger import logger
+from .runner import AgentRes, run
+from .session import _workspace_dir
+from .storage import flush_storage, get_writer
+from .tracing import bind
+from .utils import ensure_dir, file_lock, now_ms, write_json_atomic
+
+_SKIP_DIRS = {".git", ".hg", ".svn"}
+
+
+def _match(rel: str, patterns: Sequence[str]) -> bool:
+    name = rel.rsplit("/", 1)[-1]
+    for pat in patterns:
+        if "/" in pat:
+            # "**/" also matches files at the top level
+            if fnmatch.fnmatchcase(rel, pat) or (pat.startswith("**/") and fnmatch.fnmatchcase(rel, pat[3:])):
+                return True
+        elif fnmatch.fnmatchcase(name, pat):
+            return True
+    return False
+
+
+def _git_files(root: str) -> Optional[List[str]]:
+    try:
+        proc = subprocess.run(
+            ["git", "-C", root, "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+    except OSError:
+        return None
+    if proc.returncode != 0:
+        return None
+    return [p for p in proc.stdout.decode("utf-8", "surrogateescape").split("\0") if p]
+
+
+def _walk(root: str, workers: int) -> List[str]:
+    """Parallel scandir walk, one directory per task; returns paths relative to root."""
+    files: List[str] = []
+
+    def scan(rel_dir: str) -> Tuple[List[str], List[str]]:
+        sub_files, sub_dirs = [], []
+        try:
+            with os.scandir(os.path.join(root, rel_dir)) as it:
+                for entry in it:
+                    rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in _SKIP_DIRS:
+                            sub_dirs.append(rel)
+                    elif entry.is_file():
+                        sub_files.append(rel)
+        except OSError as e:
+            logger.debug("scan skipped %s: %s", rel_dir, e)
+        return sub_files, sub_dirs
+
+    level = [""]
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        while level:
+            nxt: List[str] = []
+            for sub_files, sub_dirs in pool.map(scan, level):
+                files.extend(sub_files)
+                nxt.extend(sub_dirs)
+            level = nxt
+    return files
+
+
+def _count_lines(path: str) -> int:
+    count = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            count += chunk.count(b"\n")
+    return count
+
+
+def scan_files(
+    root: str,
+    patterns: Union[str, Sequence[str]] = "*",
+    gitignore: bool = True,
+    min_lines: int = 0,
+    workers: int = 8,
+) -> List[str]:
+    """Absolute paths under root matching any pattern, sorted.
+
+    Patterns without "/" match the file name, others the path relative to root
+    ("src/**/*.go"). min_lines keeps files with more lines, counted in parallel.
+    """
+    root = os.path.abspath(root)
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    rels = _git_files(root) if gitignore else None
+    if rels is None:
+        rels = _walk(root, workers)
+    paths = sorted(os.path.join(root, rel) for rel in rels if _match(rel, patterns))
+    paths = [p for p in paths if os.path.isfile(p)]  # ls-files also lists deleted files
+    if min_lines > 0:
+        with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+            counts = list(pool.map(_count_lines, paths))
+        paths = [p for p, n in zip(paths, counts) if n > min_lines]
+    return paths
+
+
+def parse_shard(shard: Union[str, Tuple[int, int]]) -> Tuple[int, int]:
+    """"i/n" (1-based, like --shard=2/4) -> (i, n)."""
+    if isinstance(shard, str):
+        i_str, _, n_str = shard.partition("/")
+        try:
+            i, n = int(i_str), int(n_str)
+        except ValueError:
+            raise ValueError(f"bad shard {shard!r}, expected i/n") from None
+    else:
+        i, n = shard
+    if n < 1 or not 1 <= i <= n:
+        raise ValueError(f"bad shard {shard!r}, expected 1 <= i <= n")
+    return i, n
+
+
+def in_shard(key: str, shard: Union[str, Tuple[int, int]]) -> bool:
+    # stable across processes and machines, unlike hash()
+    i, n = parse_shard(shard)
+    return int(hashlib.sha1(key.encode("utf-8")).hexdigest()[:8], 16) % n == i - 1
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _read_state(path: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("files") or {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _merge_state(
+    path: str,
+    updates: Dict[str, Dict[str, Any]],
+    reset_shard: Union[None, bool, str, Tuple[int, int]] = None,
+) -> None:
+    # other shard processes write the same file: re-read and merge under the lock
+    with file_lock(path + ".lock"):
+        files = _read_state(path)
+        if reset_shard is True:
+            files = {}
+        elif reset_shard:
+            files = {rel: rec for rel, rec in files.items() if not in_shard(rel, reset_shard)}
+        files.update(updates)
+        write_json_atomic(path, {"files": files})
+
+
+class FileState:
+    """Content hashes of files processed successfully, per batch name.
+
+    Shard processes of one batch share the state file; each write merges into
+    what is on disk, and reset() only clears the given shard's files.
+    """
+
+    def __init__(self, name: str, root: str, shard: Optional[Union[str, Tuple[int, int]]] = None) -> None:
+        self.path = os.path.join(_workspace_dir(root), "filemaps", f"{name}.json")
+        ensure_dir(os.path.dirname(self.path))
+        self.shard = shard
+        self._lock = threading.Lock()
+        flush_storage()  # records of a previous batch in this process may still be queued
+        self.files: Dict[str, Dict[str, Any]] = _read_state(self.path)
+
+    def changed(self, rel: str, path: str) -> bool:
+        rec = self.files.get(rel)
+        if rec is None:
+            return True
+        st = os.stat(path)
+        if rec.get("size") == st.st_size and rec.get("mtime_ns") == st.st_mtime_ns:
+            return False
+        # touched but maybe identical (checkout, formatter no-op)
+        return rec.get("hash") != file_hash(path)
+
+    def record(self, rel: str, path: str, run_id: Optional[str] = None) -> None:
+        st = os.stat(path)
+        rec = {"hash": file_hash(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns, "at": now_ms(), "run_id": run_id}
+        with self._lock:
+            self.files[rel] = rec
+        get_writer().submit(_merge_state, self.path, {rel: rec})
+
+    def reset(self) -> None:
+        with self._lock:
+            if self.shard is None:
+                self.files = {}
+            else:
+                self.files = {rel: rec for rel, rec in self.files.items() if not in_shard(rel, self.shard)}
+        get_writer().submit(_merge_state, self.path, {}, True if self.shard is None else self.shard)
+
+
+def _resolve_files(files: Union[str, Sequence[str], Callable[[], Iterable[str]]], root: str, min_lines: int) -> List[str]:
+    if callable(files):
+        return [os.path.abspath(os.path.join(root, p)) for p in files()]
+    if isinstance(files, str):
+        files = [files]
+    if any(ch in p for p in files for ch in "*?["):
+        return scan_files(root, files, min_lines=min_lines)
+    return [os.path.abspath(os.path.join(root, p)) for p in files]
+
+
+def map_files(
+    files: Union[str, Sequence[str], Callable[[], Iterable[str]]],
+    prompt_template: Union[str, Callable[[str], str]],
+    root: Optional[str] = None,
+    name: Optional[str] = None,
+    shard: Optional[Union[str, Tuple[int, int]]] = None,
+    min_lines: int = 0,
+    force: bool = False,
+    max_parallel: int = 1,
+    **run_kwargs: Any,
+) -> Dict[str, AgentRes]:
+    """
+    Run prompt_template once per file, skipping files unchanged since their last successful run.
+
+    files: glob pattern(s) for scan_files, explicit paths, or a walker returning paths.
+    prompt_template: "{path}"/"{relpath}" are replaced, or a callable(path) -> prompt.
+    name: key of the recorded hashes (default: derived from the template), so
+    different prompts over the same files are tracked separately.
+    force=True reprocesses everything. Extra kwargs go to run() (cwd defaults to root).
+
+    Returns results by absolute path for the files that were run.
+    """
+    root = os.path.abspath(root or run_kwargs.get("cwd") or os.getcwd())
+    if name is None:
+        seed = prompt_template if isinstance(prompt_template, str) else getattr(prompt_template, "__qualname__", "fn")
+        name = "map-" + hashlib.sha1(seed.encode("utf-8")).hexdigest()[:12]
+    state = FileState(name, root, shard)
+    if force:
+        state.reset()
+
+    todo: List[Tuple[str, str]] = []
+    skipped = 0
+    for path in _resolve_files(files, root, min_lines):
+        rel = os.path.relpath(path, root).replace(os.sep, "/")
+        if shard is not None and not in_shard(rel, shard):
+            continue
+        if not force and not state.changed(rel, path):
+            skipped += 1
+            continue
+        todo.append((rel, path))
+    logger.info("map_files %s: %d to process, %d unchanged%s", name, len(todo), skipped,
+                f", shard {shard}" if shard is not None else "")
+
+    run_kwargs.setdefault("cwd", root)
+    run_kwargs.setdefault("group", name)
+    if max_parallel > 1:
+        run_kwargs.setdefault("stream", False)  # concurrent token streams would interleave
+
+    def process(item: Tuple[str, str]) -> AgentRes:
+        rel, path = item
+        if callable(prompt_template):
+            prompt = prompt_template(path)
+        else:
+            prompt = prompt_template.replace("{path}", path).replace("{relpath}", rel)
+        logger.info("processing: %s", rel)
+        res = run(prompt, **run_kwargs)
+        if res.status == "success":
+            state.record(rel, path, (res.artifacts or {}).get("run_id"))
+        else:
+            logger.warning("map_files %s failed: %s status=%s", name, rel, res.status)
+        return res
+
+    results: Dict[str, AgentRes] = {}
+    if max_parallel > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_parallel) as pool:
+            for (rel, path), res in zip(todo, pool.map(bind(process), todo)):
+                results[path] = res
+    else:
+        for item in todo:
+            results[item[1]] = process(item)
+    return results
@@ -0,0 +1,164 @@
+"""
+Event hooks: react to agent events mid-run without touching ProgressPrinter.
+
+    on_event("turn.completed", lambda ev: print(ev["payload"]["usage"]))
+
+    @on_tool_call
+    def audit(name, ev):
+        print("tool:", name)
+
+    on_text(lambda text, ev: sys.stdout.write(text))
+    on_done(lambda res: notify(res.status))
+
+`on_event(type, cb)` subscribes to normalized events of one type ("*" for
+all), `on_tool_call(cb)` to tool calls as they start (codex items, claude
+tool_use blocks), `on_text(cb)` to every extracted text chunk and
+`on_done(cb)` to each finished CLI run (retries and loop iterations included).
+Every registration function returns cb, so it also works as a decorator;
+`remove_hook(cb)` unsubscribes.
+
+Callbacks are indexed by event type, so a callback only costs something for
+the events it subscribed to; with nothing registered the runner skips
+dispatch entirely. Registration swaps in a new immutable `Hooks` snapshot, and
+each run dispatches through the snapshot taken when it started. A callback
+that raises is logged and skipped; unlike run(on_event=...), it never aborts
+the run. Hooks fire in the process executing the run, so runs go in-process
+instead of through the `aibaton serve` daemon while any are registered.
+"""
+
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from .logger import logger
+
+if TYPE_CHECKING:
+    from .runner import AgentRes
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+EventHook = Callable[[Dict[str, Any]], None]
+ToolCallHook = Callable[[str, Dict[str, Any]], None]
+TextHook = Callable[[str, Dict[str, Any]], None]
+DoneHook = Callable[["AgentRes"], None]
+
+ANY = "*"
+
+
+def _call(cb: Callable[..., Any], *args: Any) -> None:
+    try:
+        cb(*args)
+    except Exception:
+        logger.exception("hook %s failed", getattr(cb, "__name__", cb))
+
+
+class Hooks:
+    __slots__ = ("by_type", "wildcard", "tool_call", "text", "done")
+
+    def __init__(
+        self,
+        by_type: Optional[Dict[str, Tuple[EventHook, ...]]] = None,
+        wildcard: Tuple[EventHook, ...] = (),
+        tool_call: Tuple[ToolCallHook, ...] = (),
+        text: Tuple[TextHook, ...] = (),
+        done: Tuple[DoneHook, ...] = (),
+    ) -> None:
+        self.by_type = by_type or {}
+        self.wildcard = wildcard
+        self.tool_call = tool_call
+        self.text = text
+        self.done = done
+
+    def __bool__(self) -> bool:
+        return bool(self.by_type or self.wildcard or self.tool_call or self.text or self.done)
+
+    def _replace(self, **changes: Any) -> "Hooks":
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return Hooks(**fields)
+
+    def emit_event(self, ev: Dict[str, Any]) -> None:
+        for cb in self.wildcard:
+            _call(cb, ev)
+        cbs = self.by_type.get(ev["type"])
+        if cbs:
+            for cb in cbs:
+                _call(cb, ev)
+
+    def emit_tool_call(self, name: str, ev: Dict[str, Any]) -> None:
+        for cb in self.tool_call:
+            _call(cb, name, ev)
+
+    def emit_text(self, text: str, ev: Dict[str, Any]) -> None:
+        for cb in self.text:
+            _call(cb, text, ev)
+
+    def emit_done(self, res: "AgentRes") -> None:
+        for cb in self.done:
+            _call(cb, res)
+
+
+_hooks = Hooks()
+_lock = threading.Lock()
+
+
+def get_hooks() -> Optional[Hooks]:
+    """Snapshot of the registered hooks, or None when there are none."""
+    hooks = _hooks
+    return hooks if hooks else None
+
+
+def on_event(event_type: str, cb: Optional[EventHook] = None) -> Any:
+    """Call cb(ev) for every normalized event of event_type ("*" for all)."""
+    if cb is None:
+        return lambda fn: on_event(event_type, fn)
+    global _hooks
+    with _lock:
+        if event_type == ANY:
+            _hooks = _hooks._replace(wildcard=_hooks.wildcard + (cb,))
+        else:
+            by_type = dict(_hooks.by_type)
+            by_type[event_type] = by_type.get(event_type, ()) + (cb,)
+            _hooks = _hooks._replace(by_type=by_type)
+    return cb
+
+
+def _add(field: str, cb: F) -> F:
+    global _hooks
+    with _lock:
+        _hooks = _hooks._replace(**{field: getattr(_hooks, field) + (cb,)})
+    return cb
+
+
+def on_tool_call(cb: ToolCallHook) -> ToolCallHook:
+    """Call cb(name, ev) when the agent starts a tool call."""
+    return _add("tool_call", cb)
+
+
+def on_text(cb: TextHook) -> TextHook:
+    """Call cb(text, ev) for every text chunk extracted from the event stream."""
+    return _add("text", cb)
+
+
+def on_done(cb: DoneHook) -> DoneHook:
+    """Call cb(res) with the AgentRes of every finished CLI run."""
+    return _add("done", cb)
+
+
+def remove_hook(cb: Callable[..., Any]) -> None:
+    """Unsubscribe cb from everything it was registered for."""
+    global _hooks
+    with _lock:
+        by_type = {t: tuple(c for c in cbs if c is not cb) for t, cbs in _hooks.by_type.items()}
+        _hooks = Hooks(
+            by_type={t: cbs for t, cbs in by_type.items() if cbs},
+            wildcard=tuple(c for c in _hooks.wildcard if c is not cb),
+            tool_call=tuple(c for c in _hooks.tool_call if c is not cb),
+            text=tuple(c for c in _hooks.text if c is not cb),
+            done=tuple(c for c in _hooks.done if c is not cb),
+        )
+
+
+def clear_hooks() -> None:
+    global _hooks
+    with _lock:
+        _hooks = Hooks()
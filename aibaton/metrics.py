@@ -0,0 +1,309 @@
+"""
+Prometheus-format metrics for long-running workflow hosts.
+
+Nothing is recorded until metrics are enabled:
+
+    enable_metrics(port=9464)                                  # GET http://127.0.0.1:9464/metrics
+    enable_metrics(path="/var/lib/node_exporter/aibaton.prom")  # rewritten every interval_s
+
+or AIBATON_METRICS_PORT / AIBATON_METRICS_FILE in the environment, or
+`aibaton serve --metrics-port 9464`. The runner, process tracking, scheduler
+and storage writer feed the registry; while disabled the `inc`/`observe`
+helpers return after one global lookup.
+
+    aibaton_runs_started_total{provider}             CLI runs started (retries included)
+    aibaton_runs_completed_total{provider,status}    CLI runs finished
+    aibaton_run_duration_seconds{provider}           histogram of run wall time
+    aibaton_runs_active{provider}                    CLI runs in flight
+    aibaton_tokens_total{provider,kind}              input / cached_input / output tokens
+    aibaton_retries_total{provider,reason}           prompt_as_arg / home_fallback retries
+    aibaton_queue_wait_seconds{provider}             histogram of rate-limit queue waits
+    aibaton_queue_depth{provider}                    runs waiting in the rate-limit queue
+    aibaton_processes_active                         live child process groups
+    aibaton_storage_pending                          tasks queued on the storage writer
+    aibaton_storage_bytes_written_total{file}        bytes written for run artifacts
+"""
+
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from .logger import logger
+from .utils import write_text_atomic
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+METRICS_PORT_ENV = "AIBATON_METRICS_PORT"
+METRICS_FILE_ENV = "AIBATON_METRICS_FILE"
+
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+WAIT_BUCKETS = (0.1, 0.5, 1, 5, 15, 30, 60, 300, 900)
+
+_Labels = Tuple[Tuple[str, str], ...]
+
+# name -> (type, help, histogram buckets)
+_DEFS: Dict[str, Tuple[str, str, Tuple[float, ...]]] = {
+    "aibaton_runs_started_total": ("counter", "CLI runs started, retries included.", ()),
+    "aibaton_runs_completed_total": ("counter", "CLI runs finished, by status.", ()),
+    "aibaton_run_duration_seconds": ("histogram", "Wall time of CLI runs.", DURATION_BUCKETS),
+    "aibaton_runs_active": ("gauge", "CLI runs in flight.", ()),
+    "aibaton_tokens_total": ("counter", "Tokens reported by providers.", ()),
+    "aibaton_retries_total": ("counter", "Runs retried with a different invocation.", ()),
+    "aibaton_queue_wait_seconds": ("histogram", "Time spent waiting in the rate-limit queue.", WAIT_BUCKETS),
+    "aibaton_queue_depth": ("gauge", "Runs waiting in the rate-limit queue.", ()),
+    "aibaton_processes_active": ("gauge", "Live child process groups.", ()),
+    "aibaton_storage_pending": ("gauge", "Tasks queued on the storage writer.", ()),
+    "aibaton_storage_bytes_written_total": ("counter", "Bytes written for run artifacts.", ()),
+}
+
+
+def _key(labels: Dict[str, Any]) -> _Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(labels: _Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for k, v in items)
+    return "{" + body + "}"
+
+
+def _fmt_num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: Dict[str, Dict[_Labels, Any]] = {name: {} for name in _DEFS}
+        self._collectors: List[Callable[["Registry"], None]] = []
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = _key(labels)
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[name][_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = _key(labels)
+        with self._lock:
+            series = self._values[name]
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(_DEFS[name][2])
+            hist.observe(value)
+
+    def add_collector(self, fn: Callable[["Registry"], None]) -> None:
+        """fn(registry) runs before every render to refresh sampled gauges."""
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        for fn in self._collectors:
+            try:
+                fn(self)
+            except Exception:
+                logger.exception("metrics collector failed")
+        out: List[str] = []
+        with self._lock:
+            for name, (kind, help_text, _) in _DEFS.items():
+                series = self._values[name]
+                out.append(f"# HELP {name} {help_text}")
+                out.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(series.items()):
+                    if kind != "histogram":
+                        out.append(f"{name}{_fmt_labels(labels)} {_fmt_num(value)}")
+                        continue
+                    for bound, n in zip(value.buckets, value.counts):
+                        out.append(f"{name}_bucket{_fmt_labels(labels, ('le', _fmt_num(bound)))} {n}")
+                    out.append(f"{name}_bucket{_fmt_labels(labels, ('le', '+Inf'))} {value.count}")
+                    out.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_num(round(value.sum, 6))}")
+                    out.append(f"{name}_count{_fmt_labels(labels)} {value.count}")
+        return "\n".join(out) + "\n"
+
+
+def _collect_builtin(reg: Registry) -> None:
+    from .proctree import live_count
+    from .scheduler import get_scheduler
+    from .storage import get_writer
+
+    reg.set("aibaton_processes_active", live_count())
+    reg.set("aibaton_storage_pending", get_writer().pending())
+    for provider, stats in get_scheduler().stats().items():
+        reg.set("aibaton_queue_depth", stats["waiting"], provider=provider)
+
+
+_registry: Optional[Registry] = None
+_server: Optional["ThreadingHTTPServer"] = None
+_dumper: Optional[threading.Event] = None
+_enable_lock = threading.Lock()
+
+
+def get_registry() -> Optional[Registry]:
+    return _registry
+
+
+def inc(name: str, value: float = 1, **labels: Any) -> None:
+    """Add to a counter, or to a gauge when value is negative."""
+    reg = _registry
+    if reg is not None:
+        reg.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    reg = _registry
+    if reg is not None:
+        reg.observe(name, value, **labels)
+
+
+def render_metrics() -> str:
+    """Current metrics in Prometheus text format ("" while disabled)."""
+    reg = _registry
+    return reg.render() if reg is not None else ""
+
+
+def _make_server(host: str, port: int) -> "ThreadingHTTPServer":
+    # http.server is imported here: it is slow to import and most processes never serve metrics
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = render_metrics().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt: str, *args: Any) -> None:
+            logger.debug("metrics http: " + fmt, *args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def _dump(path: str) -> None:
+    write_text_atomic(path, render_metrics())  # textfile collectors must never see a partial file
+
+
+def _dump_loop(path: str, interval_s: float, stop: threading.Event) -> None:
+    while not stop.wait(interval_s):
+        try:
+            _dump(path)
+        except OSError as e:
+            logger.warning("metrics dump failed: %s: %s", path, e)
+
+
+def enable_metrics(
+    port: Optional[int] = None,
+    path: Optional[str] = None,
+    host: str = "127.0.0.1",
+    interval_s: float = 15.0,
+) -> Registry:
+    """Start recording; serve /metrics on host:port and/or rewrite path every interval_s."""
+    global _registry, _server, _dumper
+    with _enable_lock:
+        if _registry is None:
+            reg = Registry()
+            reg.add_collector(_collect_builtin)
+            _registry = reg
+        if port is not None and _server is None:
+            _server = _make_server(host, port)
+            threading.Thread(target=_server.serve_forever, name="aibaton-metrics", daemon=True).start()
+            logger.info("metrics: http://%s:%d/metrics", host, _server.server_address[1])
+        if path is not None:
+            if _dumper is not None:
+                _dumper.set()
+            path = os.path.abspath(path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _dump(path)
+            _dumper = threading.Event()
+            threading.Thread(target=_dump_loop, args=(path, interval_s, _dumper),
+                             name="aibaton-metrics-dump", daemon=True).start()
+            logger.info("metrics: dumping to %s every %ss", path, interval_s)
+        return _registry
+
+
+def metrics_port() -> Optional[int]:
+    """Port of the HTTP endpoint, if one is running."""
+    return _server.server_address[1] if _server is not None else None
+
+
+def disable_metrics() -> None:
+    global _registry, _server, _dumper
+    with _enable_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
+        if _dumper is not None:
+            _dumper.set()
+            _dumper = None
+        _registry = None
+
+
+def record_run(provider: str, status: str, elapsed_ms: int, usage: Optional[Dict[str, Any]]) -> None:
+    reg = _registry
+    if reg is None:
+        return
+    reg.inc("aibaton_runs_completed_total", provider=provider, status=status)
+    reg.observe("aibaton_run_duration_seconds", elapsed_ms / 1000.0, provider=provider)
+    if usage:
+        cached = usage.get("cached_input_tokens", 0)
+        for kind, value in (("input", usage.get("input_tokens", 0) - cached), ("cached_input", cached),
+                            ("output", usage.get("output_tokens", 0))):
+            if value:
+                reg.inc("aibaton_tokens_total", value, provider=provider, kind=kind)
+
+
+def record_write(path: str) -> None:
+    """Count the size of a run artifact just written to path."""
+    reg = _registry
+    if reg is None:
+        return
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return
+    reg.inc("aibaton_storage_bytes_written_total", size, file=os.path.basename(path))
+
+
+def _from_env() -> None:
+    port = os.environ.get(METRICS_PORT_ENV)
+    path = os.environ.get(METRICS_FILE_ENV)
+    if port or path:
+        try:
+            enable_metrics(port=int(port) if port else None, path=path or None)
+        except (OSError, ValueError) as e:
+            logger.warning("metrics not enabled: %s", e)
+
+
+_from_env()
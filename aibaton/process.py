@@ -1,17 +1,26 @@
 import codecs
+import collections
 import locale
 import os
 import queue
+import re
 import selectors
+import signal
 import subprocess
+import tempfile
 import threading
 import time
 import sys
+import weakref
 from dataclasses import dataclass
-from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Pattern, Sequence, Union
 
 from .events import normalize_event
 from .logger import logger
+from .proctree import ResourceLimits, kill_tree, poll_child, popen_kwargs, track, untrack, wait_child
+
+if TYPE_CHECKING:
+    from .reactor import ProcessManager
 
 
 _QUEUE_DONE = object()
@@ -28,6 +37,185 @@ class ProcessResult:
     events: List[Dict[str, Any]]
     elapsed_ms: int
     pid: Optional[int]
+    # bounded mode (max_lines): output/stdout/stderr/events hold only the tail,
+    # the full streams are spilled to these temp files (removed with the
+    # handle and its results unless keep_spill=True, see cleanup())
+    stdout_path: Optional[str] = None
+    stderr_path: Optional[str] = None
+    truncated: bool = False
+    # wait4 resource usage of the child and the descendants it reaped:
+    # user_s, sys_s, max_rss_kb, inblock, oublock, nvcsw, nivcsw
+    rusage: Optional[Dict[str, Any]] = None
+    # encoding the streams were decoded with; spill files hold the raw bytes
+    encoding: Optional[str] = None
+
+    def read_stdout(self) -> str:
+        return _read_spill(self.stdout_path, self.stdout, self.encoding)
+
+    def read_stderr(self) -> str:
+        return _read_spill(self.stderr_path, self.stderr, self.encoding)
+
+    def iter_lines(self, stream: str = "stdout") -> Iterator[str]:
+        """Iterate the full stream line by line without loading it into memory."""
+        path = self.stdout_path if stream == "stdout" else self.stderr_path
+        if not path:
+            text = self.stdout if stream == "stdout" else self.stderr
+            yield from text.splitlines(keepends=True)
+            return
+        with open(path, "r", encoding=self.encoding or "utf-8", errors="replace") as f:
+            yield from f
+
+    def cleanup(self) -> None:
+        """Delete the spill files now; this result keeps only the tail afterwards."""
+        owner = getattr(self, "_spill_owner", None)
+        if owner is not None:
+            owner.cleanup()
+        else:
+            _remove_files([p for p in (self.stdout_path, self.stderr_path) if p])
+        self.stdout_path = self.stderr_path = None
+
+
+def _read_spill(path: Optional[str], fallback: str, encoding: Optional[str]) -> str:
+    if not path:
+        return fallback
+    with open(path, "r", encoding=encoding or "utf-8", errors="replace") as f:
+        return f.read()
+
+
+def _remove_files(paths: List[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class _SpillFiles:
+    """
+    Owner of a bounded process's spill files. The handle and every
+    ProcessResult built from it hold a reference; the files are deleted on
+    cleanup() or once the last of them is garbage-collected.
+    """
+
+    def __init__(self, paths: List[str]) -> None:
+        self._finalizer = weakref.finalize(self, _remove_files, list(paths))
+
+    def cleanup(self) -> None:
+        self._finalizer()
+
+
+def _own_spill(result: ProcessResult) -> ProcessResult:
+    """Tie the spill files named by result to its lifetime."""
+    paths = [p for p in (result.stdout_path, result.stderr_path) if p]
+    if paths:
+        result._spill_owner = _SpillFiles(paths)  # type: ignore[attr-defined]
+    return result
+
+
+PatternLike = Union[str, Pattern[str]]
+
+
+class _Watch:
+    def __init__(
+        self,
+        patterns: List[Pattern[str]],
+        callback: Optional[Callable[[Any, Dict[str, Any]], None]],
+        once: bool,
+        kill: bool,
+        stream: Optional[str],
+    ) -> None:
+        self.patterns = patterns
+        self.callback = callback
+        self.once = once
+        self.kill = kill
+        self.stream = stream
+        self.match: Any = None
+        self.fired = threading.Event()
+
+    def search(self, stream: str, line: str) -> Any:
+        if self.stream is not None and self.stream != stream:
+            return None
+        for pat in self.patterns:
+            m = pat.search(line)
+            if m:
+                return m
+        return None
+
+
+class _LineMatcher:
+    """
+    Output pattern watches of one handle.
+
+    All patterns are folded into one alternation that is tried first on every
+    line; only lines it accepts are re-checked against the individual watches,
+    so the common no-match case costs a single regex search per line.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._watches: List[_Watch] = []
+        self._combined: Optional[Pattern[str]] = None
+        self._exact = False  # combined could not be built; check watches directly
+
+    def __bool__(self) -> bool:
+        return bool(self._watches)
+
+    def _rebuild(self) -> None:
+        self._combined = None
+        self._exact = True
+        pats = [pat for w in self._watches for pat in w.patterns]
+        # flags can't be mixed in one alternation, and joining shifts group
+        # numbers, which breaks backreferences like (x)\1
+        if not pats or any(pat.flags & ~re.UNICODE or pat.groups for pat in pats):
+            return
+        try:
+            self._combined = re.compile("|".join(f"(?:{pat.pattern})" for pat in pats))
+            self._exact = False
+        except re.error:
+            # e.g. duplicate group names across patterns
+            pass
+
+    def add(self, watch: _Watch) -> None:
+        with self._lock:
+            self._watches = self._watches + [watch]
+            self._rebuild()
+
+    def remove(self, watch: _Watch) -> None:
+        with self._lock:
+            self._watches = [w for w in self._watches if w is not watch]
+            self._rebuild()
+
+    def feed(self, stream: str, line: str) -> List[_Watch]:
+        watches = self._watches
+        combined = self._combined
+        if not watches or (not self._exact and (combined is None or not combined.search(line))):
+            return []
+        fired = []
+        for w in watches:
+            if w.once and w.fired.is_set():
+                continue
+            m = w.search(stream, line)
+            if m is None:
+                continue
+            w.match = m
+            fired.append(w)
+            if w.once:
+                w.fired.set()
+                self.remove(w)
+        return fired
+
+    def close(self) -> None:
+        with self._lock:
+            watches, self._watches = self._watches, []
+            self._combined = None
+        for w in watches:
+            w.fired.set()
+
+
+def _compile_patterns(patterns: Union[PatternLike, Sequence[PatternLike]]) -> List[Pattern[str]]:
+    if isinstance(patterns, (str, re.Pattern)):
+        patterns = [patterns]
+    return [p if isinstance(p, re.Pattern) else re.compile(p) for p in patterns]
 
 
 class ProcessHandle:
@@ -40,6 +228,14 @@ class ProcessHandle:
         shell: Optional[bool],
         encoding: Optional[str],
         errors: str,
+        max_lines: Optional[int] = None,
+        spill_dir: Optional[str] = None,
+        manager: Optional["ProcessManager"] = None,
+        limits: Optional[ResourceLimits] = None,
+        stdin: Any = None,
+        pipe_stdout: Union[bool, str] = False,
+        keep_spill: bool = False,
+        detach: bool = False,
     ) -> None:
         if isinstance(cmd, str):
             self._cmd = cmd
@@ -53,42 +249,164 @@ class ProcessHandle:
 
         self._start = time.monotonic()
         self._timeout_s = timeout_s
-        self._events: List[Dict[str, Any]] = []
+        self._max_lines = max_lines
+        self._events: Union[List[Dict[str, Any]], Deque[Dict[str, Any]]]
+        if max_lines:
+            # bounded mode keeps only the event ring; text tails are derived from it
+            self._events = collections.deque(maxlen=max_lines)
+        else:
+            self._events = []
         self._stdout_parts: List[str] = []
         self._stderr_parts: List[str] = []
         self._merged_parts: List[str] = []
+        self._spill: Dict[str, Any] = {}
+        self._spill_paths: Dict[str, str] = {}
+        self._spill_owner: Optional[_SpillFiles] = None
+        self._line_count = 0
         self._text_buffers: Dict[str, str] = {"stdout": "", "stderr": ""}
         self._status = "success"
         self._returncode: Optional[int] = None
         self._elapsed_ms = 0
+        self._rusage: Optional[Dict[str, Any]] = None
         self._lock = threading.Lock()
         self._done = threading.Event()
-        self._queue: "queue.Queue[object]" = queue.Queue()
+        self._queue: "queue.Queue[object]" = queue.Queue(maxsize=max_lines or 0)
+        # set while a caller is reading events; a full bounded queue then blocks
+        # the reader (back-pressure) instead of dropping the oldest event
+        self._consuming = False
+        # reactor mode: events that did not fit while a consumer is reading;
+        # the manager stops reading this handle until they are drained
+        self._manager = manager
+        self._backlog: Deque[object] = collections.deque()
+        self._backlog_lock = threading.Lock()
+        self._paused = False
+        self._matcher = _LineMatcher()
+        if max_lines:
+            for stream in ("stdout", "stderr"):
+                fd, path = tempfile.mkstemp(prefix=f"aibaton-{stream}-", suffix=".log", dir=spill_dir)
+                self._spill[stream] = os.fdopen(fd, "wb")
+                self._spill_paths[stream] = path
+            if not keep_spill:
+                self._spill_owner = _SpillFiles(list(self._spill_paths.values()))
 
         enc = encoding or locale.getpreferredencoding(False)
+        self._encoding = enc
         self._decoders = {
             "stdout": codecs.getincrementaldecoder(enc)(errors=errors),
             "stderr": codecs.getincrementaldecoder(enc)(errors=errors),
         }
 
+        # pipe_stdout=True: stdout is left unread for a downstream process (OS-level
+        # pipe, no copy through Python); "tee": observed as usual and also copied
+        # into a pipe for the downstream process
+        self._pipe_stdout = pipe_stdout
+        self._stdout_taken = False
+        self._tee_r: Optional[int] = None
+        self._tee_w: Optional[int] = None
+        # under a manager the tee end is non-blocking: bytes the downstream
+        # process can't take yet wait in _tee_pending while the reactor stops
+        # reading this stdout, so a slow consumer never stalls other handles
+        self._tee_pending = bytearray()
+        self._tee_blocked = False
+        if pipe_stdout == "tee":
+            self._tee_r, self._tee_w = os.pipe()
+            if manager is not None:
+                os.set_blocking(self._tee_w, False)
+
+        popen_stdin, feed, close_after = self._resolve_stdin(stdin)
         self._proc = subprocess.Popen(
             popen_cmd,
+            stdin=popen_stdin,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             bufsize=0,
             cwd=cwd,
             env=env,
             shell=shell,
+            **popen_kwargs(limits),
         )
+        if not detach:
+            track(self._proc)
         logger.debug("process started: pid=%s cmd=%s", self._proc.pid, popen_cmd)
-
-        self._thread = threading.Thread(target=self._reader_loop, daemon=True)
-        self._thread.start()
+        for obj in close_after:
+            # the child holds its own copy of the upstream pipe end now
+            if isinstance(obj, int):
+                os.close(obj)
+            else:
+                obj.close()
+        if feed is not None:
+            threading.Thread(target=self._feed_stdin, args=(feed,), daemon=True).start()
+
+        self._thread: Optional[threading.Thread] = None
+        if manager is not None:
+            manager._register(self)
+        else:
+            self._thread = threading.Thread(target=self._reader_loop, daemon=True)
+            self._thread.start()
+
+    def _resolve_stdin(self, stdin: Any):
+        """Map the `stdin` argument to (Popen stdin, chunks to feed, fds to close after spawn)."""
+        if stdin is None:
+            return None, None, []
+        if stdin is True or stdin is subprocess.PIPE:
+            return subprocess.PIPE, None, []
+        if isinstance(stdin, (bytes, bytearray, str)):
+            return subprocess.PIPE, [stdin], []
+        if isinstance(stdin, ProcessHandle):
+            src = stdin._take_stdout()
+            return src, None, [src]
+        if isinstance(stdin, int) or hasattr(stdin, "fileno"):
+            return stdin, None, []
+        if isinstance(stdin, Iterable):
+            return subprocess.PIPE, stdin, []
+        raise TypeError(f"unsupported stdin: {type(stdin).__name__}")
+
+    def _take_stdout(self) -> Any:
+        """Hand this process's stdout pipe to a downstream process (once)."""
+        if not self._pipe_stdout:
+            raise ValueError("upstream process must be started with pipe_stdout=True or 'tee'")
+        if self._stdout_taken:
+            raise ValueError("stdout of this process is already connected")
+        self._stdout_taken = True
+        if self._pipe_stdout == "tee":
+            return self._tee_r
+        return self._proc.stdout
+
+    def _feed_stdin(self, chunks: Iterable[Any]) -> None:
+        try:
+            for chunk in chunks:
+                self.write(chunk)
+        except (BrokenPipeError, ValueError, OSError) as e:
+            logger.debug("stdin feed stopped: pid=%s err=%s", self._proc.pid, e)
+        finally:
+            self.close_stdin()
+
+    def write(self, data: Union[bytes, str]) -> None:
+        """Write to the process stdin (start it with stdin=subprocess.PIPE or True)."""
+        pipe = self._proc.stdin
+        if pipe is None:
+            raise ValueError("process stdin is not a pipe")
+        buf = memoryview(data.encode(self._encoding) if isinstance(data, str) else data)
+        while buf:
+            n = pipe.write(buf)
+            buf = buf[n or 0:]
+
+    def close_stdin(self) -> None:
+        pipe = self._proc.stdin
+        if pipe is not None and not pipe.closed:
+            try:
+                pipe.close()
+            except OSError:
+                pass
 
     @property
     def pid(self) -> Optional[int]:
         return self._proc.pid
 
+    def detach(self) -> None:
+        """Let the process group outlive this interpreter (it is no longer killed at exit)."""
+        untrack(self._proc)
+
     @property
     def status(self) -> str:
         with self._lock:
@@ -100,72 +418,173 @@ class ProcessHandle:
             return self._returncode
 
     def is_running(self) -> bool:
-        return self._proc.poll() is None and not self._done.is_set()
+        # no Popen.poll() here: the reader reaps the child itself to collect rusage
+        return self._proc.returncode is None and not self._done.is_set()
+
+    def expect(
+        self,
+        pattern: Union[PatternLike, Sequence[PatternLike]],
+        timeout: Optional[float] = None,
+        stream: Optional[str] = None,
+    ) -> Optional["re.Match[str]"]:
+        """
+        Block until an output line matches (e.g. "listening on"), event-driven.
+
+        Lines already received count too. Returns the match, or None on timeout
+        or when the process exits first.
+        """
+        watch = _Watch(_compile_patterns(pattern), None, once=True, kill=False, stream=stream)
+        with self._lock:
+            history = list(self._events)
+            self._matcher.add(watch)
+        for ev in history:
+            payload = ev.get("payload") or {}
+            line = payload.get("text") if payload.get("stream") == "stdout" else payload.get("message")
+            m = watch.search(payload.get("stream") or "stdout", line or "")
+            if m is not None:
+                self._matcher.remove(watch)
+                return m
+        if self._done.is_set():
+            self._matcher.remove(watch)
+            return watch.match
+        watch.fired.wait(timeout)
+        self._matcher.remove(watch)
+        return watch.match
+
+    def on_match(
+        self,
+        patterns: Union[PatternLike, Sequence[PatternLike]],
+        callback: Optional[Callable[[Any, Dict[str, Any]], None]] = None,
+        kill: bool = False,
+        once: bool = False,
+        stream: Optional[str] = None,
+    ) -> _Watch:
+        """
+        Call `callback(match, event)` on the reader thread for each matching line.
+
+        With kill=True the process tree is killed on the first match and the
+        result status becomes "error" (fail-fast on fatal output). Returns a
+        token for `remove_match()`.
+        """
+        watch = _Watch(_compile_patterns(patterns), callback, once=once or kill, kill=kill, stream=stream)
+        self._matcher.add(watch)
+        return watch
+
+    def remove_match(self, watch: _Watch) -> None:
+        self._matcher.remove(watch)
+
+    def _on_line_match(self, watches: List[_Watch], ev: Dict[str, Any]) -> None:
+        for w in watches:
+            if w.callback is not None:
+                try:
+                    w.callback(w.match, ev)
+                except Exception:
+                    logger.exception("on_match callback failed: pid=%s", self._proc.pid)
+            if w.kill and self._proc.returncode is None:
+                logger.warning("fatal output matched, killing: pid=%s line=%s", self._proc.pid, w.match.string)
+                kill_tree(self._proc)
 
     def kill(self) -> None:
         self._set_status("killed")
         logger.debug("process killed: pid=%s", self._proc.pid)
-        try:
-            self._proc.kill()
-        except Exception:
-            pass
+        kill_tree(self._proc)
 
     def terminate(self) -> None:
         self._set_status("killed")
         logger.debug("process terminated: pid=%s", self._proc.pid)
-        try:
-            self._proc.terminate()
-        except Exception:
-            pass
+        kill_tree(self._proc, signal.SIGTERM)
 
     def wait(self, timeout: Optional[float] = None) -> Optional[ProcessResult]:
+        self._consuming = False
+        self._drain_backlog(force=True)
         if timeout is not None and not self._done.wait(timeout):
             return None
         self._done.wait()
         return self.result()
 
     def result(self) -> ProcessResult:
+        self._consuming = False
+        self._drain_backlog(force=True)
         self._done.wait()
         with self._lock:
-            return ProcessResult(
-                cmd=self._cmd if isinstance(self._cmd, list) else str(self._cmd),
+            cmd = self._cmd if isinstance(self._cmd, list) else str(self._cmd)
+            if not self._max_lines:
+                return ProcessResult(
+                    cmd=cmd,
+                    status=self._status,
+                    returncode=self._returncode,
+                    output="".join(self._merged_parts),
+                    stdout="".join(self._stdout_parts),
+                    stderr="".join(self._stderr_parts),
+                    events=list(self._events),
+                    elapsed_ms=self._elapsed_ms,
+                    pid=self._proc.pid,
+                    rusage=self._rusage,
+                    encoding=self._encoding,
+                )
+            tail = {"stdout": [], "stderr": [], "merged": []}  # type: Dict[str, List[str]]
+            for ev in self._events:
+                payload = ev.get("payload") or {}
+                line = (payload.get("text") or payload.get("message") or "") + "\n"
+                tail[payload.get("stream") or "stdout"].append(line)
+                tail["merged"].append(line)
+            res = ProcessResult(
+                cmd=cmd,
                 status=self._status,
                 returncode=self._returncode,
-                output="".join(self._merged_parts),
-                stdout="".join(self._stdout_parts),
-                stderr="".join(self._stderr_parts),
+                output="".join(tail["merged"]),
+                stdout="".join(tail["stdout"]),
+                stderr="".join(tail["stderr"]),
                 events=list(self._events),
                 elapsed_ms=self._elapsed_ms,
                 pid=self._proc.pid,
+                stdout_path=self._spill_paths.get("stdout"),
+                stderr_path=self._spill_paths.get("stderr"),
+                truncated=self._line_count > len(self._events),
+                rusage=self._rusage,
+                encoding=self._encoding,
             )
+            if self._spill_owner is not None:
+                res._spill_owner = self._spill_owner  # type: ignore[attr-defined]
+            return res
 
     def poll_events(self) -> List[Dict[str, Any]]:
+        self._consuming = True
         items: List[Dict[str, Any]] = []
-        while True:
-            try:
-                ev = self._queue.get_nowait()
-            except queue.Empty:
-                break
-            if ev is _QUEUE_DONE:
-                self._queue.put(_QUEUE_DONE)
-                break
-            if isinstance(ev, dict):
-                items.append(ev)
+        try:
+            while True:
+                try:
+                    ev = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if ev is _QUEUE_DONE:
+                    self._queue.put(_QUEUE_DONE)
+                    break
+                if isinstance(ev, dict):
+                    items.append(ev)
+                self._drain_backlog()
+        finally:
+            self._consuming = False
         return items
 
     def iter_events(self, timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
-        while True:
-            try:
-                ev = self._queue.get(timeout=timeout)
-            except queue.Empty:
-                if self._done.is_set():
+        self._consuming = True
+        try:
+            while True:
+                try:
+                    ev = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    if self._done.is_set():
+                        break
+                    continue
+                self._drain_backlog()
+                if ev is _QUEUE_DONE:
+                    self._queue.put(_QUEUE_DONE)
                     break
-                continue
-            if ev is _QUEUE_DONE:
-                self._queue.put(_QUEUE_DONE)
-                break
-            if isinstance(ev, dict):
-                yield ev
+                if isinstance(ev, dict):
+                    yield ev
+        finally:
+            self._consuming = False
 
     def watch(self, stream: bool = True) -> ProcessResult:
         for ev in self.iter_events():
@@ -179,23 +598,92 @@ class ProcessHandle:
                 return
             self._status = status
 
+    def _put_event(self, ev: object) -> None:
+        if not self._max_lines:
+            self._queue.put(ev)
+            return
+        if self._manager is not None:
+            self._offer_event(ev)
+            return
+        while True:
+            try:
+                self._queue.put_nowait(ev)
+                return
+            except queue.Full:
+                pass
+            if self._consuming and self._status not in ("timeout", "killed"):
+                try:
+                    self._queue.put(ev, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+            # nobody is reading: keep the newest events
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+
+    def _offer_event(self, ev: object) -> None:
+        # the shared reactor thread must never block on one handle's queue
+        with self._backlog_lock:
+            if not self._backlog:
+                try:
+                    self._queue.put_nowait(ev)
+                    return
+                except queue.Full:
+                    pass
+            if self._consuming and self._status not in ("timeout", "killed"):
+                self._backlog.append(ev)
+                if not self._paused and self._manager is not None:
+                    self._paused = True
+                    self._manager._pause(self)
+                return
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._queue.put_nowait(ev)
+
+    def _drain_backlog(self, force: bool = False) -> None:
+        if not self._backlog:
+            return
+        with self._backlog_lock:
+            while self._backlog:
+                try:
+                    self._queue.put_nowait(self._backlog[0])
+                except queue.Full:
+                    if not force:
+                        break
+                    try:
+                        self._queue.get_nowait()
+                    except queue.Empty:
+                        pass
+                    continue
+                self._backlog.popleft()
+            if not self._backlog and self._paused and self._manager is not None:
+                self._paused = False
+                self._manager._resume(self)
+
     def _record(self, stream: str, line: str, raw_line: str) -> None:
         if stream == "stdout":
             raw = {"type": "message", "text": line, "stream": "stdout", "pid": self._proc.pid}
-            ev = normalize_event(raw, "process")
-            with self._lock:
-                self._events.append(ev)
-                self._stdout_parts.append(raw_line)
-                self._merged_parts.append(raw_line)
-            self._queue.put(ev)
         else:
             raw = {"type": "error", "message": line, "stream": "stderr", "pid": self._proc.pid}
-            ev = normalize_event(raw, "process")
-            with self._lock:
-                self._events.append(ev)
-                self._stderr_parts.append(raw_line)
+        ev = normalize_event(raw, "process")
+        with self._lock:
+            self._events.append(ev)
+            self._line_count += 1
+            if not self._max_lines:
+                if stream == "stdout":
+                    self._stdout_parts.append(raw_line)
+                else:
+                    self._stderr_parts.append(raw_line)
                 self._merged_parts.append(raw_line)
-            self._queue.put(ev)
+        if self._matcher:
+            fired = self._matcher.feed(stream, line)
+            if fired:
+                self._on_line_match(fired, ev)
+        self._put_event(ev)
 
     def _process_text(self, stream: str, text: str) -> None:
         if not text:
@@ -220,20 +708,115 @@ class ProcessHandle:
                 self._record(stream, remaining, remaining)
                 self._text_buffers[stream] = ""
 
+    def _check_timeout(self) -> None:
+        if self._timeout_s is None or (time.monotonic() - self._start) <= self._timeout_s:
+            return
+        if self._status in ("timeout", "killed"):
+            return
+        self._set_status("timeout")
+        logger.warning("process timeout: pid=%s timeout_s=%s", self._proc.pid, self._timeout_s)
+        self.kill()
+
+    def _poll_exit(self) -> bool:
+        rc, usage = poll_child(self._proc)
+        if usage is not None:
+            self._rusage = usage
+        return rc is not None
+
+    def _stream_name(self, fileobj: Any) -> str:
+        return "stdout" if fileobj is self._proc.stdout else "stderr"
+
+    def _on_data(self, stream: str, data: bytes) -> None:
+        if self._tee_w is not None and stream == "stdout":
+            self._write_tee(data)
+        spill = self._spill.get(stream)
+        if spill is not None:
+            spill.write(data)
+        text = self._decoders[stream].decode(data)
+        self._process_text(stream, text)
+
+    def _write_tee(self, data: bytes) -> None:
+        if self._manager is not None:
+            self._tee_pending += data
+            if self._tee_blocked:
+                return
+            state = self._flush_tee()
+            if state == "blocked":
+                self._tee_blocked = True
+                self._manager._tee_wait(self)
+            elif state == "error":
+                self._close_tee()
+            return
+        buf = memoryview(data)
+        try:
+            while buf:
+                buf = buf[os.write(self._tee_w, buf):]
+        except OSError:
+            # downstream exited; stop copying
+            self._close_tee()
+
+    def _flush_tee(self) -> str:
+        """Write pending tee bytes without blocking: "drained", "blocked" or "error"."""
+        try:
+            while self._tee_pending:
+                n = os.write(self._tee_w, self._tee_pending)
+                del self._tee_pending[:n]
+        except BlockingIOError:
+            return "blocked"
+        except OSError:
+            # downstream exited; stop copying
+            self._tee_pending.clear()
+            return "error"
+        return "drained"
+
+    def _close_tee(self) -> None:
+        if self._tee_w is not None:
+            try:
+                os.close(self._tee_w)
+            except OSError:
+                pass
+            self._tee_w = None
+
+    def _observed_pipes(self) -> Dict[str, Any]:
+        pipes = {"stdout": self._proc.stdout, "stderr": self._proc.stderr}
+        if self._pipe_stdout is True:
+            del pipes["stdout"]
+        return {k: v for k, v in pipes.items() if v is not None}
+
+    def _finish(self) -> None:
+        self._close_tee()
+        self._flush_buffers()
+        for spill in self._spill.values():
+            spill.close()
+        rc, usage = wait_child(self._proc, timeout=1)
+        if usage is not None:
+            self._rusage = usage
+        untrack(self._proc)
+        elapsed_ms = int((time.monotonic() - self._start) * 1000)
+        with self._lock:
+            self._returncode = rc
+            self._elapsed_ms = elapsed_ms
+            if self._status not in ("timeout", "killed"):
+                if rc not in (0, None):
+                    self._status = "error"
+                    logger.error("process error: pid=%s returncode=%s", self._proc.pid, rc)
+                else:
+                    self._status = "success"
+        logger.debug("process done: pid=%s status=%s elapsed_ms=%d", self._proc.pid, self._status, elapsed_ms)
+
+        self._done.set()
+        self._matcher.close()
+        self._put_event(_QUEUE_DONE)
+
     def _reader_loop(self) -> None:
         selector = selectors.DefaultSelector()
-        if self._proc.stdout:
-            selector.register(self._proc.stdout, selectors.EVENT_READ)
-        if self._proc.stderr:
-            selector.register(self._proc.stderr, selectors.EVENT_READ)
+        for pipe in self._observed_pipes().values():
+            selector.register(pipe, selectors.EVENT_READ)
 
         while True:
-            if self._timeout_s is not None and (time.monotonic() - self._start) > self._timeout_s:
-                self._set_status("timeout")
-                logger.warning("process timeout: pid=%s timeout_s=%s", self._proc.pid, self._timeout_s)
-                self.kill()
+            self._check_timeout()
 
-            if not selector.get_map() and self._proc.poll() is not None:
+            if not selector.get_map() and self._poll_exit():
                 break
 
             for key, _ in selector.select(timeout=0.1):
@@ -244,26 +827,9 @@ class ProcessHandle:
                 if not data:
                     selector.unregister(key.fileobj)
                     continue
-                stream = "stdout" if key.fileobj is self._proc.stdout else "stderr"
-                text = self._decoders[stream].decode(data)
-                self._process_text(stream, text)
-
-        self._flush_buffers()
-        rc = self._proc.wait(timeout=1) if self._proc.poll() is None else self._proc.returncode
-        elapsed_ms = int((time.monotonic() - self._start) * 1000)
-        with self._lock:
-            self._returncode = rc
-            self._elapsed_ms = elapsed_ms
-            if self._status not in ("timeout", "killed"):
-                if rc not in (0, None):
-                    self._status = "error"
-                    logger.error("process error: pid=%s returncode=%s", self._proc.pid, rc)
-                else:
-                    self._status = "success"
-        logger.debug("process done: pid=%s status=%s elapsed_ms=%d", self._proc.pid, self._status, elapsed_ms)
+                self._on_data(self._stream_name(key.fileobj), data)
 
-        self._done.set()
-        self._queue.put(_QUEUE_DONE)
+        self._finish()
 
 
 def _print_event(ev: Dict[str, Any]) -> None:
@@ -284,7 +850,42 @@ def start_process(
     shell: Optional[bool] = None,
     encoding: Optional[str] = None,
     errors: str = "replace",
+    max_lines: Optional[int] = None,
+    spill_dir: Optional[str] = None,
+    manager: Optional["ProcessManager"] = None,
+    limits: Optional[ResourceLimits] = None,
+    stdin: Any = None,
+    pipe_stdout: Union[bool, str] = False,
+    keep_spill: bool = False,
+    detach: bool = False,
 ) -> ProcessHandle:
+    """
+    Start a subprocess and stream its output as events.
+
+    With `max_lines`, memory is bounded: only the last `max_lines` lines/events are
+    kept, the full stdout/stderr are spilled to temp files (see
+    `ProcessResult.stdout_path`/`read_stdout()`), and the event queue applies
+    back-pressure while a consumer is reading. The spill files belong to the
+    handle and its results: they are deleted by `result.cleanup()` or once the
+    handle and all its results are garbage-collected. With `keep_spill=True`
+    they are left on disk and the caller owns them.
+
+    With `manager` (see `ProcessManager`), output is serviced by the manager's
+    shared reactor thread instead of a dedicated reader thread per process.
+
+    The process runs in its own process group; kill()/terminate() and timeouts
+    signal the whole group. `limits` applies CPU/memory/open-file rlimits.
+    Since the group no longer gets the terminal's Ctrl-C, groups still running
+    when the interpreter exits are SIGKILLed; pass `detach=True` (or call
+    `handle.detach()` later) for a process that should outlive the script.
+
+    `stdin` accepts bytes/str (fed by a writer thread), a file object or fd
+    (passed to the child directly), an iterator of chunks, another
+    ProcessHandle started with `pipe_stdout`, or `subprocess.PIPE`/True for
+    incremental `handle.write()` / `handle.close_stdin()`. `pipe_stdout=True`
+    leaves stdout unread so a downstream process gets it as a raw OS pipe;
+    `pipe_stdout="tee"` keeps observing it and copies it downstream.
+    """
     return ProcessHandle(
         cmd=cmd,
         timeout_s=timeout_s,
@@ -293,4 +894,43 @@ def start_process(
         shell=shell,
         encoding=encoding,
         errors=errors,
+        max_lines=max_lines,
+        spill_dir=spill_dir,
+        manager=manager,
+        limits=limits,
+        stdin=stdin,
+        pipe_stdout=pipe_stdout,
+        keep_spill=keep_spill,
+        detach=detach,
     )
+
+
+def start_pipeline(
+    cmds: Sequence[Union[str, Sequence[str]]],
+    *,
+    observe: bool = False,
+    **kwargs: Any,
+) -> List[ProcessHandle]:
+    """
+    Start `cmd1 | cmd2 | ...` connected by OS pipes.
+
+    Intermediate stdouts are not copied through Python unless `observe=True`
+    (then they are tee'd and show up as events too). Extra kwargs apply to every
+    process; `stdin` only to the first. Returns the handles in order; the last
+    one carries the pipeline's output.
+    """
+    if not cmds:
+        raise ValueError("empty pipeline")
+    stdin = kwargs.pop("stdin", None)
+    handles: List[ProcessHandle] = []
+    for i, cmd in enumerate(cmds):
+        last = i == len(cmds) - 1
+        handle = start_process(
+            cmd,
+            stdin=stdin,
+            pipe_stdout=False if last else ("tee" if observe else True),
+            **kwargs,
+        )
+        handles.append(handle)
+        stdin = handle
+    return handles
@@ -0,0 +1,183 @@
+"""
+Process-tree helpers: every child is started as the leader of its own session /
+process group, so a timeout or cancel can take down everything it spawned (build
+tools, language servers, test runners) instead of orphaning them.
+"""
+
+import atexit
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from .logger import logger
+
+_IS_POSIX = os.name == "posix"
+
+
+@dataclass
+class ResourceLimits:
+    """Per-run limits applied in the child right before exec (POSIX only)."""
+    cpu_s: Optional[int] = None          # RLIMIT_CPU, seconds of CPU time
+    address_space: Optional[int] = None  # RLIMIT_AS, bytes of virtual memory
+    open_files: Optional[int] = None     # RLIMIT_NOFILE
+
+    def _preexec(self) -> Callable[[], None]:
+        import resource
+
+        pairs = []
+        if self.cpu_s is not None:
+            pairs.append((resource.RLIMIT_CPU, int(self.cpu_s)))
+        if self.address_space is not None:
+            pairs.append((resource.RLIMIT_AS, int(self.address_space)))
+        if self.open_files is not None:
+            pairs.append((resource.RLIMIT_NOFILE, int(self.open_files)))
+
+        def apply() -> None:
+            # runs in the forked child: no logging, no locks
+            for res, value in pairs:
+                _, hard = resource.getrlimit(res)
+                if hard != resource.RLIM_INFINITY:
+                    value = min(value, hard)
+                resource.setrlimit(res, (value, hard))
+
+        return apply
+
+
+def popen_kwargs(limits: Optional[ResourceLimits] = None) -> Dict[str, Any]:
+    """Extra Popen kwargs: own process group, plus rlimits when given."""
+    if not _IS_POSIX:
+        return {}
+    kwargs: Dict[str, Any] = {"start_new_session": True}
+    if limits is not None:
+        kwargs["preexec_fn"] = limits._preexec()
+    return kwargs
+
+
+_live: Set[int] = set()
+_live_lock = threading.Lock()
+
+
+def track(proc: subprocess.Popen) -> None:
+    if _IS_POSIX:
+        with _live_lock:
+            _live.add(proc.pid)
+
+
+def untrack(proc: subprocess.Popen) -> None:
+    with _live_lock:
+        _live.discard(proc.pid)
+
+
+def live_count() -> int:
+    """Number of tracked child process groups still running."""
+    with _live_lock:
+        return len(_live)
+
+
+def kill_tree(proc: subprocess.Popen, sig: int = signal.SIGKILL if _IS_POSIX else 9) -> None:
+    """Signal the child's whole process group, falling back to the child alone."""
+    if _IS_POSIX:
+        try:
+            os.killpg(proc.pid, sig)
+            logger.debug("process group signalled: pgid=%s sig=%s", proc.pid, sig)
+            return
+        except ProcessLookupError:
+            return
+        except OSError as e:
+            logger.debug("killpg failed: pgid=%s err=%s", proc.pid, e)
+    try:
+        if sig == getattr(signal, "SIGTERM", None):
+            proc.terminate()
+        else:
+            proc.kill()
+    except Exception:
+        pass
+
+
+@atexit.register
+def _kill_live_groups() -> None:
+    # children no longer share our process group, so Ctrl-C / exit would orphan them;
+    # detached ones (start_process(detach=True), handle.detach()) are not tracked
+    with _live_lock:
+        pgids = list(_live)
+        _live.clear()
+    for pgid in pgids:
+        try:
+            os.killpg(pgid, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+def _exit_code(status: int) -> int:
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _usage_dict(ru: Any) -> Dict[str, Any]:
+    max_rss = int(ru.ru_maxrss)
+    if sys.platform == "darwin":
+        max_rss //= 1024  # bytes on macOS, KiB elsewhere
+    return {
+        "user_s": round(ru.ru_utime, 6),
+        "sys_s": round(ru.ru_stime, 6),
+        "max_rss_kb": max_rss,
+        "inblock": int(ru.ru_inblock),
+        "oublock": int(ru.ru_oublock),
+        "nvcsw": int(ru.ru_nvcsw),
+        "nivcsw": int(ru.ru_nivcsw),
+    }
+
+
+def poll_child(proc: subprocess.Popen, block: bool = False) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+    """
+    Reap the child with wait4() so its resource usage is not lost.
+
+    Returns (returncode, rusage); returncode is None while the child is running.
+    rusage covers the child plus every descendant it waited for. Sets
+    proc.returncode so the Popen object stays consistent.
+    """
+    if proc.returncode is not None:
+        return proc.returncode, None
+    if not hasattr(os, "wait4"):
+        rc = proc.wait() if block else proc.poll()
+        return rc, None
+    try:
+        pid, status, ru = os.wait4(proc.pid, 0 if block else os.WNOHANG)
+    except ChildProcessError:
+        # already reaped elsewhere (e.g. Popen.poll from another thread)
+        return proc.poll(), None
+    if pid == 0:
+        return None, None
+    proc.returncode = _exit_code(status)
+    return proc.returncode, _usage_dict(ru)
+
+
+def wait_child(proc: subprocess.Popen, timeout: float) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+    """poll_child() until the child exits or timeout seconds pass."""
+    deadline = time.monotonic() + timeout
+    while True:
+        rc, usage = poll_child(proc)
+        if rc is not None or time.monotonic() >= deadline:
+            return rc, usage
+        time.sleep(0.01)
+
+
+_USAGE_SUM_KEYS = ("user_s", "sys_s", "inblock", "oublock", "nvcsw", "nivcsw")
+
+
+def merge_usage(total: Optional[Dict[str, Any]], usage: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Accumulate rusage dicts: counters are summed, max_rss_kb keeps the peak."""
+    out = dict(total or {})
+    if not usage:
+        return out
+    for key in _USAGE_SUM_KEYS:
+        out[key] = round(out.get(key, 0) + usage.get(key, 0), 6)
+    out["max_rss_kb"] = max(out.get("max_rss_kb", 0), usage.get("max_rss_kb", 0))
+    out["runs"] = out.get("runs", 0) + 1
+    return out
@@ -0,0 +1,94 @@
+"""
+Cache-friendly prompt templates.
+
+Providers cache the longest byte-identical prompt prefix they have seen
+recently, so a template that interpolates `{section}` into the middle of a long
+preamble pays for the whole preamble on every call. `PromptTemplate` splits a
+prompt into a stable prefix (shared instructions, @file references), which is
+never formatted, and a variable suffix, which is:
+
+    run_plan_step = PromptTemplate(
+        "run_plan_step",
+        prefix="Integrate bybit step by step according to bybit_dev.md. ...",
+        refs=["docs/help.md", "docs/bybit_dev.md"],
+        suffix="The part to integrate now is: {section}",
+    )
+    run(run_plan_step.format(section=section))
+
+Runs of a rendered template record the template name in run.json together
+with the provider's prompt-cache hit ratio (cached / total input tokens), and
+the session keeps per-template totals.
+"""
+
+import hashlib
+import threading
+from typing import Any, Dict, Optional, Sequence
+
+from .logger import logger
+
+_registry: Dict[str, str] = {}
+_registry_lock = threading.Lock()
+
+
+class Prompt(str):
+    """A rendered template: a plain str that remembers which template it came from."""
+
+    template: Optional[str] = None
+    prefix_hash: Optional[str] = None
+
+    def __new__(cls, text: str, template: Optional[str] = None, prefix_hash: Optional[str] = None) -> "Prompt":
+        obj = super().__new__(cls, text)
+        obj.template = template
+        obj.prefix_hash = prefix_hash
+        return obj
+
+
+class PromptTemplate:
+    def __init__(self, name: str, prefix: str, suffix: str = "", refs: Sequence[str] = ()) -> None:
+        """
+        prefix: instructions shared by every call, used byte for byte (no placeholders).
+        suffix: per-call part; "{key}" is replaced by format(key=...).
+        refs: files referenced as "@path" on the first line of the prefix.
+        """
+        parts = []
+        if refs:
+            parts.append(" ".join(f"@{ref}" for ref in refs))
+        body = "\n".join(line.rstrip() for line in prefix.strip("\n").splitlines())
+        if body:
+            parts.append(body)
+        self.name = name
+        self.prefix = "\n".join(parts) + "\n\n" if parts else ""
+        self.suffix = suffix.strip("\n")
+        self.prefix_hash = hashlib.sha1(self.prefix.encode("utf-8")).hexdigest()[:12]
+        with _registry_lock:
+            old = _registry.get(name)
+            if old is not None and old != self.prefix_hash:
+                logger.warning("prompt template %s redefined with a different prefix", name)
+            _registry[name] = self.prefix_hash
+
+    def format(self, **values: Any) -> Prompt:
+        suffix = self.suffix
+        for key, value in values.items():
+            placeholder = "{" + key + "}"
+            if placeholder in self.prefix:
+                raise ValueError(f"prompt template {self.name}: {placeholder} is in the stable prefix, move it to the suffix")
+            # plain replace like Workflow: prompts often contain literal braces (yaml, code)
+            suffix = suffix.replace(placeholder, str(value))
+        return Prompt(self.prefix + suffix, template=self.name, prefix_hash=self.prefix_hash)
+
+    __call__ = format
+
+    def __repr__(self) -> str:
+        return f"PromptTemplate({self.name!r}, prefix={len(self.prefix)} chars, prefix_hash={self.prefix_hash})"
+
+
+def template_prefix_hash(name: str) -> Optional[str]:
+    with _registry_lock:
+        return _registry.get(name)
+
+
+def cache_hit_ratio(usage: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Share of input tokens served from the provider's prompt cache."""
+    if not usage or not usage.get("input_tokens"):
+        return None
+    return round(usage.get("cached_input_tokens", 0) / usage["input_tokens"], 4)
@@ -1,4 +1,6 @@
 from .codex import CodexProvider
 from .claude import ClaudeProvider
+from .replay import ReplayProvider
+from .fake import FakeProvider
 
-__all__ = ["CodexProvider", "ClaudeProvider"]
+__all__ = ["CodexProvider", "ClaudeProvider", "ReplayProvider", "FakeProvider"]
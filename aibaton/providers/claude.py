@@ -5,6 +5,8 @@ from ..logger import logger
 
 class ClaudeProvider:
     name = "claude"
+    # `claude --print` reads the prompt from stdin when it isn't given as an argument
+    transports = ("argv", "stdin")
 
     def build_command(
         self,
@@ -13,8 +15,9 @@ class ClaudeProvider:
         cwd: Optional[str],
         add_dirs: Optional[List[str]],
         dangerous_permissions: bool,
+        transport: str = "argv",
     ) -> Tuple[List[str], Optional[str]]:
-        cmd = ["claude", prompt, "--print"]
+        cmd = ["claude", "--print"]
         if json_mode:
             cmd.extend(["--output-format", "stream-json"])
         if add_dirs:
@@ -23,6 +26,7 @@ class ClaudeProvider:
         if dangerous_permissions:
             cmd.append("--dangerously-skip-permissions")
 
-        # Claude prompt passed as argument
-        logger.debug("claude command: %s", " ".join(cmd[:3]) + " ...")
-        return cmd, None
+        logger.debug("claude command: %s (prompt via %s)", " ".join(cmd), transport)
+        if transport == "argv":
+            return cmd[:1] + [prompt] + cmd[1:], None
+        return cmd, prompt
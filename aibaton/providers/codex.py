@@ -5,6 +5,8 @@ from ..logger import logger
 
 class CodexProvider:
     name = "codex"
+    # `codex exec` reads the prompt from stdin when it isn't given as an argument
+    transports = ("stdin", "argv")
 
     def build_command(
         self,
@@ -13,6 +15,7 @@ class CodexProvider:
         cwd: Optional[str],
         add_dirs: Optional[List[str]],
         dangerous_permissions: bool,
+        transport: str = "stdin",
     ) -> Tuple[List[str], Optional[str]]:
         cmd = ["codex", "exec", "--skip-git-repo-check"]
         if json_mode:
@@ -27,6 +30,7 @@ class CodexProvider:
         else:
             cmd.extend(["--sandbox", "workspace-write"])
 
-        # Codex CLI typically reads prompt from stdin for exec
-        logger.debug("codex command: %s", " ".join(cmd))
+        logger.debug("codex command: %s (prompt via %s)", " ".join(cmd), transport)
+        if transport == "argv":
+            return cmd + [prompt], None
         return cmd, prompt
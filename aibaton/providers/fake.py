@@ -0,0 +1,199 @@
+"""
+Fake provider: a synthetic CLI that emits codex `--json` or claude
+`stream-json` event streams, for tests and benchmarks of aibaton's own
+overhead without paying for real agent runs.
+
+The stream is configured through `AIBATON_FAKE` as comma separated key=value
+pairs, e.g. `AIBATON_FAKE=format=claude,chunks=500,size=80,deltas=1,tools=3`:
+
+    format    codex | claude                          (codex)
+    chunks    text chunks emitted                     (10)
+    size      characters per chunk                    (40)
+    rate      events per second, 0 = no pacing        (0)
+    deltas    claude: content_block_delta per chunk   (0)
+              instead of one assistant message each
+    tools     tool calls, at most one per chunk       (0)
+    tool_ms   duration of each tool call              (0)
+    errors    stderr lines                            (0)
+    stall_ms  one pause halfway through the stream    (0)
+    exit      exit code                               (0)
+
+`generate(config)` yields the same (stream, line, delay_s) tuples in-process,
+so parsing benchmarks can skip the subprocess.
+"""
+
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..logger import logger
+
+FAKE_ENV = "AIBATON_FAKE"
+
+DEFAULTS: Dict[str, Any] = {
+    "format": "codex",
+    "chunks": 10,
+    "size": 40,
+    "rate": 0.0,
+    "deltas": 0,
+    "tools": 0,
+    "tool_ms": 0.0,
+    "errors": 0,
+    "stall_ms": 0.0,
+    "exit": 0,
+}
+
+# the package root goes on sys.path so the CLI works from any cwd without an install
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_ENTRY = f"import sys; sys.path.insert(0, {_ROOT!r}); from aibaton.providers.fake import main; sys.exit(main())"
+
+_WORDS = "the quick brown fox jumps over the lazy dog while agents stream tokens ".split()
+
+
+class FakeProvider:
+    name = "fake"
+    transports = ("stdin", "argv")
+
+    def build_command(
+        self,
+        prompt: str,
+        json_mode: bool,
+        cwd: Optional[str],
+        add_dirs: Optional[List[str]],
+        dangerous_permissions: bool,
+        transport: str = "stdin",
+    ) -> Tuple[List[str], Optional[str]]:
+        cmd = [sys.executable, "-c", _ENTRY]
+        logger.debug("fake command: %s (prompt via %s)", " ".join(cmd), transport)
+        if transport == "argv":
+            return cmd + [prompt], None
+        return cmd, prompt
+
+
+def parse_config(spec: Optional[str]) -> Dict[str, Any]:
+    """`key=value,...` on top of DEFAULTS; values take the type of the default."""
+    config = dict(DEFAULTS)
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        key, sep, value = part.partition("=")
+        key = key.strip()
+        if not sep or key not in DEFAULTS:
+            raise ValueError(f"{FAKE_ENV}: bad entry {part!r}")
+        config[key] = type(DEFAULTS[key])(value.strip())
+    if config["format"] not in ("codex", "claude"):
+        raise ValueError(f"{FAKE_ENV}: unknown format {config['format']!r}")
+    return config
+
+
+def format_config(config: Dict[str, Any]) -> str:
+    """Inverse of parse_config, for putting a config into the environment."""
+    return ",".join(f"{k}={v}" for k, v in config.items() if k in DEFAULTS)
+
+
+def _text(i: int, size: int) -> str:
+    out = []
+    n = 0
+    while n < size:
+        word = _WORDS[(i + len(out)) % len(_WORDS)]
+        out.append(word)
+        n += len(word) + 1
+    return " ".join(out)[:size]
+
+
+def _tool_before(i: int, config: Dict[str, Any]) -> bool:
+    tools = config["tools"]
+    if not tools:
+        return False
+    step = max(1, config["chunks"] // tools)
+    return i % step == 0 and i // step < tools
+
+
+def _codex_events(config: Dict[str, Any], prompt: str) -> Iterator[Tuple[str, Any]]:
+    # ("event", dict) | ("tool", seconds) | ("stderr", str)
+    yield "event", {"type": "thread.started", "thread_id": "fake"}
+    yield "event", {"type": "turn.started"}
+    chunks = config["chunks"]
+    for i in range(chunks):
+        if _tool_before(i, config):
+            item = {"id": f"tool_{i}", "type": "command_execution", "command": f"cat file_{i}.py"}
+            yield "event", {"type": "item.started", "item": item}
+            yield "tool", config["tool_ms"] / 1000.0
+            yield "event", {"type": "item.completed", "item": dict(item, exit_code=0, aggregated_output="ok")}
+        yield "event", {"type": "item.completed", "item": {"id": f"msg_{i}", "type": "agent_message",
+                                                            "text": _text(i, config["size"])}}
+    yield "event", {"type": "turn.completed", "usage": {
+        "input_tokens": len(prompt) // 4 + 1000, "cached_input_tokens": 800,
+        "output_tokens": chunks * config["size"] // 4,
+    }}
+
+
+def _claude_events(config: Dict[str, Any], prompt: str) -> Iterator[Tuple[str, Any]]:
+    yield "event", {"type": "system", "subtype": "init", "session_id": "fake", "tools": ["Read", "Bash"]}
+    chunks = config["chunks"]
+    for i in range(chunks):
+        if _tool_before(i, config):
+            tool_id = f"toolu_{i}"
+            yield "event", {"type": "assistant", "message": {"role": "assistant", "content": [
+                {"type": "tool_use", "id": tool_id, "name": "Read", "input": {"file_path": f"file_{i}.py"}}]}}
+            yield "tool", config["tool_ms"] / 1000.0
+            yield "event", {"type": "user", "message": {"role": "user", "content": [
+                {"type": "tool_result", "tool_use_id": tool_id, "content": "ok"}]}}
+        text = _text(i, config["size"])
+        if config["deltas"]:
+            yield "event", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": text}}
+        else:
+            yield "event", {"type": "assistant", "message": {"role": "assistant", "content": [
+                {"type": "text", "text": text}]}}
+    yield "event", {"type": "result", "subtype": "success", "is_error": config["exit"] != 0, "result": "done",
+                    "usage": {"input_tokens": len(prompt) // 4 + 200, "cache_read_input_tokens": 800,
+                              "output_tokens": chunks * config["size"] // 4}}
+
+
+def generate(config: Dict[str, Any], prompt: str = "") -> Iterator[Tuple[str, str, float]]:
+    """(stream, line, delay_s) tuples: stream is stdout/stderr, delay_s the pause before the line."""
+    source = _codex_events if config["format"] == "codex" else _claude_events
+    items = list(source(config, prompt))
+    errors = config["errors"]
+    for i in range(errors):
+        # spread stderr lines over the stream
+        items.insert(min(len(items), (i + 1) * len(items) // (errors + 1)), ("stderr", f"warning: fake error {i}"))
+    gap = 1.0 / config["rate"] if config["rate"] > 0 else 0.0
+    stall_at = len(items) // 2 if config["stall_ms"] > 0 else -1
+    pending = 0.0
+    for n, (kind, value) in enumerate(items):
+        if n == stall_at:
+            pending += config["stall_ms"] / 1000.0
+        if kind == "tool":
+            pending += value
+            continue
+        if kind == "stderr":
+            yield "stderr", value, pending
+        else:
+            yield "stdout", json.dumps(value, ensure_ascii=False), pending + gap
+        pending = 0.0
+
+
+def main() -> int:
+    try:
+        config = parse_config(os.environ.get(FAKE_ENV))
+    except ValueError as e:
+        sys.stderr.write(f"fake: {e}\n")
+        return 2
+    prompt = sys.argv[1] if len(sys.argv) > 1 else ("" if sys.stdin is None or sys.stdin.isatty() else sys.stdin.read())
+    out = {"stdout": sys.stdout, "stderr": sys.stderr}
+    for stream, line, delay in generate(config, prompt):
+        if delay > 0:
+            time.sleep(delay)
+        f = out[stream]
+        f.write(line + "\n")
+        if delay > 0 or stream == "stderr":
+            f.flush()
+    sys.stdout.flush()
+    return config["exit"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
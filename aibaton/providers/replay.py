@@ -0,0 +1,87 @@
+"""
+Replay provider: plays a recorded run back as if it were a live CLI.
+
+The recorded run directory and playback speed are read from the environment
+(`AIBATON_REPLAY_DIR`, `AIBATON_REPLAY_SPEED`), so the normal runner pipeline
+(event parsing, progress, storage) is exercised unchanged.
+"""
+
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..logger import logger
+
+REPLAY_DIR_ENV = "AIBATON_REPLAY_DIR"
+REPLAY_SPEED_ENV = "AIBATON_REPLAY_SPEED"
+
+# `-m aibaton.providers.replay` would warn since the package imports this module
+_ENTRY = "import sys; from aibaton.providers.replay import main; sys.exit(main())"
+
+
+class ReplayProvider:
+    name = "replay"
+    transports = ("stdin",)  # the prompt is ignored
+
+    def build_command(
+        self,
+        prompt: str,
+        json_mode: bool,
+        cwd: Optional[str],
+        add_dirs: Optional[List[str]],
+        dangerous_permissions: bool,
+        transport: str = "stdin",
+    ) -> Tuple[List[str], Optional[str]]:
+        cmd = [sys.executable, "-c", _ENTRY]
+        logger.debug("replay command: %s", " ".join(cmd))
+        return cmd, None
+
+
+def _emit(ev: Dict[str, Any], payload: Dict[str, Any]) -> None:
+    stream = ev.get("stream")
+    if stream is None:
+        # recorded before events carried their stream: only the runner's own stderr payloads are tagged
+        stream = "stderr" if payload.get("stream") == "stderr" else "stdout"
+    if stream == "stderr":
+        sys.stderr.write(str(payload.get("message", "")) + "\n")
+        sys.stderr.flush()
+        return
+    if ev.get("plain"):
+        # plain (non-JSON) output line in the original run
+        sys.stdout.write(str(payload.get("text", "")) + "\n")
+    else:
+        sys.stdout.write(json.dumps(payload, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def main() -> int:
+    run_dir = os.environ.get(REPLAY_DIR_ENV)
+    if not run_dir:
+        sys.stderr.write(f"replay: {REPLAY_DIR_ENV} is not set\n")
+        return 2
+    try:
+        speed = float(os.environ.get(REPLAY_SPEED_ENV) or 1.0)
+    except ValueError:
+        speed = 1.0
+
+    from ..replay import EventLog
+
+    events = EventLog(os.path.join(run_dir, "events.jsonl"))
+    prev_ts: Optional[int] = None
+    for ev in events:
+        ts = ev.get("ts")
+        if speed > 0 and isinstance(ts, (int, float)) and prev_ts is not None and ts > prev_ts:
+            time.sleep((ts - prev_ts) / 1000.0 / speed)
+        if isinstance(ts, (int, float)):
+            prev_ts = int(ts)
+        payload = ev.get("payload")
+        if isinstance(payload, dict):
+            _emit(ev, payload)
+    events.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
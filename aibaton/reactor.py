@@ -0,0 +1,220 @@
+"""
+Shared reactor for many ProcessHandles.
+
+By default every `start_process` call gets its own reader thread. A
+`ProcessManager` instead services all of its handles from one thread blocked on
+a single selector (epoll on Linux), so hundreds of concurrent processes cost one
+thread that only wakes when output arrives, a timeout is due, or an exited child
+needs reaping. Handles keep the usual API (`poll_events`, `iter_events`, `watch`,
+`wait`).
+
+    mgr = ProcessManager()
+    handles = [mgr.start_process(["pytest", shard]) for shard in shards]
+    results = [h.wait() for h in handles]
+"""
+
+import os
+import selectors
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Union
+
+from .logger import logger
+from .process import ProcessHandle
+
+_READ_CHUNK = 65536
+_TEE = "tee"
+
+
+class ProcessManager:
+    def __init__(self, tick_s: float = 0.1) -> None:
+        self._tick_s = tick_s
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._pending: List[Callable[[], None]] = []
+        # handle -> streams whose pipe has not reached EOF yet
+        self._open: Dict[ProcessHandle, Set[str]] = {}
+        self._exiting: Set[ProcessHandle] = set()
+        self._timed: Set[ProcessHandle] = set()
+        self._paused: Set[ProcessHandle] = set()
+        # handles whose tee pipe is full; their stdout is not read until it drains
+        self._tee_waiting: Set[ProcessHandle] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    def start_process(self, cmd: Union[str, Sequence[str]], **kwargs: Any) -> ProcessHandle:
+        """Same arguments as `aibaton.start_process`; the handle is serviced by this manager."""
+        from .process import start_process
+
+        return start_process(cmd, manager=self, **kwargs)
+
+    def active(self) -> int:
+        with self._lock:
+            return len(self._open)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Stop the reactor once all registered processes have finished."""
+        self._closing = True
+        self._wake()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _call(self, fn: Callable[[], None]) -> None:
+        # selector changes are applied on the reactor thread only
+        with self._lock:
+            self._pending.append(fn)
+            if self._thread is None or not self._thread.is_alive():
+                self._closing = False
+                self._thread = threading.Thread(target=self._loop, name="aibaton-reactor", daemon=True)
+                self._thread.start()
+        self._wake()
+
+    def _wake(self) -> None:
+        try:
+            os.write(self._wake_w, b"x")
+        except (BlockingIOError, OSError):
+            pass
+
+    def _register(self, handle: ProcessHandle) -> None:
+        self._call(lambda: self._add(handle))
+
+    def _pause(self, handle: ProcessHandle) -> None:
+        self._call(lambda: self._set_paused(handle, True))
+
+    def _resume(self, handle: ProcessHandle) -> None:
+        self._call(lambda: self._set_paused(handle, False))
+
+    def _pipes(self, handle: ProcessHandle) -> Dict[str, Any]:
+        return handle._observed_pipes()
+
+    def _add(self, handle: ProcessHandle) -> None:
+        streams = set()
+        for stream, pipe in self._pipes(handle).items():
+            self._selector.register(pipe, selectors.EVENT_READ, (handle, stream))
+            streams.add(stream)
+        with self._lock:
+            self._open[handle] = streams
+        if handle._timeout_s is not None:
+            self._timed.add(handle)
+        if not streams:
+            self._exiting.add(handle)
+
+    def _set_paused(self, handle: ProcessHandle, paused: bool) -> None:
+        streams = self._open.get(handle)
+        if streams is None or paused == (handle in self._paused):
+            return
+        pipes = self._pipes(handle)
+        for stream in streams:
+            if stream == "stdout" and handle in self._tee_waiting:
+                continue
+            if paused:
+                self._selector.unregister(pipes[stream])
+            else:
+                self._selector.register(pipes[stream], selectors.EVENT_READ, (handle, stream))
+        if paused:
+            self._paused.add(handle)
+        else:
+            self._paused.discard(handle)
+
+    def _tee_wait(self, handle: ProcessHandle) -> None:
+        # called on the reactor thread from handle._on_data
+        if handle not in self._paused and "stdout" in self._open.get(handle, ()):
+            self._selector.unregister(self._pipes(handle)["stdout"])
+        self._selector.register(handle._tee_w, selectors.EVENT_WRITE, (handle, _TEE))
+        self._tee_waiting.add(handle)
+
+    def _tee_release(self, handle: ProcessHandle, close: bool) -> None:
+        self._selector.unregister(handle._tee_w)
+        self._tee_waiting.discard(handle)
+        handle._tee_blocked = False
+        if close:
+            handle._tee_pending.clear()
+            handle._close_tee()
+        if handle not in self._paused and "stdout" in self._open.get(handle, ()):
+            self._selector.register(self._pipes(handle)["stdout"], selectors.EVENT_READ, (handle, "stdout"))
+
+    def _close_stream(self, handle: ProcessHandle, stream: str) -> None:
+        self._selector.unregister(self._pipes(handle)[stream])
+        streams = self._open.get(handle)
+        if streams is None:
+            return
+        streams.discard(stream)
+        if not streams:
+            self._exiting.add(handle)
+
+    def _reap(self) -> None:
+        for handle in list(self._exiting):
+            if not handle._poll_exit():
+                continue
+            self._exiting.discard(handle)
+            self._timed.discard(handle)
+            self._paused.discard(handle)
+            with self._lock:
+                self._open.pop(handle, None)
+            try:
+                handle._finish()
+            except Exception:
+                logger.exception("process finish failed: pid=%s", handle.pid)
+
+    def _loop(self) -> None:
+        logger.debug("reactor started")
+        while True:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            for fn in pending:
+                fn()
+            with self._lock:
+                if self._closing and not self._open and not self._pending:
+                    break
+
+            timeout = self._tick_s if (self._exiting or self._timed) else None
+            for key, _ in self._selector.select(timeout=timeout):
+                if key.data is None:
+                    try:
+                        while os.read(self._wake_r, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                handle, stream = key.data
+                if stream == _TEE:
+                    state = handle._flush_tee()
+                    if state != "blocked":
+                        self._tee_release(handle, close=state == "error")
+                    continue
+                try:
+                    data = os.read(key.fd, _READ_CHUNK)
+                except BlockingIOError:
+                    continue
+                if not data:
+                    self._close_stream(handle, stream)
+                    continue
+                try:
+                    handle._on_data(stream, data)
+                except Exception:
+                    logger.exception("process output handling failed: pid=%s", handle.pid)
+
+            for handle in list(self._timed):
+                handle._check_timeout()
+                if handle in self._tee_waiting and handle._status in ("timeout", "killed"):
+                    # nobody will drain the tee any more; drop it so stdout reaches EOF
+                    self._tee_release(handle, close=True)
+            self._reap()
+        logger.debug("reactor stopped")
+
+
+_default: Optional[ProcessManager] = None
+_default_lock = threading.Lock()
+
+
+def get_process_manager() -> ProcessManager:
+    """Process-wide shared manager."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ProcessManager()
+        return _default
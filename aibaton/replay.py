@@ -0,0 +1,191 @@
+import json
+import mmap
+import os
+from array import array
+from typing import Any, Dict, Iterator, Optional, Sequence, Union, overload
+
+from .logger import logger
+from .storage import flush_storage
+
+
+class EventLog(Sequence):
+    """
+    Lazy, read-only view over an `events.jsonl` file.
+
+    The file is memory-mapped and line offsets are indexed on demand, so opening
+    a huge log is instant and `log[n]` only scans as far as event n. Events are
+    decoded on access and never cached. Blank lines are not events, for
+    indexing and iteration alike.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._mm: Optional[mmap.mmap] = None
+        self._size = 0
+        # [start, end) byte ranges of the non-blank lines indexed so far
+        self._starts = array("Q")
+        self._ends = array("Q")
+        self._scan = 0
+        self._indexed = False
+        try:
+            with open(path, "rb") as f:
+                self._size = os.fstat(f.fileno()).st_size
+                if self._size:
+                    self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            logger.debug("event log missing: %s", path)
+        if not self._size:
+            self._indexed = True
+
+    def _index_until(self, n: int) -> None:
+        """Extend the offset index until it covers event n (or the whole file)."""
+        mm = self._mm
+        while not self._indexed and len(self._starts) <= n:
+            pos = self._scan
+            nl = mm.find(b"\n", pos)
+            end = self._size if nl < 0 else nl + 1
+            # JSON lines start with "{"; only lines led by whitespace are copied to check
+            if mm[pos:pos + 1] not in b" \t\r\n" or mm[pos:end].strip():
+                self._starts.append(pos)
+                self._ends.append(end)
+            self._scan = end
+            if end >= self._size:
+                self._indexed = True
+
+    def _decode(self, start: int, end: int) -> Dict[str, Any]:
+        line = self._mm[start:end].rstrip(b"\r\n")
+        try:
+            return json.loads(line)
+        except ValueError:
+            return {"type": "message", "payload": {"text": line.decode("utf-8", "replace")}, "source": "replay"}
+
+    def __len__(self) -> int:
+        if not self._indexed:
+            self._index_until(self._size)
+        return len(self._starts)
+
+    @overload
+    def __getitem__(self, idx: int) -> Dict[str, Any]: ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> Sequence[Dict[str, Any]]: ...
+
+    def __getitem__(self, idx: Union[int, slice]) -> Any:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if idx < 0:
+            raise IndexError("event index out of range")
+        self._index_until(idx)
+        if idx >= len(self._starts):
+            raise IndexError("event index out of range")
+        return self._decode(self._starts[idx], self._ends[idx])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        i = 0
+        while True:
+            self._index_until(i)
+            if i >= len(self._starts):
+                return
+            yield self._decode(self._starts[i], self._ends[i])
+            i += 1
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def __repr__(self) -> str:
+        return f"EventLog({self.path!r})"
+
+
+def _resolve_run_dir(run: str, cwd: Optional[str] = None) -> str:
+    from .session import find_run_dir
+
+    if os.path.isdir(run):
+        return os.path.abspath(run)
+    run_dir = find_run_dir(run, cwd)
+    if not run_dir:
+        raise FileNotFoundError(f"run not found: {run}")
+    return run_dir
+
+
+def _read_summary(run_dir: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(run_dir, "run.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def load_run(run: str, cwd: Optional[str] = None):
+    """
+    Rebuild an AgentRes from a stored run without re-running the agent.
+
+    `run` is either a run directory or a run_id looked up in ~/.aibaton.
+    """
+    from .runner import AgentRes
+
+    flush_storage()
+    run_dir = _resolve_run_dir(run, cwd)
+    summary = _read_summary(run_dir)
+    text = ""
+    out_path = os.path.join(run_dir, "output.txt")
+    if os.path.exists(out_path):
+        with open(out_path, "r", encoding="utf-8") as f:
+            text = f.read()
+    run_id = summary.get("run_id") or os.path.basename(run_dir)
+    artifacts: Dict[str, Any] = {"run_dir": run_dir, "run_id": run_id}
+    if summary.get("rusage"):
+        artifacts["rusage"] = summary["rusage"]
+    logger.debug("run loaded: %s", run_dir)
+    return AgentRes(
+        text=text,
+        events=EventLog(os.path.join(run_dir, "events.jsonl")),  # type: ignore[arg-type]
+        status=summary.get("status", "success"),
+        usage=summary.get("usage"),
+        artifacts=artifacts,
+        provider=summary.get("provider", "replay"),
+        model=summary.get("model"),
+        elapsed_ms=int(summary.get("elapsed_ms") or 0),
+    )
+
+
+def replay(
+    run: str,
+    speed: float = 1.0,
+    stream: bool = True,
+    log_dir: Optional[str] = None,
+    cwd: Optional[str] = None,
+):
+    """
+    Play a recorded run back through the normal runner pipeline.
+
+    `speed` scales the original event timing (2.0 = twice as fast, 0 = no delay).
+    """
+    from .providers.replay import REPLAY_DIR_ENV, REPLAY_SPEED_ENV
+    from .runner import _run_once
+
+    flush_storage()
+    run_dir = _resolve_run_dir(run, cwd)
+    summary = _read_summary(run_dir)
+    env = dict(os.environ)
+    env[REPLAY_DIR_ENV] = run_dir
+    env[REPLAY_SPEED_ENV] = str(speed)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+    return _run_once(
+        prompt=summary.get("prompt") or "",
+        provider="replay",
+        model=summary.get("model"),
+        cwd=None,
+        add_dirs=None,
+        timeout_s=None,
+        json_mode=True,
+        stream=stream,
+        dangerous_permissions=False,
+        log_dir=log_dir,
+        session_meta=None,
+        env_override=env,
+    )
@@ -0,0 +1,299 @@
+"""
+Provider routing: hedged requests and failover between CLIs.
+
+    route = RoutePolicy("codex", backups=["claude"])
+    set_default(route=route)          # or run(prompt, route=route)
+
+The primary provider starts first. If it hasn't finished after the hedge delay
+the next provider starts on the same prompt; the first successful result wins
+and the others are cancelled (their process trees are killed). A run that fails
+with a classified provider error (rate limit, overload, auth, network, timeout,
+missing CLI) fails over to the next provider right away; ordinary task failures
+are returned as they are.
+
+The hedge delay defaults to a quantile of the primary's latency histogram,
+fed by the wall time of every successful routed attempt in the process (the
+whole run(), not its loop iterations or option analysis). Hedged runs work on the same
+prompt in parallel, so in a git repository every attempt runs with
+isolate=True (its own worktree) and only the winner's changes are merged;
+outside a repository hedging is turned off with a warning and only failover
+applies.
+"""
+
+import math
+import os
+import queue
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
+
+from .logger import logger
+from .tracing import bind, span
+
+if TYPE_CHECKING:
+    from .runner import AgentRes
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram, ~19% bucket width from 100ms to ~2h."""
+
+    _BASE_MS = 100.0
+    _GROWTH = 1.19
+    _BUCKETS = 60
+
+    def __init__(self) -> None:
+        self._counts = [0] * (self._BUCKETS + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def _bucket(self, ms: float) -> int:
+        if ms <= self._BASE_MS:
+            return 0
+        return min(self._BUCKETS, int(math.log(ms / self._BASE_MS, self._GROWTH)) + 1)
+
+    def record(self, ms: float) -> None:
+        with self._lock:
+            self._counts[self._bucket(ms)] += 1
+            self.count += 1
+
+    def to_dict(self) -> Dict[str, int]:
+        """Non-empty buckets, JSON-friendly."""
+        with self._lock:
+            return {str(i): n for i, n in enumerate(self._counts) if n}
+
+    def load(self, buckets: Dict[str, int]) -> None:
+        with self._lock:
+            for key, n in buckets.items():
+                i = min(self._BUCKETS, int(key))
+                self._counts[i] += int(n)
+                self.count += int(n)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile, in ms."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            seen = 0
+            for i, n in enumerate(self._counts):
+                seen += n
+                if seen >= rank and n:
+                    return self._BASE_MS * self._GROWTH ** i
+            return self._BASE_MS * self._GROWTH ** self._BUCKETS
+
+
+_histograms: Dict[str, LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def latency_histogram(provider: str) -> LatencyHistogram:
+    with _histograms_lock:
+        hist = _histograms.get(provider)
+        if hist is None:
+            hist = _histograms[provider] = LatencyHistogram()
+        return hist
+
+
+def record_latency(provider: str, elapsed_ms: float) -> None:
+    latency_histogram(provider).record(elapsed_ms)
+
+
+_ERROR_CLASSES = [
+    ("rate_limit", re.compile(r"rate.?limit|\b429\b|too many requests|quota|usage limit", re.I)),
+    ("overloaded", re.compile(r"overloaded|\b529\b|\b503\b|service unavailable|internal server error|\b500\b", re.I)),
+    ("auth", re.compile(r"unauthori[sz]ed|\b401\b|\b403\b|invalid api key|not logged in|please log ?in|authentication", re.I)),
+    ("network", re.compile(r"connection (reset|refused|error|closed)|econnreset|network error|stream disconnected|dns", re.I)),
+]
+
+
+def _error_texts(res: "AgentRes") -> List[str]:
+    texts = []
+    for ev in res.events:
+        raw = ev.get("payload") or {}
+        if ev.get("type") in ("error", "turn.failed") or raw.get("is_error"):
+            for key in ("message", "error", "result", "text"):
+                value = raw.get(key)
+                if isinstance(value, dict):
+                    value = value.get("message")
+                if isinstance(value, str):
+                    texts.append(value)
+    return texts
+
+
+def classify_error(res: "AgentRes") -> Optional[str]:
+    """Provider-side failure class of a result, or None for success / ordinary task errors."""
+    if res.status == "timeout":
+        return "timeout"
+    if res.status != "error":
+        return None
+    if (res.artifacts or {}).get("error_class"):
+        return res.artifacts["error_class"]
+    for text in _error_texts(res):
+        for name, pattern in _ERROR_CLASSES:
+            if pattern.search(text):
+                return name
+    return None
+
+
+class RoutePolicy:
+    def __init__(
+        self,
+        primary: str,
+        backups: Sequence[str] = (),
+        hedge: bool = True,
+        hedge_delay_s: Optional[float] = None,
+        hedge_quantile: float = 0.95,
+        min_samples: int = 5,
+        default_hedge_delay_s: float = 600.0,
+        failover: bool = True,
+        failover_on: Sequence[str] = ("rate_limit", "overloaded", "auth", "network", "timeout", "missing_cli"),
+    ) -> None:
+        self.providers = [primary] + [p for p in backups if p != primary]
+        self.hedge = hedge
+        self.hedge_delay_s = hedge_delay_s
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.default_hedge_delay_s = default_hedge_delay_s
+        self.failover = failover
+        self.failover_on = set(failover_on)
+
+    def hedge_delay(self, provider: str) -> Optional[float]:
+        """Seconds to wait for `provider` before starting the next one (None: never hedge)."""
+        if not self.hedge:
+            return None
+        if self.hedge_delay_s is not None:
+            return self.hedge_delay_s
+        hist = latency_histogram(provider)
+        if hist.count < self.min_samples:
+            return self.default_hedge_delay_s
+        return (hist.quantile(self.hedge_quantile) or 0) / 1000.0
+
+    def run(self, prompt: str, cancel: Optional[threading.Event] = None, **kwargs: Any) -> "AgentRes":
+        with span("route", providers=",".join(self.providers)) as sp:
+            res = self._run(prompt, cancel, **kwargs)
+            route = res.artifacts["route"]
+            sp.set(winner=route["winner"], hedged=route["hedged"], attempts=len(route["attempts"]))
+        return res
+
+    def _run(self, prompt: str, cancel: Optional[threading.Event], **kwargs: Any) -> "AgentRes":
+        from .runner import AgentRes, run
+
+        results: "queue.Queue[tuple]" = queue.Queue()
+        cancels: List[threading.Event] = []
+        attempts: List[Dict[str, Any]] = []
+        threads: List[threading.Thread] = []
+        start = time.monotonic()
+        hedged = False
+        hedge = self.hedge and len(self.providers) > 1
+        if hedge and not kwargs.get("isolate"):
+            hedge = self._isolate_hedges(kwargs)
+
+        def next_hedge(idx: int, now: float) -> Optional[float]:
+            return self._next_hedge(idx, now) if hedge else None
+
+        def attempt(idx: int, provider: str, ev: threading.Event) -> None:
+            t0 = time.monotonic()
+            try:
+                res = run(prompt, provider=provider, cancel=ev, **kwargs)
+            except FileNotFoundError as e:
+                res = AgentRes(text="", events=[], status="error", usage=None,
+                               artifacts={"error_class": "missing_cli", "error": str(e)},
+                               provider=provider, model=kwargs.get("model"), elapsed_ms=0)
+            except Exception as e:
+                logger.exception("route attempt failed: provider=%s", provider)
+                res = AgentRes(text="", events=[], status="error", usage=None, artifacts={"error": str(e)},
+                               provider=provider, model=kwargs.get("model"), elapsed_ms=0)
+            if res.status == "success":
+                # the whole run a hedge waits for, not its loop iterations or option analysis
+                record_latency(provider, (time.monotonic() - t0) * 1000)
+            results.put((idx, res))
+
+        def launch(reason: str) -> None:
+            idx = len(threads)
+            provider = self.providers[idx]
+            ev = threading.Event()
+            cancels.append(ev)
+            attempts.append({"provider": provider, "reason": reason, "start_ms": int((time.monotonic() - start) * 1000)})
+            t = threading.Thread(target=bind(attempt), args=(idx, provider, ev), name=f"route-{provider}", daemon=True)
+            threads.append(t)
+            t.start()
+            logger.info("route: start %s (%s)", provider, reason)
+
+        launch("primary")
+        winner: Optional[AgentRes] = None
+        fallback: Optional[AgentRes] = None
+        pending = 1
+        deadline = next_hedge(0, start)
+        while pending:
+            if cancel is not None and cancel.is_set():
+                break
+            wait = 0.1 if deadline is None else max(0.0, min(0.1, deadline - time.monotonic()))
+            try:
+                idx, res = results.get(timeout=wait)
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline and len(threads) < len(self.providers):
+                    hedged = True
+                    launch("hedge")
+                    pending += 1
+                    deadline = next_hedge(len(threads) - 1, time.monotonic())
+                continue
+            pending -= 1
+            err = classify_error(res)
+            attempts[idx].update(status=res.status, elapsed_ms=res.elapsed_ms, error_class=err)
+            if res.status == "success":
+                winner = res
+                break
+            if fallback is None or fallback.status == "cancelled":
+                fallback = res
+            if self.failover and err in self.failover_on and len(threads) < len(self.providers):
+                logger.warning("route: %s failed (%s), failing over", res.provider, err)
+                launch(f"failover:{err}")
+                pending += 1
+                deadline = next_hedge(len(threads) - 1, time.monotonic())
+            elif err is None and not pending:
+                # ordinary task failure: another provider wouldn't do better
+                break
+
+        for ev in cancels:
+            ev.set()
+        for t in threads:
+            t.join(timeout=5)
+        while not results.empty():
+            idx, res = results.get_nowait()
+            attempts[idx].update(status=res.status, elapsed_ms=res.elapsed_ms, error_class=classify_error(res))
+
+        res = winner or fallback
+        if res is None:
+            res = AgentRes(text="", events=[], status="cancelled", usage=None, artifacts=None,
+                           provider=self.providers[0], model=kwargs.get("model"),
+                           elapsed_ms=int((time.monotonic() - start) * 1000))
+        if res.artifacts is None:
+            res.artifacts = {}
+        res.artifacts["route"] = {
+            "primary": self.providers[0],
+            "winner": res.provider if winner is not None else None,
+            "hedged": hedged,
+            "attempts": attempts,
+        }
+        return res
+
+    def _isolate_hedges(self, kwargs: Dict[str, Any]) -> bool:
+        """Run every attempt in its own worktree so parallel CLIs never edit one tree; False: don't hedge."""
+        from . import runner
+        from .worktree import GitError, get_worktree_pool
+
+        cwd = os.path.abspath(kwargs.get("cwd") or runner._DEFAULT_CWD or os.getcwd())
+        try:
+            get_worktree_pool(cwd)
+        except (GitError, OSError) as e:
+            logger.warning("route: hedging off, %s can't be isolated in a worktree: %s", cwd, e)
+            return False
+        kwargs["isolate"] = True
+        return True
+
+    def _next_hedge(self, idx: int, now: float) -> Optional[float]:
+        if idx + 1 >= len(self.providers):
+            return None
+        delay = self.hedge_delay(self.providers[idx])
+        return None if delay is None else now + delay
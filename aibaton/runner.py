@@ -1,19 +1,39 @@
+import dataclasses
+import itertools
 import os
 import re
 import selectors
 import subprocess
+import threading
 import time
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Union
 
-from .events import extract_text, normalize_event
+from .events import extract_text, extract_usage, normalize_event
+from .hooks import get_hooks
+from . import metrics
 from .logger import logger
 from .progress import ProgressPrinter
-from .storage import make_run_dir, write_events, write_text, write_summary
+from .scheduler import PRIORITY_INTERACTIVE, PRIORITY_NORMAL, get_scheduler
+from .proctree import ResourceLimits, kill_tree, poll_child, popen_kwargs, track, untrack, wait_child
+from .storage import get_writer, make_run_dir, write_events, write_text, write_summary
 from .utils import now_ms, safe_json_loads
 from .providers.codex import CodexProvider
 from .providers.claude import ClaudeProvider
+from .providers.replay import ReplayProvider
+from .providers.fake import FakeProvider
 from .session import get_or_resume_session, update_session
+from .worktree import WorktreePool, get_worktree_pool
+from .routing import RoutePolicy
+from .prompts import cache_hit_ratio, template_prefix_hash
+from .timing import RunTimer
+from .tracing import span
+from .transport import (
+    ARGV, FILE, STDIN, choose_transport, feed_stdin, file_reference, remove_prompt_file, write_prompt_file,
+)
+
+if TYPE_CHECKING:
+    from .context_index import ContextIndex
 
 
 def extract_trailing_tag(text: str, tag: str) -> Optional[str]:
@@ -52,13 +72,14 @@ end_loop_tip = "\nOnce confirmed that all requirements are met without error or
 class AgentRes:
     text: str
     events: List[Dict[str, Any]]
-    status: str               # success | timeout | error
+    status: str               # success | timeout | error | cancelled
     usage: Optional[Dict[str, Any]]
     artifacts: Optional[Dict[str, Any]]
     provider: str             # codex | claude
     model: Optional[str]
     elapsed_ms: int
     option: Optional[str] = None  # cached select result
+    timing: Optional[Dict[str, Any]] = None  # latency breakdown, see timing.RunTimer
 
     def __str__(self) -> str:
         return self.text
@@ -72,24 +93,73 @@ class AgentRes:
         return self.option.strip()
 
     def parse(self, options: List[str]) -> str:
-        res = run(_build_option_prompt(self.text, options))
-        self.option = res.select()
+        with span("parse", options=len(options)) as sp:
+            res = run(_build_option_prompt(self.text, options), priority=PRIORITY_INTERACTIVE)
+            self.option = res.select()
+            sp.set(option=self.option)
         return self.option
 
+    def to_dict(self, with_events: bool = False) -> Dict[str, Any]:
+        """JSON-friendly form; events are omitted unless asked for since run_dir keeps them."""
+        data = {
+            "text": self.text,
+            "status": self.status,
+            "usage": self.usage,
+            "artifacts": self.artifacts,
+            "provider": self.provider,
+            "model": self.model,
+            "elapsed_ms": self.elapsed_ms,
+            "option": self.option,
+            "timing": self.timing,
+        }
+        if with_events:
+            data["events"] = list(self.events)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AgentRes":
+        events = data.get("events")
+        if events is None:
+            events = []
+            run_dir = (data.get("artifacts") or {}).get("run_dir")
+            if run_dir and os.path.isdir(run_dir):
+                from .replay import EventLog
+                events = EventLog(os.path.join(run_dir, "events.jsonl"))
+        return cls(
+            text=data.get("text") or "",
+            events=events,
+            status=data.get("status") or "success",
+            usage=data.get("usage"),
+            artifacts=data.get("artifacts"),
+            provider=data.get("provider") or "",
+            model=data.get("model"),
+            elapsed_ms=int(data.get("elapsed_ms") or 0),
+            option=data.get("option"),
+            timing=data.get("timing"),
+        )
+
 
 def _get_provider(name: str):
     if name == "codex":
         return CodexProvider()
     if name == "claude":
         return ClaudeProvider()
+    if name == "replay":
+        return ReplayProvider()
+    if name == "fake":
+        return FakeProvider()
     logger.error("unknown provider: %s", name)
     raise ValueError(f"unknown provider: {name}")
 
 
+# keeps run ids unique when runs start concurrently in the same millisecond
+_run_seq = itertools.count(1)
+
 _DEFAULT_PROVIDER = "codex"
 _DEFAULT_DANGEROUS_PERMISSIONS = False
 _DEFAULT_CWD: Optional[str] = None
 _DEFAULT_ADD_DIRS: Optional[List[str]] = None
+_DEFAULT_ROUTE: Optional[RoutePolicy] = None
 
 
 def set_default(
@@ -97,9 +167,10 @@ def set_default(
     dangerous_permissions: Optional[bool] = None,
     cwd: Optional[str] = None,
     add_dirs: Optional[List[str]] = None,
+    route: Optional[RoutePolicy] = None,
 ) -> None:
     """Set default values for run() parameters."""
-    global _DEFAULT_PROVIDER, _DEFAULT_DANGEROUS_PERMISSIONS, _DEFAULT_CWD, _DEFAULT_ADD_DIRS
+    global _DEFAULT_PROVIDER, _DEFAULT_DANGEROUS_PERMISSIONS, _DEFAULT_CWD, _DEFAULT_ADD_DIRS, _DEFAULT_ROUTE
     if provider is not None:
         _get_provider(provider)
         _DEFAULT_PROVIDER = provider
@@ -109,6 +180,10 @@ def set_default(
         _DEFAULT_CWD = cwd
     if add_dirs is not None:
         _DEFAULT_ADD_DIRS = list(add_dirs)
+    if route is not None:
+        for name in route.providers:
+            _get_provider(name)
+        _DEFAULT_ROUTE = route
 
 
 def _should_retry_prompt_arg(events: List[Dict[str, Any]]) -> bool:
@@ -133,8 +208,8 @@ def _should_retry_prompt_arg(events: List[Dict[str, Any]]) -> bool:
     return False
 
 
-def _build_env(cwd: Optional[str]) -> Dict[str, str]:
-    env = dict(os.environ)
+def _build_env(cwd: Optional[str], base: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    env = dict(os.environ if base is None else base)
     if cwd:
         if env.get("AIBATON_FORCE_HOME"):
             env["HOME"] = cwd
@@ -188,40 +263,122 @@ def _run_once(
     session_meta: Optional[Dict[str, Any]],
     prompt_as_arg: bool = False,
     env_override: Optional[Dict[str, str]] = None,
+    limits: Optional[ResourceLimits] = None,
+    priority: int = PRIORITY_NORMAL,
+    group: Optional[str] = None,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cancel: Optional[threading.Event] = None,
+    template: Optional[str] = None,
+    reason: str = "initial",
+) -> AgentRes:
+    with span("attempt", provider=provider, reason=reason, priority=priority, group=group) as attempt:
+        # wait for the provider's rate limits before the clock starts: elapsed_ms is execution only
+        scheduler = get_scheduler()
+        with span("queue", provider=provider):
+            ticket = scheduler.acquire(provider, priority=priority, group=group)
+        metrics.inc("aibaton_runs_started_total", provider=provider)
+        metrics.inc("aibaton_runs_active", provider=provider)
+        metrics.observe("aibaton_queue_wait_seconds", ticket.wait_ms / 1000.0, provider=provider)
+        if reason != "initial":
+            metrics.inc("aibaton_retries_total", provider=provider, reason=reason)
+        res: Optional[AgentRes] = None
+        try:
+            with span("process", provider=provider, model=model) as proc_span:
+                res = _exec_once(
+                    prompt, provider, model, cwd, add_dirs, timeout_s, json_mode, stream,
+                    dangerous_permissions, log_dir, session_meta, prompt_as_arg, env_override, limits,
+                    queue_wait_ms=ticket.wait_ms, on_event=on_event, cancel=cancel, template=template,
+                )
+                proc_span.set(run_id=(res.artifacts or {}).get("run_id"), status=res.status,
+                              first_token_ms=(res.timing or {}).get("first_token_ms"),
+                              tool_calls=(res.timing or {}).get("tool_calls"))
+            attempt.set(status=res.status, queue_wait_ms=ticket.wait_ms,
+                        tokens=(res.usage or {}).get("total_tokens"))
+            return res
+        finally:
+            tokens = (res.usage or {}).get("total_tokens", 0) if res is not None else 0
+            scheduler.release(ticket, tokens=tokens)
+            metrics.inc("aibaton_runs_active", -1, provider=provider)
+            if res is not None:
+                metrics.record_run(provider, res.status, res.elapsed_ms, res.usage)
+            else:
+                metrics.inc("aibaton_runs_completed_total", provider=provider, status="exception")
+
+
+def _exec_once(
+    prompt: str,
+    provider: str,
+    model: Optional[str],
+    cwd: Optional[str],
+    add_dirs: Optional[List[str]],
+    timeout_s: Optional[int],
+    json_mode: bool,
+    stream: bool,
+    dangerous_permissions: bool,
+    log_dir: Optional[str],
+    session_meta: Optional[Dict[str, Any]],
+    prompt_as_arg: bool = False,
+    env_override: Optional[Dict[str, str]] = None,
+    limits: Optional[ResourceLimits] = None,
+    queue_wait_ms: int = 0,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cancel: Optional[threading.Event] = None,
+    template: Optional[str] = None,
 ) -> AgentRes:
     prov = _get_provider(provider)
-    cmd, stdin_data = prov.build_command(
-        prompt, json_mode, cwd, add_dirs, dangerous_permissions
-    )
-    if provider == "codex" and prompt_as_arg:
-        cmd = cmd + [prompt]
-        stdin_data = None
+    transport = None
+    prompt_file = None
+    supported = getattr(prov, "transports", None)
+    if supported:
+        # probe the command without the prompt to see whether it fits in argv
+        base_cmd, _ = prov.build_command("", json_mode, cwd, add_dirs, dangerous_permissions, transport=STDIN)
+        if prompt_as_arg:
+            # stdin already failed for this CLI: argv, or a file when the prompt is too large
+            supported = [t for t in supported if t != STDIN]
+        transport = choose_transport(prompt, supported, base_cmd, env_override)
+        cli_prompt = prompt
+        if transport == FILE:
+            prompt_file = write_prompt_file(prompt)
+            cli_prompt = file_reference(prompt_file, len(prompt.encode("utf-8")))
+            logger.info("prompt too large for argv (%d chars), passing it via %s", len(prompt), prompt_file)
+        cmd, stdin_data = prov.build_command(
+            cli_prompt, json_mode, cwd, add_dirs, dangerous_permissions,
+            transport=ARGV if transport == FILE else transport,
+        )
+    else:
+        cmd, stdin_data = prov.build_command(
+            prompt, json_mode, cwd, add_dirs, dangerous_permissions
+        )
 
     start = time.monotonic()
-    run_id = f"{now_ms()}_{os.getpid()}"
+    run_id = f"{now_ms()}_{os.getpid()}_{next(_run_seq)}"
     run_dir = make_run_dir(log_dir, run_id)
     logger.debug("run_once start: provider=%s run_id=%s cwd=%s", provider, run_id, cwd)
 
     progress = ProgressPrinter(stream_tokens=stream)
     progress.start(f"{provider} run")
 
-    proc = subprocess.Popen(
-        cmd,
-        stdin=subprocess.PIPE if stdin_data is not None else None,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        bufsize=1,
-        cwd=cwd,
-        env=env_override,
-    )
+    timer = RunTimer()
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE if stdin_data is not None else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            cwd=cwd,
+            env=env_override,
+            **popen_kwargs(limits),
+        )
+    except BaseException:
+        progress.done("error", int((time.monotonic() - start) * 1000))
+        remove_prompt_file(prompt_file)
+        raise
+    timer.mark("spawn_ms")
+    track(proc)
 
-    if stdin_data is not None and proc.stdin is not None:
-        try:
-            proc.stdin.write(stdin_data)
-            proc.stdin.close()
-        except Exception:
-            pass
+    stdin_writer = feed_stdin(proc.stdin, stdin_data) if stdin_data is not None else None
 
     selector = selectors.DefaultSelector()
     if proc.stdout:
@@ -231,60 +388,107 @@ def _run_once(
 
     events: List[Dict[str, Any]] = []
     text_parts: List[str] = []
+    hooks = get_hooks()
     status = "success"
-
-    while True:
-        if timeout_s is not None and (time.monotonic() - start) > timeout_s:
-            status = "timeout"
-            logger.warning("run timeout after %ds: run_id=%s", timeout_s, run_id)
-            try:
-                proc.kill()
-            except Exception:
-                pass
-            break
-
-        if not selector.get_map() and proc.poll() is not None:
-            break
-
-        for key, _ in selector.select(timeout=0.1):
-            line = key.fileobj.readline()
-            if not line:
-                selector.unregister(key.fileobj)
-                continue
-            line = line.rstrip("\n")
-
-            if key.fileobj is proc.stdout:
-                if json_mode:
-                    raw = safe_json_loads(line)
-                    if raw is None:
-                        ev = normalize_event({"type": "message", "text": line}, provider)
+    rusage: Optional[Dict[str, Any]] = None
+
+    try:
+        while True:
+            if timeout_s is not None and (time.monotonic() - start) > timeout_s:
+                status = "timeout"
+                logger.warning("run timeout after %ds: run_id=%s", timeout_s, run_id)
+                kill_tree(proc)
+                break
+            if cancel is not None and cancel.is_set():
+                status = "cancelled"
+                logger.info("run cancelled: run_id=%s", run_id)
+                kill_tree(proc)
+                break
+
+            if not selector.get_map():
+                rc, rusage = poll_child(proc)
+                if rc is not None:
+                    break
+
+            for key, _ in selector.select(timeout=0.1):
+                line = key.fileobj.readline()
+                if not line:
+                    selector.unregister(key.fileobj)
+                    continue
+                line = line.rstrip("\n")
+
+                if key.fileobj is proc.stdout:
+                    timer.mark("first_byte_ms")
+                    if json_mode:
+                        raw = safe_json_loads(line)
+                        if raw is None:
+                            ev = normalize_event({"type": "message", "text": line}, provider, "stdout", plain=True)
+                            events.append(ev)
+                            if on_event is not None:
+                                on_event(ev)
+                            if hooks is not None:
+                                hooks.emit_event(ev)
+                                hooks.emit_text(line + "\n", ev)
+                            text_parts.append(line + "\n")
+                            progress.on_event(ev)
+                        else:
+                            timer.mark("first_event_ms")
+                            tool_calls = timer.on_event(raw)
+                            ev = normalize_event(raw, provider, "stdout")
+                            events.append(ev)
+                            if on_event is not None:
+                                on_event(ev)
+                            if hooks is not None:
+                                hooks.emit_event(ev)
+                                for name in tool_calls:
+                                    hooks.emit_tool_call(name, ev)
+                            txt = extract_text(raw)
+                            if txt:
+                                timer.mark("first_token_ms")
+                                text_parts.append(txt)
+                                if hooks is not None:
+                                    hooks.emit_text(txt, ev)
+                                progress.on_event({"type": "message", "payload": {"text": txt}})
+                    else:
+                        ev = normalize_event({"type": "message", "text": line}, provider, "stdout", plain=True)
                         events.append(ev)
+                        if on_event is not None:
+                            on_event(ev)
+                        if hooks is not None:
+                            hooks.emit_event(ev)
+                            hooks.emit_text(line + "\n", ev)
                         text_parts.append(line + "\n")
                         progress.on_event(ev)
-                    else:
-                        ev = normalize_event(raw, provider)
-                        events.append(ev)
-                        txt = extract_text(raw)
-                        if txt:
-                            text_parts.append(txt)
-                            progress.on_event({"type": "message", "payload": {"text": txt}})
                 else:
-                    ev = normalize_event({"type": "message", "text": line}, provider)
+                    ev = normalize_event({"type": "error", "message": line, "stream": "stderr"}, provider, "stderr")
                     events.append(ev)
-                    text_parts.append(line + "\n")
+                    if on_event is not None:
+                        on_event(ev)
+                    if hooks is not None:
+                        hooks.emit_event(ev)
                     progress.on_event(ev)
-            else:
-                ev = normalize_event({"type": "error", "message": line}, provider)
-                events.append(ev)
-                progress.on_event(ev)
-
-    rc = proc.wait(timeout=1) if proc.poll() is None else proc.returncode
-    if status != "timeout" and rc not in (0, None):
+    except BaseException:
+        # Ctrl-C or a crash in the pipeline: don't leave the agent's process tree behind
+        kill_tree(proc)
+        untrack(proc)
+        remove_prompt_file(prompt_file)
+        progress.done("error", int((time.monotonic() - start) * 1000))
+        raise
+
+    rc, final_rusage = wait_child(proc, timeout=1)
+    rusage = final_rusage or rusage
+    untrack(proc)
+    timing = timer.finish()
+    if stdin_writer is not None:
+        stdin_writer.join(timeout=1)
+    remove_prompt_file(prompt_file)
+    if status not in ("timeout", "cancelled") and rc not in (0, None):
         status = "error"
         logger.error("run error: run_id=%s returncode=%s", run_id, rc)
 
     elapsed_ms = int((time.monotonic() - start) * 1000)
     text = "".join(text_parts).strip()
+    usage = extract_usage(events)
 
     if run_dir:
         summary = {
@@ -299,29 +503,58 @@ def _run_once(
             "dangerous_permissions": dangerous_permissions,
             "prompt": prompt,
             "run_id": run_id,
+            "queue_wait_ms": queue_wait_ms,
         }
+        if transport is not None:
+            summary["transport"] = transport
+        summary["timing"] = timing
+        if usage is not None:
+            summary["usage"] = usage
+            ratio = cache_hit_ratio(usage)
+            if ratio is not None:
+                summary["cache_hit_ratio"] = ratio
+        if template:
+            summary["template"] = template
+            summary["prefix_hash"] = template_prefix_hash(template)
+        if limits is not None:
+            summary["limits"] = dataclasses.asdict(limits)
+        if rusage is not None:
+            summary["rusage"] = rusage
         if session_meta:
             summary["session"] = dict(session_meta)
-        write_events(run_dir, events)
-        write_text(run_dir, text)
-        write_summary(run_dir, summary)
+        # persisted on the storage thread so the next step can start right away
+        writer = get_writer()
+        writer.submit(write_events, run_dir, events)
+        writer.submit(write_text, run_dir, text)
+        writer.submit(write_summary, run_dir, summary)
 
     progress.done(status, elapsed_ms)
     if text:
         logger.info("response:\n%s", text)
     logger.info("run_once done: run_id=%s status=%s elapsed_ms=%d", run_id, status, elapsed_ms)
-
-    artifacts = {"run_dir": run_dir, "run_id": run_id} if run_dir else None
-    return AgentRes(
+    logger.debug("run_once timing: run_id=%s spawn=%s first_event=%s first_token=%s tool=%d/%d calls model=%s",
+                 run_id, timing.get("spawn_ms"), timing.get("first_event_ms"), timing.get("first_token_ms"),
+                 timing["tool_ms"], timing["tool_calls"], timing.get("model_ms"))
+
+    artifacts: Dict[str, Any] = {"run_dir": run_dir, "run_id": run_id} if run_dir else {}
+    if queue_wait_ms:
+        artifacts["queue_wait_ms"] = queue_wait_ms
+    if rusage is not None:
+        artifacts["rusage"] = rusage
+    res = AgentRes(
         text=text,
         events=events,
         status=status,
-        usage=None,
-        artifacts=artifacts,
+        usage=usage,
+        artifacts=artifacts or None,
         provider=provider,
         model=model,
         elapsed_ms=elapsed_ms,
+        timing=timing,
     )
+    if hooks is not None:
+        hooks.emit_done(res)
+    return res
 
 
 def run(
@@ -337,7 +570,60 @@ def run(
     dangerous_permissions: Optional[bool] = None,
     log_dir: Optional[str] = None,
     options: Optional[List[str]] = None,
+    limits: Optional[ResourceLimits] = None,
+    isolate: Union[bool, WorktreePool] = False,
+    priority: int = PRIORITY_NORMAL,
+    group: Optional[str] = None,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    route: Optional[RoutePolicy] = None,
+    cancel: Optional[threading.Event] = None,
+    context: Optional[Union[str, "ContextIndex", Sequence[Union[str, "ContextIndex"]]]] = None,
+    template: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
 ) -> AgentRes:
+    """
+    Run a prompt through the provider CLI.
+
+    isolate=True (or a WorktreePool) runs the agent in its own git worktree of
+    cwd so concurrent runs don't trample each other's edits; on success the
+    changes are committed and merged back, see artifacts["worktree"].
+
+    priority/group order this run in the provider's rate-limit queue (lower
+    priority first, fair across groups), see scheduler.set_rate_limit().
+
+    When an `aibaton serve` daemon is listening the run is executed there and
+    this call just waits for the result (AIBATON_NO_DAEMON=1 disables this).
+    The provider CLI gets `env` (default: this process's os.environ) either way,
+    so PATH, API keys and CODEX_HOME come from the caller, not the daemon.
+
+    on_event is called with every normalized event as it arrives; hooks
+    registered with aibaton.hooks (on_event/on_tool_call/on_text/on_done)
+    apply to every run.
+
+    route (or set_default(route=...) when no provider is given) hedges and fails
+    over between providers, see RoutePolicy. Setting `cancel` stops the run
+    with status "cancelled".
+
+    context (a ContextIndex, a text block, or a list of them) is prepended to
+    the prompt; indexes are updated for changed files first.
+
+    template names the prompt template for cache-hit stats in run.json and the
+    session; it is taken from the prompt when it was rendered by a PromptTemplate.
+    """
+    if template is None:
+        template = getattr(prompt, "template", None)
+    if context is not None:
+        from .context_index import with_context
+        prompt = with_context(prompt, context, os.path.abspath(cwd or _DEFAULT_CWD or os.getcwd()))
+    if route is None and provider is None:
+        route = _DEFAULT_ROUTE
+    if route is not None:
+        return route.run(
+            prompt, loop_max=loop_max, model=model, cwd=cwd, add_dirs=add_dirs, timeout_s=timeout_s,
+            json_mode=json_mode, stream=stream, dangerous_permissions=dangerous_permissions, log_dir=log_dir,
+            options=options, limits=limits, isolate=isolate, priority=priority, group=group,
+            on_event=on_event, cancel=cancel, template=template, env=env,
+        )
     if provider is None:
         provider = _DEFAULT_PROVIDER
     if dangerous_permissions is None:
@@ -348,115 +634,180 @@ def run(
         add_dirs = _DEFAULT_ADD_DIRS
 
     cwd_eff = cwd or os.getcwd()
-    session = None
-    session_meta = None
-    base_log_dir = log_dir
-    logger.info("run start: provider=%s cwd=%s loop_max=%d", provider, cwd_eff, loop_max)
-    if base_log_dir is None:
-        session, resumed = get_or_resume_session(cwd_eff)
-        if resumed:
-            logger.debug("session resumed: id=%s", session.get("session_id"))
-        base_log_dir = session.get("runs_dir")
-        session_meta = {
-            "id": session.get("session_id"),
-            "cwd": session.get("cwd"),
-            "resumed": resumed,
-            "status": session.get("status"),
-        }
-    elif base_log_dir:
-        os.makedirs(base_log_dir, exist_ok=True)
-
-    last_res: Optional[AgentRes] = None
-    env_base = _build_env(cwd_eff)
-    real_loop = max(loop_max, 1)
-    if real_loop > 1 and "<promise>DONE</promise>" not in prompt:
-        prompt += end_loop_tip
-    for _ in range(real_loop):
-        last_res = _run_once(
-            prompt=prompt,
-            provider=provider,
-            model=model,
-            cwd=cwd_eff,
-            add_dirs=add_dirs,
-            timeout_s=timeout_s,
-            json_mode=json_mode,
-            stream=stream,
-            dangerous_permissions=dangerous_permissions,
-            log_dir=base_log_dir,
-            session_meta=session_meta,
-            env_override=env_base,
-        )
-        if provider == "codex":
-            needs_prompt_retry = _should_retry_prompt_arg(last_res.events) or (
-                _should_retry_stdin(last_res.events) and not last_res.text
-            )
-            if needs_prompt_retry:
-                logger.debug("retrying with prompt as arg")
-                last_res = _run_once(
-                    prompt=prompt,
-                    provider=provider,
-                    model=model,
-                    cwd=cwd_eff,
-                    add_dirs=add_dirs,
-                    timeout_s=timeout_s,
-                    json_mode=json_mode,
-                    stream=stream,
-                    dangerous_permissions=dangerous_permissions,
-                    log_dir=base_log_dir,
-                    session_meta=session_meta,
-                    prompt_as_arg=True,
-                    env_override=env_base,
-                )
-            needs_home_retry = _should_retry_home_fallback(last_res.events) and (
-                last_res.status == "error" or not last_res.text
+    # hooks only fire in this process, so they keep the run out of the daemon
+    if not isinstance(isolate, WorktreePool) and get_hooks() is None:
+        from .daemon import submit_run
+        daemon_res = submit_run(dict(
+            prompt=prompt, loop_max=loop_max, provider=provider, model=model, cwd=cwd_eff,
+            add_dirs=add_dirs, timeout_s=timeout_s, json_mode=json_mode, stream=stream,
+            dangerous_permissions=dangerous_permissions, log_dir=log_dir, options=options,
+            limits=limits, isolate=isolate, priority=priority, group=group, on_event=on_event,
+            cancel=cancel, template=template, env=dict(os.environ) if env is None else env,
+        ))
+        if daemon_res is not None:
+            return daemon_res
+
+    with span("run", provider=provider, model=model, loop_max=loop_max, template=template,
+              isolate=bool(isolate), group=group) as run_span:
+        session = None
+        session_meta = None
+        base_log_dir = log_dir
+        logger.info("run start: provider=%s cwd=%s loop_max=%d", provider, cwd_eff, loop_max)
+        if base_log_dir is None:
+            session, resumed = get_or_resume_session(cwd_eff)
+            if resumed:
+                logger.debug("session resumed: id=%s", session.get("session_id"))
+            base_log_dir = session.get("runs_dir")
+            session_meta = {
+                "id": session.get("session_id"),
+                "cwd": session.get("cwd"),
+                "resumed": resumed,
+                "status": session.get("status"),
+            }
+        elif base_log_dir:
+            os.makedirs(base_log_dir, exist_ok=True)
+
+        last_res: Optional[AgentRes] = None
+        env_base = _build_env(cwd_eff, env)
+        real_loop = max(loop_max, 1)
+        if real_loop > 1 and "<promise>DONE</promise>" not in prompt:
+            prompt += end_loop_tip
+        pool = None
+        wt = None
+        run_cwd = cwd_eff
+        if isolate:
+            pool = isolate if isinstance(isolate, WorktreePool) else get_worktree_pool(cwd_eff)
+            wt = pool.acquire()
+            run_cwd = wt.path
+            logger.info("run isolated: worktree=%s base=%s", wt.path, wt.base[:12])
+        try:
+            for iteration in range(real_loop):
+                with span("iteration", index=iteration + 1):
+                    last_res = _run_once(
+                        prompt=prompt,
+                        provider=provider,
+                        model=model,
+                        cwd=run_cwd,
+                        add_dirs=add_dirs,
+                        timeout_s=timeout_s,
+                        json_mode=json_mode,
+                        stream=stream,
+                        dangerous_permissions=dangerous_permissions,
+                        log_dir=base_log_dir,
+                        session_meta=session_meta,
+                        env_override=env_base,
+                        limits=limits,
+                        priority=priority,
+                        group=group,
+                        on_event=on_event,
+                        cancel=cancel,
+                        template=template,
+                    )
+                    if provider == "codex" and last_res.status != "cancelled":
+                        needs_prompt_retry = _should_retry_prompt_arg(last_res.events) or (
+                            _should_retry_stdin(last_res.events) and not last_res.text
+                        )
+                        if needs_prompt_retry:
+                            logger.debug("retrying with prompt as arg")
+                            last_res = _run_once(
+                                prompt=prompt,
+                                provider=provider,
+                                model=model,
+                                cwd=run_cwd,
+                                add_dirs=add_dirs,
+                                timeout_s=timeout_s,
+                                json_mode=json_mode,
+                                stream=stream,
+                                dangerous_permissions=dangerous_permissions,
+                                log_dir=base_log_dir,
+                                session_meta=session_meta,
+                                prompt_as_arg=True,
+                                env_override=env_base,
+                                reason="prompt_as_arg",
+                                limits=limits,
+                                priority=priority,
+                                group=group,
+                                on_event=on_event,
+                                cancel=cancel,
+                                template=template,
+                            )
+                        needs_home_retry = _should_retry_home_fallback(last_res.events) and (
+                            last_res.status == "error" or not last_res.text
+                        )
+                        if needs_home_retry:
+                            logger.debug("retrying with HOME fallback to cwd")
+                            env_fallback = dict(env_base)
+                            env_fallback["HOME"] = cwd_eff
+                            last_res = _run_once(
+                                prompt=prompt,
+                                provider=provider,
+                                model=model,
+                                cwd=run_cwd,
+                                add_dirs=add_dirs,
+                                timeout_s=timeout_s,
+                                json_mode=json_mode,
+                                stream=stream,
+                                dangerous_permissions=dangerous_permissions,
+                                log_dir=base_log_dir,
+                                session_meta=session_meta,
+                                prompt_as_arg=True,
+                                env_override=env_fallback,
+                                reason="home_fallback",
+                                limits=limits,
+                                priority=priority,
+                                group=group,
+                                on_event=on_event,
+                                cancel=cancel,
+                                template=template,
+                            )
+                    done_flag = extract_trailing_tag(last_res.text, "promise") == "DONE"
+                    if session and last_res.artifacts and last_res.artifacts.get("run_id"):
+                        update_session(
+                            cwd_eff, session, last_res.artifacts["run_id"], last_res.status, done_flag,
+                            rusage=last_res.artifacts.get("rusage"), template=template, usage=last_res.usage,
+                            timing=last_res.timing,
+                        )
+                        if session_meta is not None:
+                            session_meta["status"] = session.get("status")
+                    if loop_max > 1 and done_flag:
+                        logger.debug("loop exit: DONE flag detected")
+                        break
+                    if last_res.status == "cancelled":
+                        break
+        finally:
+            if pool is not None and wt is not None:
+                merge = last_res is not None and last_res.status == "success"
+                merge_res = pool.release(wt, merge=merge, message=f"aibaton run in {wt.name}")
+                if last_res is not None:
+                    if last_res.artifacts is None:
+                        last_res.artifacts = {}
+                    last_res.artifacts["worktree"] = dataclasses.asdict(merge_res)
+
+        assert last_res is not None
+        logger.info("run complete: status=%s elapsed_ms=%d", last_res.status, last_res.elapsed_ms)
+
+        # If options provided, run analysis to pick best option and cache in option field
+        if options and last_res.text and last_res.status != "cancelled":
+            analysis_res = _run_once(
+                prompt=_build_option_prompt(last_res.text, options),
+                provider=provider,
+                model=model,
+                cwd=cwd_eff,
+                add_dirs=add_dirs,
+                timeout_s=timeout_s,
+                json_mode=json_mode,
+                stream=stream,
+                dangerous_permissions=dangerous_permissions,
+                log_dir=base_log_dir,
+                session_meta=session_meta,
+                env_override=env_base,
+                limits=limits,
+                priority=PRIORITY_INTERACTIVE,
+                group=group,
+                reason="options",
             )
-            if needs_home_retry:
-                logger.debug("retrying with HOME fallback to cwd")
-                env_fallback = dict(env_base)
-                env_fallback["HOME"] = cwd_eff
-                last_res = _run_once(
-                    prompt=prompt,
-                    provider=provider,
-                    model=model,
-                    cwd=cwd_eff,
-                    add_dirs=add_dirs,
-                    timeout_s=timeout_s,
-                    json_mode=json_mode,
-                    stream=stream,
-                    dangerous_permissions=dangerous_permissions,
-                    log_dir=base_log_dir,
-                    session_meta=session_meta,
-                    prompt_as_arg=True,
-                    env_override=env_fallback,
-                )
-        done_flag = extract_trailing_tag(last_res.text, "promise") == "DONE"
-        if session and last_res.artifacts and last_res.artifacts.get("run_id"):
-            update_session(cwd_eff, session, last_res.artifacts["run_id"], last_res.status, done_flag)
-            if session_meta is not None:
-                session_meta["status"] = session.get("status")
-        if loop_max > 1 and done_flag:
-            logger.debug("loop exit: DONE flag detected")
-            break
-
-    assert last_res is not None
-    logger.info("run complete: status=%s elapsed_ms=%d", last_res.status, last_res.elapsed_ms)
-
-    # If options provided, run analysis to pick best option and cache in option field
-    if options and last_res.text:
-        analysis_res = _run_once(
-            prompt=_build_option_prompt(last_res.text, options),
-            provider=provider,
-            model=model,
-            cwd=cwd_eff,
-            add_dirs=add_dirs,
-            timeout_s=timeout_s,
-            json_mode=json_mode,
-            stream=stream,
-            dangerous_permissions=dangerous_permissions,
-            log_dir=base_log_dir,
-            session_meta=session_meta,
-            env_override=env_base,
-        )
-        last_res.option = analysis_res.select()
+            last_res.option = analysis_res.select()
 
-    return last_res
+        run_span.set(status=last_res.status, elapsed_ms=last_res.elapsed_ms,
+                     tokens=(last_res.usage or {}).get("total_tokens"), option=last_res.option)
+        return last_res
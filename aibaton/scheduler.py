@@ -0,0 +1,207 @@
+"""
+Process-wide admission control in front of provider runs.
+
+Each provider can be given a `RateLimit` (runs per minute, concurrent runs,
+tokens per minute). Runs that would exceed it wait in a queue ordered by
+priority first, then fairly across groups (workflows) so one bulk job can't
+starve the others, then FIFO. Without a configured limit a provider is never
+queued.
+
+    set_rate_limit("codex", runs_per_min=20, concurrent=4, tokens_per_min=400_000)
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from .logger import logger
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 10
+PRIORITY_BULK = 20
+
+
+@dataclass
+class RateLimit:
+    runs_per_min: Optional[float] = None
+    concurrent: Optional[int] = None
+    tokens_per_min: Optional[float] = None
+
+
+class _Bucket:
+    """Token bucket refilled continuously up to `capacity` over one minute."""
+
+    def __init__(self, per_min: float) -> None:
+        self.capacity = float(per_min)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.stamp = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_s(self, need: float) -> float:
+        """Seconds until `need` units are available (0 when they already are)."""
+        self._refill()
+        if self.level >= need:
+            return 0.0
+        return (need - self.level) / self.rate
+
+    def take(self, n: float) -> None:
+        # may go negative: token usage is only known after the run
+        self._refill()
+        self.level -= n
+
+
+@dataclass
+class Ticket:
+    provider: str
+    priority: int
+    group: str
+    seq: int
+    queued_at: float = field(default_factory=time.monotonic)
+    wait_ms: int = 0
+
+
+class _ProviderQueue:
+    def __init__(self, limit: RateLimit) -> None:
+        self.limit = limit
+        self.runs = _Bucket(limit.runs_per_min) if limit.runs_per_min else None
+        # admission needs at least one token left; the real cost is debited on release
+        self.tokens = _Bucket(limit.tokens_per_min) if limit.tokens_per_min else None
+        self.active = 0
+        self.waiting: List[Ticket] = []
+        self.served: Dict[str, int] = {}
+
+    def head(self) -> Optional[Ticket]:
+        if not self.waiting:
+            return None
+        best = min(t.priority for t in self.waiting)
+        cands = [t for t in self.waiting if t.priority == best]
+        return min(cands, key=lambda t: (self.served.get(t.group, 0), t.seq))
+
+    def wait_s(self) -> Optional[float]:
+        """0 when a run can start now, seconds to the next refill, or None if blocked on a slot."""
+        if self.limit.concurrent and self.active >= self.limit.concurrent:
+            return None
+        wait = 0.0
+        if self.runs is not None:
+            wait = max(wait, self.runs.wait_s(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_s(1))
+        return wait
+
+    def enqueue(self, ticket: Ticket) -> None:
+        if ticket.group not in self.served:
+            # a new group starts level with the least-served active one instead of at zero
+            active = [self.served[t.group] for t in self.waiting if t.group in self.served]
+            self.served[ticket.group] = min(active) if active else 0
+        self.waiting.append(ticket)
+
+
+class Scheduler:
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._queues: Dict[str, _ProviderQueue] = {}
+        self._seq = 0
+
+    def set_limit(self, provider: str, limit: Optional[RateLimit]) -> None:
+        with self._cond:
+            if limit is None:
+                self._queues.pop(provider, None)
+            else:
+                q = _ProviderQueue(limit)
+                old = self._queues.get(provider)
+                if old is not None:
+                    q.active, q.waiting, q.served = old.active, old.waiting, old.served
+                self._queues[provider] = q
+            self._cond.notify_all()
+
+    def acquire(
+        self,
+        provider: str,
+        priority: int = PRIORITY_NORMAL,
+        group: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Ticket:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._seq += 1
+            ticket = Ticket(provider=provider, priority=priority, group=group or "", seq=self._seq)
+            q = self._queues.get(provider)
+            if q is None:
+                return ticket
+            q.enqueue(ticket)
+            try:
+                while True:
+                    q = self._queues.get(provider)
+                    if q is None:
+                        break
+                    wait = q.wait_s()
+                    if wait == 0 and q.head() is ticket:
+                        q.active += 1
+                        if q.runs is not None:
+                            q.runs.take(1)
+                        q.served[ticket.group] = q.served.get(ticket.group, 0) + 1
+                        break
+                    if deadline is not None:
+                        left = deadline - time.monotonic()
+                        if left <= 0:
+                            raise TimeoutError(f"rate limit queue timeout: provider={provider}")
+                        wait = left if wait is None or wait == 0 else min(wait, left)
+                    self._cond.wait(wait or None)
+            finally:
+                q = self._queues.get(provider)
+                if q is not None and ticket in q.waiting:
+                    q.waiting.remove(ticket)
+                self._cond.notify_all()
+        ticket.wait_ms = int((time.monotonic() - ticket.queued_at) * 1000)
+        if ticket.wait_ms >= 1000:
+            logger.info("rate limit wait: provider=%s group=%s wait_ms=%d", provider, ticket.group, ticket.wait_ms)
+        return ticket
+
+    def release(self, ticket: Ticket, tokens: int = 0) -> None:
+        with self._cond:
+            q = self._queues.get(ticket.provider)
+            if q is not None:
+                if q.active > 0:
+                    q.active -= 1
+                if tokens and q.tokens is not None:
+                    q.tokens.take(tokens)
+                self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, provider: str, priority: int = PRIORITY_NORMAL, group: Optional[str] = None) -> Iterator[Ticket]:
+        ticket = self.acquire(provider, priority=priority, group=group)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._cond:
+            return {p: {"active": q.active, "waiting": len(q.waiting)} for p, q in self._queues.items()}
+
+
+_scheduler = Scheduler()
+
+
+def get_scheduler() -> Scheduler:
+    return _scheduler
+
+
+def set_rate_limit(
+    provider: str,
+    runs_per_min: Optional[float] = None,
+    concurrent: Optional[int] = None,
+    tokens_per_min: Optional[float] = None,
+) -> None:
+    """Limit a provider for every run() in this process; all None removes the limit."""
+    limit = RateLimit(runs_per_min=runs_per_min, concurrent=concurrent, tokens_per_min=tokens_per_min)
+    if runs_per_min is None and concurrent is None and tokens_per_min is None:
+        limit = None
+    _scheduler.set_limit(provider, limit)
@@ -1,11 +1,15 @@
+import glob
 import hashlib
 import json
 import os
 from threading import Lock
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from .logger import logger
-from .utils import ensure_dir, now_ms
+from .proctree import merge_usage
+from .timing import merge_timing
+from .storage import flush_storage, get_writer
+from .utils import ensure_dir, now_ms, write_json_atomic
 
 _session_lock = Lock()
 
@@ -19,8 +23,7 @@ def _read_json(path: str) -> Optional[Dict[str, Any]]:
 
 
 def _write_json(path: str, data: Dict[str, Any]) -> None:
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    write_json_atomic(path, data, indent=2)
 
 
 def _agent_root() -> str:
@@ -44,6 +47,11 @@ def _workspace_dir(cwd: str) -> str:
 def _session_public(session: Dict[str, Any]) -> Dict[str, Any]:
     data = dict(session)
     data.pop("runs_dir", None)
+    if isinstance(data.get("runs"), list):
+        # snapshot so the background writer never sees later appends
+        data["runs"] = list(data["runs"])
+    if isinstance(data.get("templates"), dict):
+        data["templates"] = {k: dict(v) for k, v in data["templates"].items()}
     return data
 
 
@@ -59,6 +67,7 @@ def get_or_resume_session(cwd: str) -> Tuple[Dict[str, Any], bool]:
         )
 
     current_path = os.path.join(ws_dir, "session.json")
+    flush_storage()
     with _session_lock:
         session = _read_json(current_path)
         resumed = False
@@ -97,6 +106,10 @@ def update_session(
     run_id: str,
     status: str,
     done: bool,
+    rusage: Optional[Dict[str, Any]] = None,
+    template: Optional[str] = None,
+    usage: Optional[Dict[str, Any]] = None,
+    timing: Optional[Dict[str, Any]] = None,
 ) -> None:
     cwd_abs = os.path.abspath(cwd)
     ws_dir = _workspace_dir(cwd_abs)
@@ -108,10 +121,56 @@ def update_session(
         session.setdefault("runs", []).append(
             {"run_id": run_id, "status": status, "ts": now_ms()}
         )
+        if rusage:
+            session["rusage"] = merge_usage(session.get("rusage"), rusage)
+        if timing:
+            session["timing"] = merge_timing(session.get("timing"), timing)
+        if template:
+            stats = session.setdefault("templates", {}).setdefault(
+                template, {"runs": 0, "input_tokens": 0, "cached_input_tokens": 0}
+            )
+            stats["runs"] += 1
+            if usage:
+                stats["input_tokens"] += usage.get("input_tokens", 0)
+                stats["cached_input_tokens"] += usage.get("cached_input_tokens", 0)
+            if stats["input_tokens"]:
+                stats["cache_hit_ratio"] = round(stats["cached_input_tokens"] / stats["input_tokens"], 4)
         if done:
             session["status"] = "closed"
             logger.debug("session closed: id=%s", session.get("session_id"))
 
         session_dir = os.path.join(ws_dir, "sessions", session["session_id"])
-        _write_json(current_path, _session_public(session))
-        _write_json(os.path.join(session_dir, "session.json"), _session_public(session))
+        data = _session_public(session)
+        writer = get_writer()
+        writer.submit(_write_json, current_path, data)
+        writer.submit(_write_json, os.path.join(session_dir, "session.json"), data)
+
+
+def find_run_dir(run_id: str, cwd: Optional[str] = None) -> Optional[str]:
+    """Locate a stored run directory by run_id, searching the cwd workspace first."""
+    patterns = []
+    if cwd:
+        patterns.append(os.path.join(_workspace_dir(os.path.abspath(cwd)), "sessions", "*", "runs", run_id))
+    patterns.append(os.path.join(_agent_root(), "workspaces", "*", "sessions", "*", "runs", run_id))
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            if os.path.isdir(path):
+                return path
+    return None
+
+
+def _run_sort_key(run_dir: str) -> Tuple[int, str]:
+    name = os.path.basename(run_dir)
+    head = name.split("_", 1)[0]
+    return (int(head) if head.isdigit() else 0, name)
+
+
+def list_run_dirs(cwd: Optional[str] = None) -> List[str]:
+    """Stored run directories, newest first: those of cwd's workspace, or of every workspace when cwd is None."""
+    flush_storage()
+    if cwd:
+        base = _workspace_dir(os.path.abspath(cwd))
+    else:
+        base = os.path.join(_agent_root(), "workspaces", "*")
+    dirs = [p for p in glob.glob(os.path.join(base, "sessions", "*", "runs", "*")) if os.path.isdir(p)]
+    return sorted(dirs, key=_run_sort_key, reverse=True)
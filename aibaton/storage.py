@@ -1,8 +1,12 @@
+import atexit
 import json
 import os
-from typing import Any, Dict, List, Optional
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from .logger import logger
+from .metrics import record_write
 from .utils import ensure_dir
 
 
@@ -22,6 +26,7 @@ def write_events(run_dir: Optional[str], events: List[Dict[str, Any]]) -> None:
     with open(path, "w", encoding="utf-8") as f:
         for ev in events:
             f.write(json.dumps(ev, ensure_ascii=False) + "\n")
+    record_write(path)
     logger.debug("events written: %s count=%d", path, len(events))
 
 
@@ -31,6 +36,7 @@ def write_text(run_dir: Optional[str], text: str) -> None:
     path = os.path.join(run_dir, "output.txt")
     with open(path, "w", encoding="utf-8") as f:
         f.write(text)
+    record_write(path)
     logger.debug("output written: %s len=%d", path, len(text))
 
 
@@ -40,4 +46,82 @@ def write_summary(run_dir: Optional[str], summary: Dict[str, Any]) -> None:
     path = os.path.join(run_dir, "run.json")
     with open(path, "w", encoding="utf-8") as f:
         json.dump(summary, f, ensure_ascii=False, indent=2)
+    record_write(path)
     logger.debug("summary written: %s", path)
+
+
+_Task = Tuple[Callable[..., None], Tuple[Any, ...]]
+
+
+class StorageWriter:
+    """
+    Background writer that runs storage tasks on a dedicated thread.
+
+    Tasks run in submission order. The queue is bounded: once `max_pending`
+    tasks are waiting, `submit()` blocks until the writer catches up, so a
+    slow disk throttles producers instead of growing memory without limit.
+    """
+
+    def __init__(self, max_pending: int = 64) -> None:
+        self._queue: "queue.Queue[Optional[_Task]]" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name="aibaton-storage", daemon=True)
+            self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                fn, args = task
+                try:
+                    fn(*args)
+                except Exception:
+                    logger.exception("storage task failed: %s", getattr(fn, "__name__", fn))
+            finally:
+                self._queue.task_done()
+
+    def submit(self, fn: Callable[..., None], *args: Any) -> None:
+        self._ensure_thread()
+        self._queue.put((fn, args))
+
+    def pending(self) -> int:
+        """Tasks submitted but not yet picked up by the writer thread."""
+        return self._queue.qsize()
+
+    def flush(self) -> None:
+        """Block until every submitted task has been written."""
+        if self._thread is None:
+            return
+        self._queue.join()
+
+    def close(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+
+_writer = StorageWriter()
+
+
+def get_writer() -> StorageWriter:
+    return _writer
+
+
+def flush_storage() -> None:
+    """Wait until all pending run artifacts and session updates are on disk."""
+    _writer.flush()
+
+
+atexit.register(_writer.close)
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from aibaton.checkpoint import Checkpointer
+from aibaton.runner import AgentRes
+
+
+def _res(text, status="success"):
+    return AgentRes(text=text, events=[], status=status, usage=None, artifacts=None,
+                    provider="codex", model=None, elapsed_ms=1)
+
+
+def _live_res(text, run_id):
+    return AgentRes(text=text, events=[{"type": "message", "text": text}], status="success", usage=None,
+                    artifacts={"run_id": run_id}, provider="codex", model=None, elapsed_ms=1)
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"HOME": self.tmp.name})
+        self.env.start()
+        self.calls = []
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def _script(self, sections):
+        ckpt = Checkpointer("wf", cwd=self.tmp.name)
+
+        @ckpt.checkpoint()
+        def implement(section):
+            self.calls.append(section)
+            return _res(f"done {section}", "error" if section == "bad" else "success")
+
+        with ckpt.step("plan") as st:
+            if not st.done:
+                self.calls.append("plan")
+                st.result = _res("plan text <option>a</option>")
+        out = [st.result.select()]
+        for section in sections:
+            out.append(implement(section).text)
+        return out
+
+    def test_restart_skips_completed_steps(self):
+        first = self._script(["a", "b"])
+        self.assertEqual(self.calls, ["plan", "a", "b"])
+        self.calls.clear()
+        second = self._script(["a", "b"])
+        self.assertEqual(self.calls, [])
+        self.assertEqual(first, second)
+
+    def test_changed_input_resumes_from_first_mismatch(self):
+        self._script(["a", "b", "c"])
+        self.calls.clear()
+        self._script(["a", "x", "c"])
+        self.assertEqual(self.calls, ["x", "c"])
+
+    def test_failed_step_is_not_recorded(self):
+        self._script(["a", "bad", "c"])
+        self.calls.clear()
+        self._script(["a", "bad", "c"])
+        self.assertEqual(self.calls, ["bad", "c"])
+
+    def test_restored_result_as_input_hits_after_restart(self):
+        def script():
+            ckpt = Checkpointer("chain", cwd=self.tmp.name)
+
+            @ckpt.checkpoint()
+            def review(plan):
+                self.calls.append("review")
+                return _live_res("ok", "r2")
+
+            with ckpt.step("plan") as st:
+                if not st.done:
+                    self.calls.append("plan")
+                    st.result = _live_res("plan <option>a</option>", "r1")
+            st.result.select()  # caches option on the live object
+            return review(st.result).text
+
+        self.assertEqual(script(), "ok")
+        self.assertEqual(self.calls, ["plan", "review"])
+        self.calls.clear()
+        # restored plan has no events; the chained step must still hit
+        self.assertEqual(script(), "ok")
+        self.assertEqual(self.calls, [])
+
+    def test_unserializable_input_is_rejected(self):
+        ckpt = Checkpointer("wf", cwd=self.tmp.name)
+        with self.assertRaises(TypeError):
+            ckpt.step("s", handle=object())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from aibaton import cli
+from aibaton.providers.fake import FAKE_ENV
+from aibaton.storage import flush_storage
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"HOME": self.tmp.name, "AIBATON_NO_DAEMON": "1",
+                                                FAKE_ENV: "chunks=2,size=10"})
+        self.env.start()
+
+    def tearDown(self):
+        flush_storage()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def _main(self, *argv):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()):
+            rc = cli.main(list(argv))
+        return rc, out.getvalue()
+
+    def test_batch_streams_jsonl(self):
+        prompts = os.path.join(self.tmp.name, "prompts.jsonl")
+        with open(prompts, "w", encoding="utf-8") as f:
+            f.write('{"id": "a", "prompt": "first"}\n"second"\n\n{"prompt": "x", "bogus": 1}\n')
+        rc, out = self._main("batch", prompts, "--parallel", "2", "--provider", "fake", "--cwd", self.tmp.name)
+        rows = sorted((json.loads(line) for line in out.splitlines()), key=lambda r: r["index"])
+        self.assertEqual(rc, 1)  # one invalid line
+        self.assertEqual([r["status"] for r in rows], ["success", "success", "invalid"])
+        self.assertEqual(rows[0]["id"], "a")
+        self.assertTrue(rows[1]["text"].startswith("the quick"))
+
+        rc, out = self._main("runs", "ls", "--cwd", self.tmp.name, "--json")
+        listed = [json.loads(line) for line in out.splitlines()]
+        self.assertEqual(sorted(r["prompt"] for r in listed), ["first", "second"])
+        rc, out = self._main("runs", "show", listed[0]["run_id"], "--json")
+        self.assertEqual(json.loads(out)["text"], rows[0]["text"])
+
+    def test_import_is_lazy(self):
+        code = "import sys, aibaton; print('aibaton.runner' in sys.modules); aibaton.run; print('aibaton.runner' in sys.modules)"
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out.split(), ["False", "True"])
+
+    def test_submodule_import_keeps_decorator(self):
+        code = ("import aibaton.checkpoint, aibaton.logger; from aibaton import checkpoint, logger; "
+                "print(callable(checkpoint), hasattr(logger, 'info'))")
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out.split(), ["True", "True"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+
+from aibaton.cluster import ClusterClient, ClusterError, Coordinator
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestCluster(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"HOME": self.tmp.name})
+        self.env.start()
+        self.coord = Coordinator(port=0).start()
+        self.client = ClusterClient(self.coord.url)
+        self.workers = []
+
+    def tearDown(self):
+        for proc in self.workers:
+            proc.kill()
+            proc.wait()
+        self.coord.close()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def _worker(self, name, providers="codex", **extra_env):
+        env = dict(os.environ, PYTHONPATH=_ROOT, AIBATON_NO_DAEMON="1", **extra_env)
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "aibaton", "worker", "--url", self.coord.url, "--name", name,
+             "--providers", providers, "--log", os.path.join(self.tmp.name, f"{name}.log")],
+            cwd=_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        self.workers.append(proc)
+        deadline = time.monotonic() + 10
+        while name not in [w["name"] for w in self.client.workers()]:
+            self.assertLess(time.monotonic(), deadline, "worker did not register")
+            time.sleep(0.05)
+
+    def test_process_jobs_spread_over_workers(self):
+        self._worker("w1")
+        self._worker("w2")
+        code = "import time; time.sleep(0.3); print('ok')"
+        ids = [self.client.submit("process", {"cmd": [sys.executable, "-c", code]}) for _ in range(4)]
+        start = time.monotonic()
+        jobs = [self.client.wait(i, timeout=20) for i in ids]
+        self.assertLess(time.monotonic() - start, 1.2)  # capacity 1 each: two rounds, not four
+        self.assertEqual([j["result"]["stdout"] for j in jobs], ["ok\n"] * 4)
+        self.assertEqual({j["worker"] for j in jobs}, {"w1", "w2"})
+
+    def test_run_streams_events_into_coordinator_storage(self):
+        recorded = os.path.join(self.tmp.name, "recorded")
+        os.makedirs(recorded)
+        with open(os.path.join(recorded, "events.jsonl"), "w", encoding="utf-8") as f:
+            for i in range(3):
+                f.write(json.dumps({"type": "item.completed", "ts": i, "source": "codex", "payload": {
+                    "type": "item.completed", "item": {"type": "agent_message", "text": f"p{i} "}}}) + "\n")
+        self._worker("r1", providers="replay", AIBATON_REPLAY_DIR=recorded, AIBATON_REPLAY_SPEED="0")
+        res = self.client.run("hi", provider="replay", cwd=self.tmp.name)
+        self.assertEqual(res.status, "success")
+        self.assertEqual(res.artifacts["worker"], "r1")
+        self.assertTrue(res.artifacts["run_dir"].startswith(self.coord.runs_dir))
+        self.assertEqual(len(res.events), 3)
+        self.assertTrue(os.path.exists(os.path.join(res.artifacts["run_dir"], "run.json")))
+
+    def test_repo_job_uploads_patch(self):
+        repo = os.path.join(self.tmp.name, "repo")
+        os.makedirs(repo)
+        git_env = {"GIT_AUTHOR_NAME": "t", "GIT_AUTHOR_EMAIL": "t@e", "GIT_COMMITTER_NAME": "t",
+                   "GIT_COMMITTER_EMAIL": "t@e", "GIT_CONFIG_GLOBAL": os.devnull}
+        with mock.patch.dict(os.environ, git_env):
+            subprocess.run(["git", "-C", repo, "init", "-q"], check=True)
+            with open(os.path.join(repo, "a.txt"), "w") as f:
+                f.write("a\n")
+            subprocess.run(["git", "-C", repo, "add", "-A"], check=True)
+            subprocess.run(["git", "-C", repo, "commit", "-q", "-m", "init"], check=True)
+            self._worker("g1")
+        code = "print(open('a.txt').read().strip()); open('b.txt', 'w').write('new\\n')"
+        job = self.client.wait(self.client.submit("process", {
+            "cmd": [sys.executable, "-c", code], "repo": {"url": repo, "ref": "HEAD"},
+        }), timeout=20)
+        self.assertEqual(job["result"]["stdout"], "a\n")
+        with open(os.path.join(job["run_dir"], "changes.patch")) as f:
+            self.assertIn("+new", f.read())
+        self.assertFalse(os.path.exists(os.path.join(repo, "b.txt")))
+
+    def test_requeued_job_starts_a_fresh_event_log(self):
+        coord = Coordinator(port=0, worker_ttl_s=0.1)
+        try:
+            lost = coord._register({"name": "lost"})["worker_id"]
+            job_id = coord.submit("process", {"cmd": ["true"]})
+            self.assertEqual(coord._poll({"worker_id": lost})["job"]["id"], job_id)
+            coord._events(job_id, {"worker_id": lost, "events": [{"type": "partial"}]})
+            time.sleep(0.2)
+            fresh = coord._register({"name": "fresh"})["worker_id"]
+            self.assertEqual(coord._poll({"worker_id": fresh})["job"]["id"], job_id)
+            with self.assertRaises(ClusterError):
+                coord._events(job_id, {"worker_id": lost, "events": [{"type": "late"}]})
+            coord._events(job_id, {"worker_id": fresh, "events": [{"type": "retry"}]})
+            coord._complete(job_id, {"worker_id": fresh, "result": {}})
+            job = coord.wait(job_id)
+
+            def read(name):
+                with open(os.path.join(job["run_dir"], name), encoding="utf-8") as f:
+                    return [json.loads(line)["type"] for line in f]
+
+            self.assertEqual(job["attempt"], 2)
+            self.assertEqual(read("events.jsonl"), ["retry"])
+            self.assertEqual(read("events.attempt1.jsonl"), ["partial"])
+        finally:
+            coord._server.server_close()
+
+    def test_token_required_off_loopback(self):
+        with mock.patch.dict(os.environ, {"AIBATON_CLUSTER_TOKEN": ""}):
+            with self.assertRaises(ClusterError):
+                Coordinator(host="0.0.0.0", port=0)
+        coord = Coordinator(host="0.0.0.0", port=0, token="secret").start()
+        try:
+            url = f"http://127.0.0.1:{coord._server.server_address[1]}/workers"
+            with self.assertRaises(urllib.error.HTTPError) as ctx:
+                urllib.request.urlopen(url, timeout=5)
+            self.assertEqual(ctx.exception.code, 401)
+            self.assertEqual(ClusterClient(url.rsplit("/", 1)[0], token="secret").workers(), [])
+            req = urllib.request.Request(url, data=b"{}", headers={"Authorization": "Bearer secret",
+                                                                   "Content-Length": "bogus"})
+            with self.assertRaises(urllib.error.HTTPError) as ctx:
+                urllib.request.urlopen(req, timeout=5)
+            self.assertEqual(ctx.exception.code, 400)
+        finally:
+            coord.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
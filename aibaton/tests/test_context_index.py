@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from aibaton import runner
+from aibaton.context_index import ContextIndex, summarize_head
+from aibaton.runner import AgentRes
+from aibaton.storage import flush_storage
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+class TestContextIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"HOME": self.tmp.name, "AIBATON_NO_DAEMON": "1"})
+        self.env.start()
+        self.root = os.path.join(self.tmp.name, "docs")
+        _write(os.path.join(self.root, "market", "kline.md"), "# Get Kline\n\n```\nGET /v5/market/kline\n```\n")
+        _write(os.path.join(self.root, "order", "create.md"), "# Place Order\n\nPOST /v5/order/create\n")
+        _write(os.path.join(self.root, "util.py"), '"""Shared helpers.\n\nMore text."""\n')
+
+    def tearDown(self):
+        flush_storage()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_summaries(self):
+        self.assertEqual(summarize_head("a.md", "# Get Kline\nGET /v5/market/kline\n"), "Get Kline — GET /v5/market/kline")
+        self.assertEqual(summarize_head("a.go", "// Package a parses things.\npackage a\n"), "Package a parses things.")
+        self.assertEqual(summarize_head("a.py", '"""Shared helpers.\n\nMore."""\n'), "Shared helpers.")
+
+    def test_update_only_rereads_changed_files(self):
+        calls = []
+
+        def summarizer(rel, head):
+            calls.append(rel)
+            return summarize_head(rel, head)
+
+        index = ContextIndex(self.root, "*", summarizer=summarizer)
+        self.assertEqual(index.update()["added"], 3)
+        self.assertEqual(len(calls), 3)
+
+        # a fresh instance loads the cached state; a touch without changes is not re-read
+        path = os.path.join(self.root, "order", "create.md")
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        index = ContextIndex(self.root, "*", summarizer=summarizer)
+        self.assertEqual(index.update(), {"added": 0, "changed": 0, "removed": 0, "unchanged": 3})
+        self.assertEqual(len(calls), 3)
+
+        _write(path, "# Amend Order\n\nPOST /v5/order/amend\n")
+        os.remove(os.path.join(self.root, "util.py"))
+        stats = index.update()
+        self.assertEqual((stats["changed"], stats["removed"], stats["unchanged"]), (1, 1, 1))
+        self.assertEqual(calls[3:], ["order/create.md"])
+        self.assertIn("create.md: Amend Order — POST /v5/order/amend", index.render())
+
+    def test_render_groups_and_truncates(self):
+        index = ContextIndex(self.root, "*.md")
+        index.update()
+        text = index.render(base=self.tmp.name)
+        self.assertEqual(text.splitlines(), [
+            '<context_index root="docs">',
+            "market/",
+            "  kline.md: Get Kline — GET /v5/market/kline",
+            "order/",
+            "  create.md: Place Order — POST /v5/order/create",
+            "</context_index>",
+        ])
+        short = index.render(max_chars=110)
+        self.assertIn("... (1 more files)", short)
+
+    def test_run_prepends_index(self):
+        seen = []
+
+        def fake_run_once(**kwargs):
+            seen.append(kwargs["prompt"])
+            return AgentRes(text="ok", events=[], status="success", usage=None, artifacts=None,
+                            provider="codex", model=None, elapsed_ms=1)
+
+        index = ContextIndex(self.root, "*.md")
+        with mock.patch.object(runner, "_run_once", side_effect=fake_run_once):
+            runner.run("Implement kline.", cwd=self.tmp.name, log_dir="", context=index)
+        self.assertTrue(seen[0].startswith('<context_index root="docs">'))
+        self.assertTrue(seen[0].endswith("\n\nImplement kline."))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from aibaton.daemon import Daemon, DaemonClient, _jobs_dir
+from aibaton.runner import run
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "unix sockets only")
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sock = os.path.join(self.tmp.name, "d.sock")
+        self.env = mock.patch.dict(os.environ, {"HOME": self.tmp.name, "AIBATON_SOCKET": self.sock})
+        self.env.start()
+        self.client = DaemonClient()
+        self.proc = None
+
+    def tearDown(self):
+        self._stop()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def _start(self, **extra_env):
+        env = dict(os.environ, AIBATON_REPLAY_SPEED="0", PYTHONPATH=_ROOT, **extra_env)
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "aibaton", "serve", "--workers", "2", "--log", os.path.join(self.tmp.name, "d.log")],
+            cwd=_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 10
+        while not self.client.ping():
+            self.assertLess(time.monotonic(), deadline, "daemon did not start")
+            time.sleep(0.05)
+
+    def _stop(self):
+        if self.proc is not None:
+            if self.client.ping():
+                self.client.shutdown()
+            self.proc.wait(10)
+            self.proc = None
+
+    def test_process_job(self):
+        self._start()
+        self.assertEqual(os.stat(self.sock).st_mode & 0o777, 0o600)
+        res = self.client.process([sys.executable, "-c", "print('from daemon')"])
+        self.assertEqual(res.status, "success")
+        self.assertEqual(res.stdout, "from daemon\n")
+
+    def test_run_is_submitted_transparently(self):
+        run_dir = os.path.join(self.tmp.name, "recorded")
+        os.makedirs(run_dir)
+        with open(os.path.join(run_dir, "events.jsonl"), "w", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "item.completed", "ts": 1, "source": "codex", "payload": {
+                "type": "item.completed", "item": {"type": "agent_message", "text": "via daemon"}}}) + "\n")
+        self._start()
+        # the daemon runs the CLI with the caller's environment, not its own
+        caller_env = {"AIBATON_REPLAY_DIR": run_dir, "AIBATON_REPLAY_SPEED": "0", "PYTHONPATH": _ROOT}
+        with mock.patch.dict(os.environ, caller_env):
+            res = run("hi", provider="replay", cwd=self.tmp.name, stream=False)
+        self.assertEqual(res.text, "via daemon")
+        self.assertEqual(len(res.events), 1)
+        # executed by the daemon: the run dir lives under its session, jobs list shows it
+        self.assertTrue(os.path.isdir(res.artifacts["run_dir"]))
+        self.assertEqual([j["status"] for j in self.client.jobs()], ["done"])
+        self.assertNotIn("env", self.client.jobs()[0]["args"])
+
+    def test_queued_jobs_survive_restart(self):
+        job = {"id": "1_1", "kind": "process", "status": "running", "created_at": 1,
+               "args": {"cmd": [sys.executable, "-c", "print('recovered')"]}}
+        with open(os.path.join(_jobs_dir(), "1_1.json"), "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        self._start()
+        done = self.client.wait("1_1", timeout=10)
+        self.assertEqual(done["result"]["stdout"], "recovered\n")
+
+    def test_wait_reconnects_after_restart(self):
+        self._start()
+        cmd = [sys.executable, "-c", "import time; time.sleep(1); print('resumed')"]
+        job_id = self.client.submit("process", {"cmd": cmd})
+        result = {}
+        waiter = threading.Thread(target=lambda: result.update(job=self.client.wait(job_id, timeout=30)))
+        waiter.start()
+        time.sleep(0.3)
+        self.proc.kill()  # crash: the job file still says "running"
+        self.proc.wait(10)
+        self._start()
+        waiter.join(30)
+        self.assertEqual(result["job"]["result"]["stdout"], "resumed\n")
+
+    def test_finished_jobs_drop_env_and_leave_memory(self):
+        daemon = Daemon(self.sock, max_workers=1)
+        worker = threading.Thread(target=daemon._worker, daemon=True)
+        worker.start()
+        env = dict(os.environ, SECRET_KEY="sk-test")
+        cmd = [sys.executable, "-c", "import os; print(os.environ['SECRET_KEY'])"]
+        try:
+            with mock.patch("aibaton.daemon._MAX_DONE_IN_MEMORY", 2):
+                ids = [daemon.submit("process", {"cmd": cmd, "env": env}) for _ in range(4)]
+                jobs = [daemon.wait(job_id, timeout=30) for job_id in ids]
+        finally:
+            daemon._queue.put(None)
+            worker.join(10)
+        self.assertEqual([j["result"]["stdout"] for j in jobs], ["sk-test\n"] * 4)
+        for job_id in ids:
+            with open(os.path.join(_jobs_dir(), f"{job_id}.json"), encoding="utf-8") as f:
+                self.assertNotIn("env", json.load(f)["args"])
+        self.assertEqual(sorted(daemon._jobs), ids[2:])
+        # evicted jobs are still served from their job file
+        self.assertEqual(daemon.wait(ids[0])["result"]["stdout"], "sk-test\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
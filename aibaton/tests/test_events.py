@@ -1,6 +1,6 @@
 import unittest
 
-from aibaton.events import extract_text
+from aibaton.events import extract_text, extract_usage, normalize_event
 
 
 class TestEvents(unittest.TestCase):
@@ -27,6 +27,23 @@ class TestEvents(unittest.TestCase):
         }
         self.assertIsNone(extract_text(raw))
 
+    def test_extract_usage_codex_turns_are_summed(self):
+        turn = {"type": "turn.completed", "usage": {"input_tokens": 100, "cached_input_tokens": 40, "output_tokens": 7}}
+        events = [normalize_event(turn, "codex"), normalize_event(dict(turn), "codex")]
+        self.assertEqual(extract_usage(events), {
+            "input_tokens": 200, "cached_input_tokens": 80, "output_tokens": 14, "total_tokens": 214,
+        })
+
+    def test_extract_usage_claude_result(self):
+        raw = {"type": "result", "usage": {
+            "input_tokens": 5, "cache_read_input_tokens": 90, "cache_creation_input_tokens": 10, "output_tokens": 3,
+        }}
+        usage = extract_usage([normalize_event(raw, "claude")])
+        self.assertEqual(usage["input_tokens"], 105)
+        self.assertEqual(usage["cached_input_tokens"], 90)
+        self.assertEqual(usage["total_tokens"], 108)
+        self.assertIsNone(extract_usage([normalize_event({"type": "message", "text": "x"}, "codex")]))
+
 
 if __name__ == "__main__":
     unittest.main()
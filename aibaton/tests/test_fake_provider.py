@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from aibaton import runner
+from aibaton.providers.fake import FAKE_ENV, generate, parse_config
+from aibaton.storage import flush_storage
+
+
+class TestFakeProvider(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"HOME": self.tmp.name, "AIBATON_NO_DAEMON": "1"})
+        self.env.start()
+
+    def tearDown(self):
+        flush_storage()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def _run(self, spec):
+        os.environ[FAKE_ENV] = spec
+        return runner.run("hi", provider="fake", cwd=self.tmp.name, stream=False)
+
+    def test_codex_stream(self):
+        res = self._run("chunks=4,size=10,tools=2,errors=1")
+        self.assertEqual(res.status, "success")
+        messages = [ev for ev in res.events if (ev["payload"].get("item") or {}).get("type") == "agent_message"]
+        self.assertEqual(len(messages), 4)
+        self.assertTrue(res.text.startswith("the quick"))
+        self.assertEqual(res.timing["tool_calls"], 2)
+        self.assertEqual(res.usage["cached_input_tokens"], 800)
+        self.assertEqual(sum(1 for ev in res.events if ev["payload"].get("stream") == "stderr"), 1)
+
+    def test_claude_deltas_and_exit_code(self):
+        res = self._run("format=claude,chunks=3,size=5,deltas=1,tools=1,exit=3")
+        self.assertEqual(res.status, "error")
+        # the tool_result content is extracted as text too, as for the real CLI
+        self.assertEqual(res.text, "okthe qquickbrown")
+        self.assertEqual(res.timing["tool_calls"], 1)
+
+    def test_pacing(self):
+        config = parse_config("chunks=2,rate=10,stall_ms=500,tool_ms=100,tools=1")
+        delays = [delay for _, _, delay in generate(config)]
+        self.assertAlmostEqual(sum(delays), 0.1 * 7 + 0.5 + 0.1)  # 7 stdout events
+        with self.assertRaises(ValueError):
+            parse_config("format=gemini")
+
+
+if __name__ == "__main__":
+    unittest.main()
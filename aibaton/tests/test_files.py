@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from aibaton.files import FileState, in_shard, map_files, parse_shard, scan_files
+from aibaton.runner import AgentRes
+from aibaton.storage import flush_storage
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _res(status="success"):
+    return AgentRes(text="ok", events=[], status=status, usage=None, artifacts=None,
+                    provider="codex", model=None, elapsed_ms=1)
+
+
+class TestFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"HOME": self.tmp.name})
+        self.env.start()
+        self.root = os.path.join(self.tmp.name, "proj")
+        _write(os.path.join(self.root, "a.go"), "package a\n" * 5)
+        _write(os.path.join(self.root, "pkg", "b.go"), "package b\n")
+        _write(os.path.join(self.root, "pkg", "c.txt"), "x\n")
+        _write(os.path.join(self.root, "vendor", "d.go"), "package d\n")
+        _write(os.path.join(self.root, ".gitignore"), "vendor/\n")
+
+    def tearDown(self):
+        flush_storage()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def _rel(self, paths):
+        return [os.path.relpath(p, self.root) for p in paths]
+
+    def test_scan_walk_and_min_lines(self):
+        self.assertEqual(self._rel(scan_files(self.root, "*.go")), ["a.go", "pkg/b.go", "vendor/d.go"])
+        self.assertEqual(self._rel(scan_files(self.root, "pkg/*")), ["pkg/b.go", "pkg/c.txt"])
+        self.assertEqual(self._rel(scan_files(self.root, "**/*.go", min_lines=3)), ["a.go"])
+
+    def test_scan_honours_gitignore_in_repo(self):
+        subprocess.run(["git", "-C", self.root, "init", "-q"], check=True)
+        self.assertEqual(self._rel(scan_files(self.root, "*.go")), ["a.go", "pkg/b.go"])
+
+    def test_shards_partition_the_list(self):
+        keys = [f"src/f{i}.go" for i in range(200)]
+        parts = [[k for k in keys if in_shard(k, f"{i}/3")] for i in (1, 2, 3)]
+        self.assertEqual(sorted(sum(parts, [])), sorted(keys))
+        self.assertTrue(all(parts))
+        with self.assertRaises(ValueError):
+            parse_shard("0/3")
+
+    def test_map_files_skips_unchanged(self):
+        with mock.patch("aibaton.files.run", side_effect=lambda *a, **k: _res()) as fake:
+            done = map_files("*.go", "review {relpath}", root=self.root)
+            self.assertEqual(fake.call_count, 3)
+            self.assertEqual(fake.call_args_list[0][0][0], "review a.go")
+            self.assertEqual(len(done), 3)
+
+            fake.reset_mock()
+            self.assertEqual(map_files("*.go", "review {relpath}", root=self.root), {})
+            self.assertEqual(fake.call_count, 0)
+
+            _write(os.path.join(self.root, "pkg", "b.go"), "package b\n// changed\n")
+            done = map_files("*.go", "review {relpath}", root=self.root)
+            self.assertEqual(self._rel(done), ["pkg/b.go"])
+
+    def test_failed_runs_are_retried(self):
+        with mock.patch("aibaton.files.run", side_effect=lambda *a, **k: _res("error")) as fake:
+            map_files(["a.go"], "review {path}", root=self.root)
+            map_files(["a.go"], "review {path}", root=self.root)
+        self.assertEqual(fake.call_count, 2)
+
+    def test_shard_processes_share_the_state(self):
+        rels = [f"src/f{i}.go" for i in range(60)]
+        for rel in rels:
+            _write(os.path.join(self.root, rel), rel + "\n")
+        script = (
+            "import os, sys\n"
+            "from aibaton.files import FileState, in_shard\n"
+            "from aibaton.storage import flush_storage\n"
+            "root, shard = sys.argv[1], sys.argv[2]\n"
+            "state = FileState('batch', root, shard)\n"
+            "for i in range(60):\n"
+            "    rel = f'src/f{i}.go'\n"
+            "    if in_shard(rel, shard):\n"
+            "        state.record(rel, os.path.join(root, rel))\n"
+            "flush_storage()\n"
+        )
+        cwd = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        procs = [subprocess.Popen([sys.executable, "-c", script, self.root, f"{i}/2"], cwd=cwd) for i in (1, 2)]
+        self.assertEqual([p.wait(timeout=60) for p in procs], [0, 0])
+        self.assertEqual(sorted(FileState("batch", self.root).files), sorted(rels))
+
+        # a forced rerun of one shard only forgets that shard's files
+        state = FileState("batch", self.root, "1/2")
+        state.reset()
+        flush_storage()
+        self.assertEqual(sorted(FileState("batch", self.root).files), sorted(r for r in rels if in_shard(r, "2/2")))
+
+
+if __name__ == "__main__":
+    unittest.main()
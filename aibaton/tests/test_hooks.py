@@ -0,0 +1,72 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from aibaton import hooks, runner
+from aibaton.storage import flush_storage
+
+_EVENTS = [
+    {"type": "thread.started"},
+    {"type": "item.started", "item": {"id": "c1", "type": "command_execution", "command": "ls"}},
+    {"type": "item.completed", "item": {"id": "c1", "type": "command_execution", "command": "ls"}},
+    {"type": "item.completed", "item": {"type": "agent_message", "text": "done"}},
+    {"type": "turn.completed", "usage": {"input_tokens": 10, "output_tokens": 2}},
+]
+_SCRIPT = "\n".join(f"print({json.dumps(ev)!r})" for ev in _EVENTS)
+
+
+class _Script:
+    transports = ("stdin",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def build_command(self, prompt, json_mode, cwd, add_dirs, dangerous_permissions, transport="stdin"):
+        return [sys.executable, "-c", _SCRIPT], prompt
+
+
+class TestHooks(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"HOME": self.tmp.name, "AIBATON_NO_DAEMON": "1"})
+        self.env.start()
+        self.providers = mock.patch.object(runner, "_get_provider", _Script)
+        self.providers.start()
+
+    def tearDown(self):
+        hooks.clear_hooks()
+        self.providers.stop()
+        flush_storage()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_dispatch_by_type(self):
+        seen = []
+        hooks.on_event("turn.completed", lambda ev: seen.append(("turn", ev["payload"]["usage"]["input_tokens"])))
+        hooks.on_tool_call(lambda name, ev: seen.append(("tool", name)))
+        hooks.on_text(lambda text, ev: seen.append(("text", text)))
+        hooks.on_done(lambda res: seen.append(("done", res.status)))
+
+        @hooks.on_event("*")
+        def broken(ev):
+            raise RuntimeError("hook bug")
+
+        res = runner.run("hi", provider="codex", cwd=self.tmp.name, stream=False)
+        self.assertEqual(res.status, "success")
+        self.assertEqual(seen, [("tool", "command_execution: ls"), ("text", "done"), ("turn", 10), ("done", "success")])
+
+    def test_remove_hook(self):
+        seen = []
+        cb = hooks.on_event("turn.completed", seen.append)
+        hooks.on_done(cb)
+        hooks.remove_hook(cb)
+        self.assertIsNone(hooks.get_hooks())
+        runner.run("hi", provider="codex", cwd=self.tmp.name, stream=False)
+        self.assertEqual(seen, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+import urllib.request
+from unittest import mock
+
+from aibaton import metrics, runner
+from aibaton.storage import flush_storage
+
+_EVENTS = [
+    {"type": "item.completed", "item": {"type": "agent_message", "text": "done"}},
+    {"type": "turn.completed", "usage": {"input_tokens": 100, "cached_input_tokens": 40, "output_tokens": 5}},
+]
+_SCRIPT = "\n".join(f"print({json.dumps(ev)!r})" for ev in _EVENTS)
+
+
+class _Script:
+    transports = ("stdin",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def build_command(self, prompt, json_mode, cwd, add_dirs, dangerous_permissions, transport="stdin"):
+        return [sys.executable, "-c", _SCRIPT], prompt
+
+
+class TestRegistry(unittest.TestCase):
+    def test_text_format(self):
+        reg = metrics.Registry()
+        reg.inc("aibaton_runs_completed_total", provider="codex", status="success")
+        reg.inc("aibaton_runs_completed_total", provider="codex", status="success")
+        reg.observe("aibaton_run_duration_seconds", 3.2, provider="codex")
+        text = reg.render()
+        self.assertIn("# TYPE aibaton_run_duration_seconds histogram", text)
+        self.assertIn('aibaton_runs_completed_total{provider="codex",status="success"} 2', text)
+        self.assertIn('aibaton_run_duration_seconds_bucket{provider="codex",le="1"} 0', text)
+        self.assertIn('aibaton_run_duration_seconds_bucket{provider="codex",le="5"} 1', text)
+        self.assertIn('aibaton_run_duration_seconds_bucket{provider="codex",le="+Inf"} 1', text)
+        self.assertIn('aibaton_run_duration_seconds_sum{provider="codex"} 3.2', text)
+
+    def test_disabled_is_noop(self):
+        metrics.disable_metrics()
+        metrics.inc("aibaton_runs_started_total", provider="codex")
+        self.assertEqual(metrics.render_metrics(), "")
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"HOME": self.tmp.name, "AIBATON_NO_DAEMON": "1"})
+        self.env.start()
+        self.providers = mock.patch.object(runner, "_get_provider", _Script)
+        self.providers.start()
+
+    def tearDown(self):
+        metrics.disable_metrics()
+        self.providers.stop()
+        flush_storage()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_run_is_counted_and_served(self):
+        dump = os.path.join(self.tmp.name, "prom", "aibaton.prom")
+        metrics.enable_metrics(port=0, path=dump, interval_s=60)
+        runner.run("hi", provider="codex", cwd=self.tmp.name, stream=False)
+        flush_storage()
+        url = f"http://127.0.0.1:{metrics.metrics_port()}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            text = resp.read().decode("utf-8")
+        self.assertIn('aibaton_runs_started_total{provider="codex"} 1', text)
+        self.assertIn('aibaton_runs_completed_total{provider="codex",status="success"} 1', text)
+        self.assertIn('aibaton_runs_active{provider="codex"} 0', text)
+        self.assertIn('aibaton_tokens_total{kind="cached_input",provider="codex"} 40', text)
+        self.assertIn('aibaton_tokens_total{kind="input",provider="codex"} 60', text)
+        self.assertIn('aibaton_storage_bytes_written_total{file="run.json"}', text)
+        self.assertIn("aibaton_processes_active 0", text)
+        # the file dump is written immediately, then every interval_s
+        with open(dump, encoding="utf-8") as f:
+            self.assertIn("# TYPE aibaton_runs_started_total counter", f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,253 @@
+import sys
+import unittest
+
+from aibaton.process import start_process
+
+
+def _py(code):
+    return [sys.executable, "-c", code]
+
+
+class TestProcess(unittest.TestCase):
+    def test_collects_output(self):
+        res = start_process(_py("import sys\nprint('a')\nprint('b', file=sys.stderr)")).wait()
+        self.assertEqual(res.status, "success")
+        self.assertEqual(res.stdout, "a\n")
+        self.assertEqual(res.stderr, "b\n")
+        self.assertEqual(len(res.events), 2)
+
+    def test_bounded_mode_spills_to_disk(self):
+        res = start_process(_py("for i in range(5000): print('line', i)"), max_lines=50).wait()
+        self.assertEqual(res.status, "success")
+        self.assertTrue(res.truncated)
+        self.assertEqual(len(res.events), 50)
+        self.assertTrue(res.stdout.endswith("line 4999\n"))
+        self.assertEqual(res.stdout.count("\n"), 50)
+        self.assertEqual(sum(1 for _ in res.iter_lines()), 5000)
+        self.assertTrue(res.read_stdout().startswith("line 0\n"))
+
+    def test_spill_files_use_the_handle_encoding(self):
+        code = "import sys; sys.stdout.buffer.write('caf\\xe9\\n'.encode('latin-1') * 20)"
+        res = start_process(_py(code), max_lines=5, encoding="latin-1").wait()
+        self.assertTrue(res.truncated)
+        self.assertEqual(res.stdout, "caf\xe9\n" * 5)
+        self.assertEqual(res.read_stdout(), "caf\xe9\n" * 20)
+        self.assertEqual(next(res.iter_lines()), "caf\xe9\n")
+
+    def test_poll_events_is_not_left_consuming(self):
+        handle = start_process(_py("print('x')"), max_lines=5)
+        handle.poll_events()
+        self.assertFalse(handle._consuming)
+        handle.wait()
+
+    def test_spill_files_are_removed(self):
+        import gc
+        import os
+
+        res = start_process(_py("print('x')"), max_lines=5).wait()
+        paths = [res.stdout_path, res.stderr_path]
+        self.assertTrue(all(os.path.exists(p) for p in paths))
+        res.cleanup()
+        self.assertFalse(any(os.path.exists(p) for p in paths))
+        self.assertEqual(res.read_stdout(), "x\n")
+
+        res = start_process(_py("print('x')"), max_lines=5).wait()
+        paths = [res.stdout_path, res.stderr_path]
+        del res
+        gc.collect()
+        self.assertFalse(any(os.path.exists(p) for p in paths))
+
+        res = start_process(_py("print('x')"), max_lines=5, keep_spill=True).wait()
+        paths = [res.stdout_path, res.stderr_path]
+        del res
+        gc.collect()
+        self.assertTrue(all(os.path.exists(p) for p in paths))
+        for p in paths:
+            os.remove(p)
+
+    def test_bounded_queue_back_pressure_delivers_all_events(self):
+        handle = start_process(_py("for i in range(3000): print(i)"), max_lines=10)
+        seen = [ev["payload"]["text"] for ev in handle.iter_events()]
+        self.assertEqual(seen, [str(i) for i in range(3000)])
+        self.assertEqual(handle.result().status, "success")
+
+
+class TestProcessManager(unittest.TestCase):
+    def test_many_handles_share_one_reactor(self):
+        from aibaton.reactor import ProcessManager
+
+        mgr = ProcessManager()
+        handles = [mgr.start_process(_py(f"print({i})\nprint('x' * 10)")) for i in range(20)]
+        results = [h.wait(timeout=30) for h in handles]
+        for i, res in enumerate(results):
+            self.assertEqual(res.status, "success")
+            self.assertEqual(res.stdout, f"{i}\n{'x' * 10}\n")
+            self.assertIsNotNone(res.rusage)
+        self.assertEqual(mgr.active(), 0)
+        mgr.close(timeout=5)
+
+    def test_reactor_timeout_and_back_pressure(self):
+        from aibaton.reactor import ProcessManager
+
+        mgr = ProcessManager()
+        slow = mgr.start_process(_py("import time\ntime.sleep(30)"), timeout_s=0.3)
+        bounded = mgr.start_process(_py("for i in range(3000): print(i)"), max_lines=10)
+        seen = [ev["payload"]["text"] for ev in bounded.iter_events()]
+        self.assertEqual(seen, [str(i) for i in range(3000)])
+        self.assertEqual(slow.wait(timeout=10).status, "timeout")
+        mgr.close(timeout=5)
+
+    def test_reactor_large_tee_does_not_stall(self):
+        from aibaton.process import start_pipeline
+        from aibaton.reactor import ProcessManager
+
+        mgr = ProcessManager()
+        gen = _py("import sys\nfor i in range(400): sys.stdout.write('x' * 60000 + '\\n')")
+        first, last = start_pipeline([gen, ["cat"]], observe=True, manager=mgr)
+        other = mgr.start_process(_py("print('ok')"))
+        self.assertEqual(other.wait(timeout=10).stdout, "ok\n")
+        res = last.wait(timeout=30)
+        self.assertIsNotNone(res)
+        self.assertEqual(len(res.stdout), 400 * 60001)
+        self.assertEqual(len(first.wait(timeout=30).stdout), 400 * 60001)
+        mgr.close(timeout=5)
+
+
+def _alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "process groups checked via /proc")
+class TestProcessTree(unittest.TestCase):
+    def test_timeout_kills_grandchildren(self):
+        import time
+
+        handle = start_process(["sh", "-c", "sleep 30 & echo $!; wait"], timeout_s=0.5)
+        res = handle.wait(timeout=10)
+        self.assertEqual(res.status, "timeout")
+        grandchild = int(res.stdout.split()[0])
+        deadline = time.monotonic() + 5
+        while _alive(grandchild) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(_alive(grandchild))
+
+    def test_tracked_groups_die_at_exit_unless_detached(self):
+        import os
+        import signal
+        import subprocess
+        import time
+
+        code = (
+            "import sys\n"
+            "from aibaton.process import start_process\n"
+            "for detach in (False, True):\n"
+            "    h = start_process([sys.executable, '-c', 'import time; time.sleep(30)'], detach=detach)\n"
+            "    print(h.pid, flush=True)\n"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        out = subprocess.run(_py(code), cwd=root, stdout=subprocess.PIPE, text=True, timeout=30).stdout
+        tracked, detached = (int(pid) for pid in out.split())
+        try:
+            deadline = time.monotonic() + 5
+            while _alive(tracked) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertFalse(_alive(tracked))
+            self.assertTrue(_alive(detached))
+        finally:
+            os.kill(detached, signal.SIGKILL)
+
+    def test_resource_limits_applied(self):
+        from aibaton.proctree import ResourceLimits
+
+        code = "import resource\nprint(resource.getrlimit(resource.RLIMIT_NOFILE)[0])"
+        res = start_process(_py(code), limits=ResourceLimits(open_files=64)).wait()
+        self.assertEqual(res.stdout.strip(), "64")
+
+    @unittest.skipUnless(hasattr(__import__("os"), "wait4"), "wait4 not available")
+    def test_rusage_collected(self):
+        code = "x = bytearray(64 * 1024 * 1024)\nsum(range(2000000))"
+        res = start_process(_py(code)).wait()
+        self.assertIsNotNone(res.rusage)
+        self.assertGreater(res.rusage["max_rss_kb"], 60 * 1024)
+        self.assertGreater(res.rusage["user_s"] + res.rusage["sys_s"], 0)
+
+
+class TestProcessStdin(unittest.TestCase):
+    def test_stdin_bytes_and_iterator(self):
+        upper = _py("import sys\nsys.stdout.write(sys.stdin.read().upper())")
+        self.assertEqual(start_process(upper, stdin=b"abc\n").wait().stdout, "ABC\n")
+        chunks = (f"line{i}\n" for i in range(3))
+        self.assertEqual(start_process(upper, stdin=chunks).wait().stdout, "LINE0\nLINE1\nLINE2\n")
+
+    def test_incremental_write(self):
+        import subprocess
+
+        handle = start_process(_py("import sys\nfor l in sys.stdin: print(len(l.strip()))"), stdin=subprocess.PIPE)
+        handle.write("abc\n")
+        handle.write(b"abcdef\n")
+        handle.close_stdin()
+        self.assertEqual(handle.wait().stdout, "3\n6\n")
+
+    def test_pipeline_large_stream(self):
+        from aibaton.process import start_pipeline
+
+        gen = _py("import sys\nfor i in range(200000): sys.stdout.write('x%d\\n' % i)")
+        count = _py("import sys\nprint(sum(1 for _ in sys.stdin))")
+        first, last = start_pipeline([gen, count])
+        self.assertEqual(last.wait(timeout=30).stdout, "200000\n")
+        self.assertEqual(first.wait(timeout=30).status, "success")
+        self.assertEqual(first.result().stdout, "")
+
+    def test_pipeline_observed(self):
+        from aibaton.process import start_pipeline
+
+        gen = _py("print('a')\nprint('b')")
+        upper = _py("import sys\nsys.stdout.write(sys.stdin.read().upper())")
+        first, last = start_pipeline([gen, upper], observe=True)
+        self.assertEqual(last.wait(timeout=30).stdout, "A\nB\n")
+        self.assertEqual(first.wait(timeout=30).stdout, "a\nb\n")
+
+
+class TestProcessMatch(unittest.TestCase):
+    def test_expect_ready_line(self):
+        code = "import time\nprint('booting')\ntime.sleep(0.2)\nprint('listening on :8080', flush=True)\ntime.sleep(30)"
+        handle = start_process(_py(code))
+        m = handle.expect(r"listening on :(\d+)", timeout=10)
+        self.assertIsNotNone(m)
+        self.assertEqual(m.group(1), "8080")
+        self.assertIsNotNone(handle.expect("booting", timeout=1))
+        handle.kill()
+        self.assertEqual(handle.wait(timeout=10).status, "killed")
+
+    def test_expect_returns_none_when_process_exits(self):
+        handle = start_process(_py("print('nothing here')"))
+        self.assertIsNone(handle.expect("ready", timeout=10))
+
+    def test_on_match_fail_fast(self):
+        code = "import sys, time\ntime.sleep(0.3)\nprint('ok', flush=True)\nprint('FATAL: boom', file=sys.stderr, flush=True)\ntime.sleep(30)"
+        seen = []
+        handle = start_process(_py(code))
+        handle.on_match(["^ok$"], lambda m, ev: seen.append(m.group(0)))
+        handle.on_match([r"FATAL", r"panic:"], kill=True)
+        res = handle.wait(timeout=10)
+        self.assertEqual(res.status, "error")
+        self.assertLess(res.elapsed_ms, 10000)
+        self.assertEqual(seen, ["ok"])
+
+    def test_backreferences_across_watches(self):
+        import re
+
+        from aibaton.process import _LineMatcher, _Watch
+
+        matcher = _LineMatcher()
+        for pat in (r"(x)\1", r"(a)\1"):
+            matcher.add(_Watch([re.compile(pat)], None, once=False, kill=False, stream=None))
+        self.assertEqual([w.match.group(0) for w in matcher.feed("stdout", "aa")], ["aa"])
+
+
+if __name__ == "__main__":
+    unittest.main()
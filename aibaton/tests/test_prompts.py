@@ -0,0 +1,81 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from aibaton import runner
+from aibaton.prompts import PromptTemplate, cache_hit_ratio
+from aibaton.session import _workspace_dir
+from aibaton.storage import flush_storage
+
+_EVENTS = [
+    {"type": "item.completed", "item": {"type": "agent_message", "text": "done"}},
+    {"type": "turn.completed", "usage": {"input_tokens": 1000, "cached_input_tokens": 800, "output_tokens": 10}},
+]
+_SCRIPT = "\n".join(f"print({json.dumps(ev)!r})" for ev in _EVENTS)
+
+
+class _Script:
+    transports = ("stdin",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def build_command(self, prompt, json_mode, cwd, add_dirs, dangerous_permissions, transport="stdin"):
+        return [sys.executable, "-c", _SCRIPT], prompt
+
+
+class TestPromptTemplate(unittest.TestCase):
+    def test_prefix_is_byte_identical(self):
+        tpl = PromptTemplate("plan", prefix="Follow the plan.  \nKeep it DRY.\n", refs=["docs/help.md", "docs/dev.md"],
+                             suffix="The part to integrate now is: {section}")
+        a, b = tpl.format(section="orders"), tpl(section="positions")
+        self.assertTrue(a.startswith(tpl.prefix) and b.startswith(tpl.prefix))
+        self.assertEqual(tpl.prefix, "@docs/help.md @docs/dev.md\nFollow the plan.\nKeep it DRY.\n\n")
+        self.assertTrue(a.endswith("is: orders"))
+        self.assertEqual((a.template, a.prefix_hash), ("plan", tpl.prefix_hash))
+
+    def test_placeholder_in_prefix_is_rejected(self):
+        tpl = PromptTemplate("bad", prefix="Check the {section} part.", suffix="Only {section}.")
+        with self.assertRaises(ValueError):
+            tpl.format(section="orders")
+
+    def test_cache_hit_ratio(self):
+        self.assertEqual(cache_hit_ratio({"input_tokens": 200, "cached_input_tokens": 50}), 0.25)
+        self.assertIsNone(cache_hit_ratio(None))
+
+
+class TestTemplateStats(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"HOME": self.tmp.name, "AIBATON_NO_DAEMON": "1"})
+        self.env.start()
+        self.providers = mock.patch.object(runner, "_get_provider", _Script)
+        self.providers.start()
+
+    def tearDown(self):
+        self.providers.stop()
+        flush_storage()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_run_records_template_and_cache_ratio(self):
+        tpl = PromptTemplate("step", prefix="Shared instructions.", suffix="Do {part}.")
+        for part in ("a", "b"):
+            res = runner.run(tpl.format(part=part), cwd=self.tmp.name, stream=False)
+        flush_storage()
+        with open(os.path.join(res.artifacts["run_dir"], "run.json"), encoding="utf-8") as f:
+            summary = json.load(f)
+        self.assertEqual(summary["template"], "step")
+        self.assertEqual(summary["prefix_hash"], tpl.prefix_hash)
+        self.assertEqual(summary["cache_hit_ratio"], 0.8)
+        with open(os.path.join(_workspace_dir(self.tmp.name), "session.json"), encoding="utf-8") as f:
+            session = json.load(f)
+        self.assertEqual(session["templates"]["step"],
+                         {"runs": 2, "input_tokens": 2000, "cached_input_tokens": 1600, "cache_hit_ratio": 0.8})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+import unittest
+
+from aibaton.replay import EventLog, load_run, replay
+
+
+def _write_run(run_dir, events, text="hello world"):
+    os.makedirs(run_dir, exist_ok=True)
+    with open(os.path.join(run_dir, "events.jsonl"), "w", encoding="utf-8") as f:
+        for ev in events:
+            f.write(json.dumps(ev) + "\n")
+    with open(os.path.join(run_dir, "output.txt"), "w", encoding="utf-8") as f:
+        f.write(text)
+    with open(os.path.join(run_dir, "run.json"), "w", encoding="utf-8") as f:
+        json.dump({"provider": "codex", "status": "success", "elapsed_ms": 42,
+                   "prompt": "hi", "run_id": "r1"}, f)
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.run_dir = os.path.join(self.tmp.name, "r1")
+        self.events = [
+            {"type": "item.completed", "ts": 1000 + i, "source": "codex",
+             "payload": {"type": "item.completed", "item": {"type": "agent_message", "text": f"part{i} "}}}
+            for i in range(50)
+        ]
+        _write_run(self.run_dir, self.events)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_event_log_random_access(self):
+        log = EventLog(os.path.join(self.run_dir, "events.jsonl"))
+        self.assertEqual(log[7], self.events[7])
+        self.assertEqual(log[-1], self.events[-1])
+        self.assertEqual(len(log), 50)
+        self.assertEqual(list(log), self.events)
+        with self.assertRaises(IndexError):
+            log[50]
+        log.close()
+
+    def test_event_log_skips_blank_lines(self):
+        path = os.path.join(self.tmp.name, "blank.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('\n{"type": "a"}\n\n  \r\n{"type": "b"}\n\n')
+        log = EventLog(path)
+        self.assertEqual([ev["type"] for ev in log], ["a", "b"])
+        self.assertEqual(len(log), 2)
+        self.assertEqual(log[1]["type"], "b")
+        self.assertEqual(list(log), list(log[:]))
+        log.close()
+
+    def test_event_log_missing_file(self):
+        log = EventLog(os.path.join(self.tmp.name, "nope.jsonl"))
+        self.assertEqual(len(log), 0)
+        self.assertEqual(list(log), [])
+
+    def test_load_run(self):
+        res = load_run(self.run_dir)
+        self.assertEqual(res.text, "hello world")
+        self.assertEqual(res.status, "success")
+        self.assertEqual(res.elapsed_ms, 42)
+        self.assertEqual(res.artifacts["run_id"], "r1")
+        self.assertEqual(len(res.events), 50)
+
+    def test_replay_pipeline(self):
+        res = replay(self.run_dir, speed=0, stream=False)
+        self.assertEqual(res.status, "success")
+        self.assertEqual(res.text, "".join(f"part{i} " for i in range(50)).strip())
+        self.assertEqual(len(res.events), 50)
+
+    def test_replay_keeps_streams_and_json(self):
+        run_dir = os.path.join(self.tmp.name, "r2")
+        _write_run(run_dir, [
+            # codex reports errors as JSON on stdout; {"type", "text"} is JSON too
+            {"type": "error", "ts": 1, "source": "codex", "stream": "stdout",
+             "payload": {"type": "error", "message": "rate limited"}},
+            {"type": "message", "ts": 2, "source": "codex", "stream": "stdout",
+             "payload": {"type": "message", "text": "json text"}},
+            {"type": "message", "ts": 3, "source": "codex", "stream": "stdout", "plain": True,
+             "payload": {"type": "message", "text": "plain line"}},
+            {"type": "error", "ts": 4, "source": "codex", "stream": "stderr",
+             "payload": {"type": "error", "message": "warn", "stream": "stderr"}},
+        ])
+        res = replay(run_dir, speed=0, stream=False)
+        # stdout and stderr are separate pipes, so only the order within each is kept
+        stdout = [(ev.get("plain", False), ev["payload"]) for ev in res.events if ev.get("stream") == "stdout"]
+        stderr = [ev["payload"] for ev in res.events if ev.get("stream") == "stderr"]
+        self.assertEqual(stdout, [
+            (False, {"type": "error", "message": "rate limited"}),
+            (False, {"type": "message", "text": "json text"}),
+            (True, {"type": "message", "text": "plain line"}),
+        ])
+        self.assertEqual(stderr, [{"type": "error", "message": "warn", "stream": "stderr"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from aibaton import runner
+from aibaton.routing import LatencyHistogram, RoutePolicy, classify_error, latency_histogram
+from aibaton.runner import AgentRes
+from aibaton.storage import flush_storage
+
+_MSG = json.dumps({"type": "item.completed", "item": {"type": "agent_message", "text": "{name}"}})
+
+_SCRIPTS = {
+    "slow": f"import time; time.sleep(10); print({_MSG.replace('{name}', 'slow')!r})",
+    "fast": f"print({_MSG.replace('{name}', 'fast')!r})",
+    "limited": "import sys; sys.stderr.write('error: 429 Too Many Requests\\n'); sys.exit(1)",
+    "broken": "import sys; sys.stderr.write('tests failed\\n'); sys.exit(1)",
+}
+
+
+class _Script:
+    def __init__(self, name):
+        self.name = name
+
+    def build_command(self, prompt, json_mode, cwd, add_dirs, dangerous_permissions):
+        return [sys.executable, "-c", _SCRIPTS[self.name]], None
+
+
+class TestRouting(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"HOME": self.tmp.name, "AIBATON_NO_DAEMON": "1"})
+        self.env.start()
+        self.providers = mock.patch.object(runner, "_get_provider", _Script)
+        self.providers.start()
+
+    def tearDown(self):
+        self.providers.stop()
+        flush_storage()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def _run(self, route):
+        return runner.run("hi", route=route, cwd=self.tmp.name, stream=False)
+
+    def _git_init(self):
+        git_env = {"GIT_AUTHOR_NAME": "t", "GIT_AUTHOR_EMAIL": "t@e", "GIT_COMMITTER_NAME": "t",
+                   "GIT_COMMITTER_EMAIL": "t@e", "GIT_CONFIG_GLOBAL": os.devnull}
+        os.environ.update(git_env)
+        subprocess.run(["git", "-C", self.tmp.name, "init", "-q"], check=True)
+        subprocess.run(["git", "-C", self.tmp.name, "commit", "-q", "--allow-empty", "-m", "init"], check=True)
+
+    def test_hedge_wins_and_loser_is_cancelled(self):
+        self._git_init()
+        start = time.monotonic()
+        res = self._run(RoutePolicy("slow", backups=["fast"], hedge_delay_s=0.3))
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(res.text, "fast")
+        route = res.artifacts["route"]
+        self.assertTrue(route["hedged"])
+        self.assertEqual(route["winner"], "fast")
+        self.assertEqual(route["attempts"][0]["status"], "cancelled")
+        # hedged attempts never share the working tree
+        self.assertIn("worktree", res.artifacts)
+
+    def test_no_hedge_without_isolation(self):
+        with self.assertLogs("aibaton", level="WARNING"):
+            res = self._run(RoutePolicy("fast", backups=["slow"], hedge_delay_s=0))
+        self.assertEqual(res.text, "fast")
+        self.assertFalse(res.artifacts["route"]["hedged"])
+        self.assertEqual(len(res.artifacts["route"]["attempts"]), 1)
+
+    def test_failover_on_classified_error(self):
+        res = self._run(RoutePolicy("limited", backups=["fast"], hedge=False))
+        self.assertEqual(res.text, "fast")
+        self.assertEqual(res.artifacts["route"]["attempts"][0]["error_class"], "rate_limit")
+
+    def test_task_errors_do_not_fail_over(self):
+        res = self._run(RoutePolicy("broken", backups=["fast"], hedge=False))
+        self.assertEqual(res.status, "error")
+        self.assertEqual(len(res.artifacts["route"]["attempts"]), 1)
+        self.assertIsNone(classify_error(res))
+
+    def test_missing_cli_fails_over(self):
+        res = AgentRes(text="", events=[], status="error", usage=None, artifacts={"error_class": "missing_cli"},
+                       provider="x", model=None, elapsed_ms=0)
+        self.assertEqual(classify_error(res), "missing_cli")
+
+    def test_histogram_drives_hedge_delay(self):
+        hist = LatencyHistogram()
+        for ms in [1000] * 95 + [60000] * 5:
+            hist.record(ms)
+        self.assertAlmostEqual(hist.quantile(0.5), 1000, delta=200)
+        self.assertGreater(hist.quantile(0.99), 50000)
+        with mock.patch("aibaton.routing.latency_histogram", return_value=hist):
+            delay = RoutePolicy("codex", backups=["claude"], hedge_quantile=0.9).hedge_delay("codex")
+        self.assertAlmostEqual(delay, 1.0, delta=0.2)
+
+    def test_only_routed_runs_feed_the_histogram(self):
+        with mock.patch("aibaton.routing._histograms", {}):
+            # option analysis and direct runs are not what a hedge waits for
+            runner.run("hi", provider="fast", cwd=self.tmp.name, stream=False, options=["a", "b"])
+            self.assertEqual(latency_histogram("fast").count, 0)
+            self._run(RoutePolicy("fast", hedge=False))
+            self.assertEqual(latency_histogram("fast").count, 1)
+            self._run(RoutePolicy("fast", hedge=False))
+            self.assertEqual(latency_histogram("fast").count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
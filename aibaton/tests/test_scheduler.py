@@ -0,0 +1,90 @@
+import threading
+import time
+import unittest
+
+from aibaton.scheduler import PRIORITY_BULK, PRIORITY_INTERACTIVE, RateLimit, Scheduler
+
+
+class TestScheduler(unittest.TestCase):
+    def _start_waiters(self, sched, specs, order):
+        threads = []
+        for name, priority, group in specs:
+            def worker(name=name, priority=priority, group=group):
+                ticket = sched.acquire("p", priority=priority, group=group)
+                order.append(name)
+                sched.release(ticket)
+            t = threading.Thread(target=worker)
+            t.start()
+            threads.append(t)
+            time.sleep(0.02)  # fix arrival order
+        return threads
+
+    def test_unlimited_provider_is_not_queued(self):
+        sched = Scheduler()
+        ticket = sched.acquire("p")
+        self.assertEqual(ticket.wait_ms, 0)
+        sched.release(ticket)
+
+    def test_priority_then_fair_across_groups(self):
+        sched = Scheduler()
+        sched.set_limit("p", RateLimit(concurrent=1))
+        holder = sched.acquire("p")
+        order = []
+        threads = self._start_waiters(sched, [
+            ("bulk-a1", PRIORITY_BULK, "a"),
+            ("bulk-a2", PRIORITY_BULK, "a"),
+            ("bulk-a3", PRIORITY_BULK, "a"),
+            ("bulk-b1", PRIORITY_BULK, "b"),
+            ("parse", PRIORITY_INTERACTIVE, "c"),
+        ], order)
+        sched.release(holder)
+        for t in threads:
+            t.join(5)
+        self.assertEqual(order[0], "parse")
+        # b gets its turn after a's first run instead of after all of a's queue
+        self.assertLess(order.index("bulk-b1"), order.index("bulk-a3"))
+
+    def test_concurrency_limit(self):
+        sched = Scheduler()
+        sched.set_limit("p", RateLimit(concurrent=2))
+        peak = [0]
+        active = [0]
+        lock = threading.Lock()
+
+        def worker():
+            with sched.slot("p"):
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.05)
+                with lock:
+                    active[0] -= 1
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        self.assertEqual(peak[0], 2)
+
+    def test_runs_per_minute_reports_queue_wait(self):
+        sched = Scheduler()
+        sched.set_limit("p", RateLimit(runs_per_min=600))  # burst of 600, then one per 0.1s
+        sched._queues["p"].runs.level = 1
+        sched.release(sched.acquire("p"))
+        ticket = sched.acquire("p")
+        sched.release(ticket)
+        self.assertGreaterEqual(ticket.wait_ms, 50)
+
+    def test_token_budget_blocks_until_refilled(self):
+        sched = Scheduler()
+        sched.set_limit("p", RateLimit(tokens_per_min=6000))  # 100 tokens/s
+        sched.release(sched.acquire("p"), tokens=6020)
+        with self.assertRaises(TimeoutError):
+            sched.acquire("p", timeout=0.05)
+        ticket = sched.acquire("p", timeout=2)
+        self.assertGreaterEqual(ticket.wait_ms, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from aibaton.storage import StorageWriter, write_events, write_summary
+
+
+class TestStorageWriter(unittest.TestCase):
+    def test_flush_writes_in_order(self):
+        writer = StorageWriter(max_pending=2)
+        with tempfile.TemporaryDirectory() as tmp:
+            events = [{"type": "message", "payload": {"text": str(i)}} for i in range(100)]
+            writer.submit(write_events, tmp, events)
+            writer.submit(write_summary, tmp, {"status": "success"})
+            writer.flush()
+            with open(os.path.join(tmp, "events.jsonl"), encoding="utf-8") as f:
+                self.assertEqual(len(f.readlines()), 100)
+            with open(os.path.join(tmp, "run.json"), encoding="utf-8") as f:
+                self.assertEqual(json.load(f)["status"], "success")
+        writer.close()
+
+    def test_submit_blocks_when_full(self):
+        writer = StorageWriter(max_pending=1)
+        gate = threading.Event()
+        writer.submit(gate.wait)
+        writer.submit(time.sleep, 0)
+        submitted = threading.Event()
+
+        def producer():
+            writer.submit(time.sleep, 0)
+            submitted.set()
+
+        threading.Thread(target=producer, daemon=True).start()
+        self.assertFalse(submitted.wait(0.2))
+        gate.set()
+        self.assertTrue(submitted.wait(2))
+        writer.flush()
+        writer.close()
+
+    def test_failed_task_does_not_stop_writer(self):
+        writer = StorageWriter()
+        done = []
+        writer.submit(lambda: 1 / 0)
+        writer.submit(done.append, 1)
+        writer.flush()
+        self.assertEqual(done, [1])
+        writer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from aibaton import runner
+from aibaton.session import _workspace_dir
+from aibaton.storage import flush_storage
+from aibaton.timing import RunTimer, merge_timing
+
+_SCRIPT = """
+import json, time
+def emit(ev):
+    print(json.dumps(ev), flush=True)
+emit({"type": "thread.started"})
+time.sleep(0.2)
+emit({"type": "item.started", "item": {"id": "c1", "type": "command_execution", "command": "go build"}})
+time.sleep(0.3)
+emit({"type": "item.completed", "item": {"id": "c1", "type": "command_execution", "command": "go build"}})
+emit({"type": "item.completed", "item": {"type": "agent_message", "text": "built"}})
+"""
+
+
+class _Script:
+    transports = ("stdin",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def build_command(self, prompt, json_mode, cwd, add_dirs, dangerous_permissions, transport="stdin"):
+        return [sys.executable, "-c", _SCRIPT], prompt
+
+
+class TestRunTimer(unittest.TestCase):
+    def test_overlapping_claude_tools_count_once(self):
+        timer = RunTimer()
+        timer.mark("first_event_ms")
+        timer.on_event({"type": "assistant", "message": {"content": [
+            {"type": "tool_use", "id": "a", "name": "Bash"}, {"type": "tool_use", "id": "b", "name": "Read"}]}})
+        time.sleep(0.1)
+        timer.on_event({"type": "user", "message": {"content": [{"type": "tool_result", "tool_use_id": "a"}]}})
+        timer.on_event({"type": "user", "message": {"content": [{"type": "tool_result", "tool_use_id": "b"}]}})
+        timing = timer.finish()
+        self.assertEqual(timing["tool_calls"], 2)
+        self.assertEqual([t["name"] for t in timing["tools"]], ["Bash", "Read"])
+        self.assertGreaterEqual(timing["tool_ms"], 90)
+        self.assertLess(timing["tool_ms"], 180)
+
+    def test_merge_timing_percentiles(self):
+        summary = None
+        for ms in range(1, 101):
+            summary = merge_timing(summary, {"spawn_ms": ms})
+        self.assertEqual(summary["spawn_ms"]["count"], 100)
+        self.assertAlmostEqual(summary["spawn_ms"]["p50"], 50, delta=6)
+        self.assertAlmostEqual(summary["spawn_ms"]["p99"], 100, delta=11)
+
+
+class TestRunTiming(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"HOME": self.tmp.name, "AIBATON_NO_DAEMON": "1"})
+        self.env.start()
+        self.providers = mock.patch.object(runner, "_get_provider", _Script)
+        self.providers.start()
+
+    def tearDown(self):
+        self.providers.stop()
+        flush_storage()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_breakdown_in_result_run_json_and_session(self):
+        res = runner.run("build it", cwd=self.tmp.name, stream=False)
+        timing = res.timing
+        self.assertEqual(res.text, "built")
+        self.assertLessEqual(timing["spawn_ms"], timing["first_byte_ms"])
+        self.assertLessEqual(timing["first_event_ms"], timing["first_token_ms"])
+        self.assertEqual(timing["tool_calls"], 1)
+        self.assertEqual(timing["tools"][0]["name"], "command_execution: go build")
+        self.assertGreaterEqual(timing["tool_ms"], 250)
+        self.assertGreaterEqual(timing["first_token_ms"], timing["tools"][0]["end_ms"])
+        flush_storage()
+        with open(os.path.join(res.artifacts["run_dir"], "run.json"), encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["timing"], timing)
+        with open(os.path.join(_workspace_dir(self.tmp.name), "session.json"), encoding="utf-8") as f:
+            session = json.load(f)
+        self.assertEqual(session["timing"]["tool_ms"]["count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
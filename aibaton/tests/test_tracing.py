@@ -0,0 +1,91 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from aibaton import runner, tracing
+from aibaton.storage import flush_storage
+from aibaton.workflow import Workflow
+
+_MSG = json.dumps({"type": "item.completed", "item": {"type": "agent_message", "text": "ok"}})
+
+
+class _Script:
+    transports = ("stdin",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def build_command(self, prompt, json_mode, cwd, add_dirs, dangerous_permissions, transport="stdin"):
+        return [sys.executable, "-c", f"print({_MSG!r})"], prompt
+
+
+def _load_chrome(path):
+    with open(path, encoding="utf-8") as f:
+        text = f.read().rstrip().rstrip(",")
+    return json.loads(text + "]")
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"HOME": self.tmp.name, "AIBATON_NO_DAEMON": "1"})
+        self.env.start()
+        self.providers = mock.patch.object(runner, "_get_provider", _Script)
+        self.providers.start()
+
+    def tearDown(self):
+        tracing.disable_tracing()
+        self.providers.stop()
+        flush_storage()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_disabled_is_noop(self):
+        tracing.disable_tracing()
+        with tracing.span("run", provider="codex") as sp:
+            sp.set(status="success")
+        self.assertIs(sp, tracing._NOOP)
+        self.assertIsNone(tracing.current_span())
+
+    def test_chrome_trace_nests_workflow_to_process(self):
+        path = tracing.enable_tracing(os.path.join(self.tmp.name, "trace.json"))
+        wf = Workflow("wf", cwd=self.tmp.name)
+        wf.step("a", prompt="do a")
+        wf.run()
+        tracing.flush_tracing()
+        flush_storage()
+        events = _load_chrome(path)
+        by_id = {ev["args"]["span_id"]: ev for ev in events}
+        process = next(ev for ev in events if ev["name"] == "process")
+        chain = []
+        cur = process
+        while cur is not None:
+            chain.append(cur["name"])
+            cur = by_id.get(cur["args"]["parent_id"])
+        self.assertEqual(chain, ["process", "attempt", "iteration", "run", "step", "workflow"])
+        self.assertEqual(process["args"]["status"], "success")
+        attempt = next(ev for ev in events if ev["name"] == "attempt")
+        self.assertEqual(attempt["args"]["reason"], "initial")
+        self.assertEqual(attempt["args"]["provider"], "codex")
+        self.assertGreaterEqual(by_id[process["args"]["parent_id"]]["dur"], process["dur"])
+
+    def test_otlp_export(self):
+        path = tracing.enable_tracing(os.path.join(self.tmp.name, "trace.jsonl"), fmt="otlp")
+        runner.run("hi", cwd=self.tmp.name, stream=False)
+        tracing.flush_tracing()
+        flush_storage()
+        with open(path, encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        spans = [sp for req in requests for rs in req["resourceSpans"] for ss in rs["scopeSpans"] for sp in ss["spans"]]
+        names = {sp["name"] for sp in spans}
+        self.assertTrue({"run", "iteration", "attempt", "queue", "process"} <= names)
+        root = next(sp for sp in spans if sp["name"] == "run")
+        self.assertNotIn("parentSpanId", root)
+        self.assertEqual(len({sp["traceId"] for sp in spans}), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
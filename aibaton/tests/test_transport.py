@@ -0,0 +1,96 @@
+import json
+import os
+import re
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from aibaton import runner
+from aibaton.storage import flush_storage
+from aibaton.transport import ARGV, FILE, MAX_ARG_STRLEN, STDIN, choose_transport
+
+_MSG = json.dumps({"type": "item.completed", "item": {"type": "agent_message", "text": "{text}"}})
+
+# writes ~1 MB before touching stdin: a synchronous stdin write in the parent would deadlock
+_STDIN_SCRIPT = f"""
+import sys
+for _ in range(1000):
+    sys.stdout.write('{{"type": "noise", "pad": "' + 'x' * 1000 + '"}}\\n')
+sys.stdout.flush()
+data = sys.stdin.read()
+print({_MSG!r}.replace('{{text}}', str(len(data))))
+"""
+
+_ARGV_SCRIPT = f"""
+import re, sys
+prompt = sys.argv[1]
+m = re.search(r"in the file (\\S+) \\(", prompt)
+if m:
+    prompt = open(m.group(1), encoding="utf-8").read()
+print({_MSG!r}.replace('{{text}}', str(len(prompt))))
+"""
+
+
+class _Script:
+    def __init__(self, transports, script):
+        self.transports = transports
+        self.script = script
+        self.calls = []
+
+    def build_command(self, prompt, json_mode, cwd, add_dirs, dangerous_permissions, transport=STDIN):
+        self.calls.append(transport)
+        cmd = [sys.executable, "-c", self.script]
+        if transport == ARGV:
+            return cmd + [prompt], None
+        return cmd, prompt
+
+
+class TestTransport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"HOME": self.tmp.name, "AIBATON_NO_DAEMON": "1"})
+        self.env.start()
+
+    def tearDown(self):
+        flush_storage()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def _run(self, prov, prompt):
+        with mock.patch.object(runner, "_get_provider", lambda name: prov):
+            return runner.run(prompt, provider="codex", cwd=self.tmp.name, stream=False, timeout_s=60)
+
+    def test_choose_transport(self):
+        cmd = ["claude", "--print"]
+        self.assertEqual(choose_transport("hi", (ARGV, STDIN), cmd), ARGV)
+        big = "x" * MAX_ARG_STRLEN
+        self.assertEqual(choose_transport(big, (ARGV, STDIN), cmd), STDIN)
+        self.assertEqual(choose_transport(big, (ARGV,), cmd), FILE)
+
+    def test_multi_mb_prompt_via_stdin(self):
+        prompt = "y" * (8 * 1024 * 1024)
+        prov = _Script((ARGV, STDIN), _STDIN_SCRIPT)
+        res = self._run(prov, prompt)
+        self.assertEqual(res.status, "success")
+        self.assertEqual(res.text, str(len(prompt)))
+        self.assertEqual(prov.calls[-1], STDIN)
+
+    def test_multi_mb_prompt_via_file(self):
+        prompt = "z" * (3 * 1024 * 1024)
+        prov = _Script((ARGV,), _ARGV_SCRIPT)
+        with mock.patch("aibaton.transport.tempfile.tempdir", self.tmp.name):
+            res = self._run(prov, prompt)
+        self.assertEqual(res.status, "success")
+        self.assertEqual(res.text, str(len(prompt)))
+        self.assertFalse([n for n in os.listdir(self.tmp.name) if re.match(r"aibaton-prompt-", n)])
+
+    def test_small_prompt_stays_in_argv(self):
+        prov = _Script((ARGV, STDIN), _ARGV_SCRIPT)
+        res = self._run(prov, "hello")
+        self.assertEqual(res.text, "5")
+        self.assertEqual(prov.calls[-1], ARGV)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from aibaton.storage import flush_storage
+from aibaton.workflow import Workflow
+
+
+class TestWorkflow(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"HOME": self.tmp.name})
+        self.env.start()
+
+    def tearDown(self):
+        flush_storage()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_independent_steps_run_concurrently(self):
+        wf = Workflow("par", max_parallel=4, cwd=self.tmp.name)
+        wf.step("a", fn=lambda inputs: time.sleep(0.4) or "A")
+        wf.step("b", fn=lambda inputs: time.sleep(0.4) or "B")
+        wf.step("c", fn=lambda inputs: inputs["a"] + inputs["b"], deps=["a", "b"])
+        start = time.monotonic()
+        results = wf.run()
+        self.assertLess(time.monotonic() - start, 0.75)
+        self.assertEqual(results["c"], "AB")
+
+    def test_values_propagate_into_commands(self):
+        wf = Workflow("cmd", cwd=self.tmp.name)
+        wf.step("pick", fn=lambda inputs: "section-3")
+        wf.step("echo", cmd=[sys.executable, "-c", "import sys; print(sys.argv[1])", "{pick}"], deps=["pick"])
+        results = wf.run()
+        self.assertEqual(results["echo"].stdout, "section-3\n")
+
+    def test_values_are_shell_quoted_in_command_strings(self):
+        marker = os.path.join(self.tmp.name, "pwned")
+        value = f"x; touch {marker} $(touch {marker}) 'q'"
+        wf = Workflow("quote", cwd=self.tmp.name)
+        wf.step("pick", fn=lambda inputs: value)
+        wf.step("echo", cmd="printf '%s\\n' {pick}", deps=["pick"])
+        results = wf.run()
+        self.assertEqual(results["echo"].stdout, value + "\n")
+        self.assertFalse(os.path.exists(marker))
+
+    def test_failure_skips_dependents_and_persists_state(self):
+        wf = Workflow("fail", cwd=self.tmp.name)
+        wf.step("bad", cmd=[sys.executable, "-c", "raise SystemExit(3)"])
+        wf.step("after", fn=lambda inputs: "x", deps=["bad"])
+        wf.step("after2", fn=lambda inputs: "y", deps=["after"])
+        wf.step("other", fn=lambda inputs: "z")
+        results = wf.run()
+        self.assertIsNone(results["after2"])
+        self.assertEqual(results["other"], "z")
+        flush_storage()
+        with open(wf.state_path, encoding="utf-8") as f:
+            state = json.load(f)
+        self.assertEqual(state["steps"]["bad"]["status"], "error")
+        self.assertEqual(state["steps"]["after"]["status"], "skipped")
+        self.assertEqual(state["steps"]["after2"]["status"], "skipped")
+        self.assertIn("critical_path", state)
+
+    def test_cycle_rejected(self):
+        wf = Workflow("cycle", cwd=self.tmp.name)
+        wf.step("a", fn=lambda inputs: 1, deps=["b"])
+        wf.step("b", fn=lambda inputs: 1, deps=["a"])
+        with self.assertRaises(ValueError):
+            wf.run()
+
+
+if __name__ == "__main__":
+    unittest.main()
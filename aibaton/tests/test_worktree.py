@@ -0,0 +1,122 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from aibaton.worktree import WorktreePool
+
+
+def _git(cwd, *args):
+    return subprocess.run(["git", "-C", cwd, *args], check=True, stdout=subprocess.PIPE, text=True).stdout.strip()
+
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+class TestWorktreePool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {
+            "HOME": self.tmp.name,
+            "GIT_CONFIG_GLOBAL": os.devnull,
+            "GIT_AUTHOR_NAME": "t",
+            "GIT_AUTHOR_EMAIL": "t@example.com",
+            "GIT_COMMITTER_NAME": "t",
+            "GIT_COMMITTER_EMAIL": "t@example.com",
+        })
+        self.env.start()
+        self.repo = os.path.join(self.tmp.name, "repo")
+        os.makedirs(self.repo)
+        _git(self.repo, "init", "-q")
+        _write(os.path.join(self.repo, "a.txt"), "a\n")
+        _write(os.path.join(self.repo, "b.txt"), "b\n")
+        _git(self.repo, "add", "-A")
+        _git(self.repo, "commit", "-q", "-m", "init")
+        self.pool = WorktreePool(self.repo)
+
+    def tearDown(self):
+        self.pool.cleanup()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_parallel_edits_merge_back(self):
+        wt1 = self.pool.acquire()
+        wt2 = self.pool.acquire()
+        self.assertNotEqual(wt1.path, wt2.path)
+        _write(os.path.join(wt1.path, "a.txt"), "a1\n")
+        _write(os.path.join(wt2.path, "b.txt"), "b2\n")
+        self.assertEqual(_read(os.path.join(self.repo, "a.txt")), "a\n")
+
+        self.assertEqual(self.pool.release(wt1).status, "merged")
+        self.assertEqual(self.pool.release(wt2).status, "merged")
+        self.assertEqual(_read(os.path.join(self.repo, "a.txt")), "a1\n")
+        self.assertEqual(_read(os.path.join(self.repo, "b.txt")), "b2\n")
+
+    def test_conflict_is_reported_and_kept_on_branch(self):
+        wt1 = self.pool.acquire()
+        wt2 = self.pool.acquire()
+        _write(os.path.join(wt1.path, "a.txt"), "one\n")
+        _write(os.path.join(wt2.path, "a.txt"), "two\n")
+        self.assertEqual(self.pool.release(wt1).status, "merged")
+        res = self.pool.release(wt2)
+        self.assertEqual(res.status, "conflict")
+        self.assertEqual(res.conflicts, ["a.txt"])
+        self.assertIn(res.branch, _git(self.repo, "branch", "--list", "aibaton/*"))
+        # merge was aborted, main checkout keeps the first change
+        self.assertEqual(_read(os.path.join(self.repo, "a.txt")), "one\n")
+        self.assertEqual(_git(self.repo, "status", "--porcelain"), "")
+
+    def test_busy_worktree_is_skipped_by_other_process(self):
+        # the other process holds wt-0 with uncommitted edits until told to release
+        child = subprocess.Popen(
+            [sys.executable, "-c",
+             "import os, sys\n"
+             "from aibaton.worktree import WorktreePool\n"
+             "pool = WorktreePool(sys.argv[1])\n"
+             "wt = pool.acquire()\n"
+             "open(os.path.join(wt.path, 'a.txt'), 'w').write('child\\n')\n"
+             "print(wt.path, flush=True)\n"
+             "sys.stdin.readline()\n"
+             "pool.discard(wt)\n",
+             self.repo],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        )
+        try:
+            child_path = child.stdout.readline().strip()
+            self.assertTrue(child_path)
+            wt = self.pool.acquire()
+            self.assertNotEqual(wt.path, child_path)
+            self.assertEqual(_read(os.path.join(child_path, "a.txt")), "child\n")
+            self.pool.discard(wt)
+        finally:
+            child.communicate("\n", timeout=30)
+        # released by the other process: free to take over
+        wt1, wt2 = self.pool.acquire(), self.pool.acquire()
+        self.assertIn(child_path, (wt1.path, wt2.path))
+        self.pool.discard(wt1)
+        self.pool.discard(wt2)
+
+    def test_worktree_is_reset_when_reused(self):
+        with self.pool.worktree(merge=False) as wt:
+            _write(os.path.join(wt.path, "scratch.txt"), "x\n")
+        self.assertEqual(wt.merge.status, "committed")
+        self.assertFalse(os.path.exists(os.path.join(self.repo, "scratch.txt")))
+
+        with self.pool.worktree() as again:
+            self.assertEqual(again.path, wt.path)
+            self.assertFalse(os.path.exists(os.path.join(again.path, "scratch.txt")))
+        self.assertEqual(again.merge.status, "clean")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+"""
+Latency breakdown of a single agent run.
+
+`RunTimer` timestamps the lifecycle of the CLI process with the monotonic
+clock: spawn, first stdout byte, first parsed event, first text token, every
+tool call (from the event stream) and exit. `finish()` turns that into the
+`timing` dict stored in run.json and on `AgentRes.timing`:
+
+    spawn_ms        Popen returned
+    first_byte_ms   first stdout line arrived
+    first_event_ms  first JSON event parsed
+    first_token_ms  first text extracted
+    exit_ms         process exited
+    tool_ms         wall time inside tool calls (overlapping calls counted once)
+    model_ms        exit_ms - first_event_ms - tool_ms: model time plus CLI overhead
+    tools           [{name, start_ms, end_ms, ms}], first MAX_TOOL_SPANS calls
+
+Sessions keep a histogram per metric so percentiles survive restarts.
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .routing import LatencyHistogram
+
+MAX_TOOL_SPANS = 200
+
+# metrics summarized per session
+SESSION_METRICS = ("spawn_ms", "first_event_ms", "first_token_ms", "tool_ms", "model_ms", "exit_ms")
+
+_CODEX_TOOL_ITEMS = {"command_execution", "mcp_tool_call", "file_change", "web_search", "tool_call", "function_call"}
+
+
+def _codex_tool_name(item: Dict[str, Any]) -> str:
+    kind = item.get("type") or "tool"
+    detail = item.get("command") or item.get("tool") or item.get("name") or item.get("query")
+    if isinstance(detail, list):
+        detail = " ".join(str(x) for x in detail)
+    if isinstance(detail, str) and detail:
+        return f"{kind}: {detail[:60]}"
+    return kind
+
+
+def _claude_blocks(raw: Dict[str, Any], kind: str) -> List[Dict[str, Any]]:
+    msg = raw.get("message")
+    content = msg.get("content") if isinstance(msg, dict) else None
+    if not isinstance(content, list):
+        return []
+    return [b for b in content if isinstance(b, dict) and b.get("type") == kind]
+
+
+class RunTimer:
+    def __init__(self) -> None:
+        self.t0 = time.monotonic()
+        self.marks: Dict[str, int] = {}
+        self._open: Dict[str, Tuple[str, int]] = {}
+        self._spans: List[Tuple[str, int, int]] = []
+        self._calls = 0
+
+    def _now(self) -> int:
+        return int((time.monotonic() - self.t0) * 1000)
+
+    def mark(self, name: str) -> None:
+        """Record the first occurrence of a lifecycle point."""
+        if name not in self.marks:
+            self.marks[name] = self._now()
+
+    def _start(self, key: str, name: str) -> str:
+        self._calls += 1
+        self._open[key] = (name, self._now())
+        return name
+
+    def _end(self, key: str, name: str) -> Optional[str]:
+        now = self._now()
+        opened = self._open.pop(key, None)
+        started = None
+        if opened is None:
+            # completed without a start event (codex reports some file changes this way)
+            self._calls += 1
+            opened = (name, now)
+            started = name
+        self._spans.append((opened[0], opened[1], now))
+        return started
+
+    def on_event(self, raw: Dict[str, Any]) -> List[str]:
+        """Track tool-call start/end from a raw provider event; returns the calls it started."""
+        etype = raw.get("type")
+        item = raw.get("item")
+        if isinstance(item, dict) and item.get("type") in _CODEX_TOOL_ITEMS:
+            key = str(item.get("id") or id(item))
+            if etype == "item.started":
+                return [self._start(key, _codex_tool_name(item))]
+            if etype == "item.completed":
+                started = self._end(key, _codex_tool_name(item))
+                return [started] if started else []
+            return []
+        if etype == "assistant":
+            return [self._start(str(block.get("id")), str(block.get("name") or "tool"))
+                    for block in _claude_blocks(raw, "tool_use")]
+        if etype == "user":
+            started_calls = []
+            for block in _claude_blocks(raw, "tool_result"):
+                key = str(block.get("tool_use_id"))
+                started = self._end(key, self._open.get(key, ("tool", 0))[0])
+                if started:
+                    started_calls.append(started)
+            return started_calls
+        return []
+
+    def finish(self) -> Dict[str, Any]:
+        self.mark("exit_ms")
+        exit_ms = self.marks["exit_ms"]
+        spans = list(self._spans) + [(name, start, exit_ms) for name, start in self._open.values()]
+        spans.sort(key=lambda s: s[1])
+        tool_ms = 0
+        cur_start, cur_end = None, None
+        for _, start, end in spans:
+            if cur_end is None or start > cur_end:
+                if cur_end is not None:
+                    tool_ms += cur_end - cur_start
+                cur_start, cur_end = start, end
+            else:
+                cur_end = max(cur_end, end)
+        if cur_end is not None:
+            tool_ms += cur_end - cur_start
+        timing: Dict[str, Any] = dict(self.marks)
+        timing["tool_ms"] = tool_ms
+        timing["tool_calls"] = self._calls
+        if "first_event_ms" in self.marks:
+            timing["model_ms"] = max(0, exit_ms - self.marks["first_event_ms"] - tool_ms)
+        timing["tools"] = [
+            {"name": name, "start_ms": start, "end_ms": end, "ms": end - start}
+            for name, start, end in spans[:MAX_TOOL_SPANS]
+        ]
+        return timing
+
+
+class TimingHistogram(LatencyHistogram):
+    """~10% buckets from 1ms, fine enough for spawn times as well as long runs."""
+
+    _BASE_MS = 1.0
+    _GROWTH = 1.1
+    _BUCKETS = 170
+
+
+def merge_timing(summary: Optional[Dict[str, Any]], timing: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Add one run's timing to a session summary {metric: {count, p50, p90, p99, buckets}}."""
+    out = dict(summary or {})
+    if not timing:
+        return out
+    for metric in SESSION_METRICS:
+        value = timing.get(metric)
+        if value is None:
+            continue
+        hist = TimingHistogram()
+        hist.load((out.get(metric) or {}).get("buckets") or {})
+        hist.record(value)
+        out[metric] = {
+            "count": hist.count,
+            "p50": round(hist.quantile(0.5) or 0),
+            "p90": round(hist.quantile(0.9) or 0),
+            "p99": round(hist.quantile(0.99) or 0),
+            "buckets": hist.to_dict(),
+        }
+    return out
@@ -0,0 +1,249 @@
+"""
+Structured tracing: nested spans for workflows, runs, loop iterations, attempts
+and the CLI process, written to a local file a trace viewer can open.
+
+    enable_tracing("trace.json")                # Chrome trace (chrome://tracing, Perfetto)
+    enable_tracing("trace.jsonl", fmt="otlp")   # OTLP-JSON, one export request per line
+
+or set AIBATON_TRACE=1 (default path under ~/.aibaton/traces) or
+AIBATON_TRACE=<path>, with AIBATON_TRACE_FORMAT=otlp for OTLP.
+
+Spans nest through a context variable; code that hands work to other threads
+wraps the callable with `bind()` so the worker's spans keep their parent. When
+tracing is disabled `span()` returns a shared no-op object, so instrumented
+code pays one global lookup per span.
+
+Both formats are append-only: spans are written in batches when a root span
+ends (and at exit), so a trace of a days-long workflow is usable while it runs.
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from .logger import logger
+from .storage import get_writer
+from .utils import ensure_dir
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+TRACE_ENV = "AIBATON_TRACE"
+TRACE_FORMAT_ENV = "AIBATON_TRACE_FORMAT"
+
+_current: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("aibaton_span", default=None)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+    def set(self, **attrs: Any) -> "_NoopSpan":
+        return self
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "status", "start_ns", "end_ns", "tid", "_token")
+
+    def __init__(self, name: str, parent: "Optional[Span]", attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attrs = attrs
+        self.status = "ok"
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.tid = threading.get_ident()
+        self._token: Optional[contextvars.Token] = None
+
+    def set(self, **attrs: Any) -> "Span":
+        self.attrs.update(attrs)
+        return self
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.status = "error"
+            self.attrs.setdefault("error", repr(exc))
+        if self._token is not None:
+            _current.reset(self._token)
+        tracer = _tracer
+        if tracer is not None:
+            tracer.finish(self)
+
+
+def _chrome_event(sp: Span, pid: int) -> Dict[str, Any]:
+    args = {k: v for k, v in sp.attrs.items() if v is not None}
+    # a failed span carries its exception in the "error" attribute
+    args.update(span_id=sp.span_id, parent_id=sp.parent_id)
+    return {
+        "name": sp.name,
+        "cat": "aibaton",
+        "ph": "X",
+        "ts": sp.start_ns // 1000,
+        "dur": max(0, sp.end_ns - sp.start_ns) // 1000,
+        "pid": pid,
+        "tid": sp.tid,
+        "args": args,
+    }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)}
+
+
+def _otlp_span(sp: Span) -> Dict[str, Any]:
+    out: Dict[str, Any] = {
+        "traceId": sp.trace_id,
+        "spanId": sp.span_id,
+        "name": sp.name,
+        "kind": 1,
+        "startTimeUnixNano": str(sp.start_ns),
+        "endTimeUnixNano": str(sp.end_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in sp.attrs.items() if v is not None],
+        "status": {"code": 2 if sp.status == "error" else 1},
+    }
+    if sp.parent_id:
+        out["parentSpanId"] = sp.parent_id
+    return out
+
+
+def _append(path: str, text: str) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+class Tracer:
+    def __init__(self, path: str, fmt: str = "chrome", batch: int = 1000) -> None:
+        if fmt not in ("chrome", "otlp"):
+            raise ValueError(f"unknown trace format: {fmt}")
+        self.path = os.path.abspath(path)
+        self.fmt = fmt
+        self.batch = batch
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._pending: List[Span] = []
+        ensure_dir(os.path.dirname(self.path))
+        if fmt == "chrome" and not os.path.exists(self.path):
+            # JSON array format: viewers accept the file without the closing bracket
+            _append(self.path, "[\n")
+
+    def finish(self, sp: Span) -> None:
+        with self._lock:
+            self._pending.append(sp)
+            if sp.parent_id is not None and len(self._pending) < self.batch:
+                return
+            spans, self._pending = self._pending, []
+        self._submit(spans)
+
+    def flush(self) -> None:
+        with self._lock:
+            spans, self._pending = self._pending, []
+        if spans:
+            self._submit(spans)
+
+    def _submit(self, spans: List[Span]) -> None:
+        if self.fmt == "chrome":
+            text = "".join(json.dumps(_chrome_event(sp, self.pid), ensure_ascii=False, default=str) + ",\n" for sp in spans)
+        else:
+            request = {
+                "resourceSpans": [{
+                    "resource": {"attributes": [
+                        {"key": "service.name", "value": {"stringValue": "aibaton"}},
+                        {"key": "process.pid", "value": {"intValue": str(self.pid)}},
+                    ]},
+                    "scopeSpans": [{"scope": {"name": "aibaton"}, "spans": [_otlp_span(sp) for sp in spans]}],
+                }]
+            }
+            text = json.dumps(request, ensure_ascii=False, default=str) + "\n"
+        get_writer().submit(_append, self.path, text)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def span(name: str, **attrs: Any) -> Any:
+    """Context manager for a span nested under the current one; a no-op when tracing is off."""
+    if _tracer is None:
+        return _NOOP
+    return Span(name, _current.get(), attrs)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def bind(fn: F) -> F:
+    """Wrap fn so it runs under the current span when called on another thread."""
+    parent = _current.get()
+    if parent is None:
+        return fn
+
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        token = _current.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return wrapper  # type: ignore[return-value]
+
+
+def _default_path(fmt: str) -> str:
+    from .session import _agent_root
+
+    ext = "otlp.jsonl" if fmt == "otlp" else "json"
+    return os.path.join(_agent_root(), "traces", f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.{ext}")
+
+
+def enable_tracing(path: Optional[str] = None, fmt: str = "chrome") -> str:
+    """Start recording spans to path (default under ~/.aibaton/traces); returns the path."""
+    global _tracer
+    if _tracer is not None:
+        _tracer.flush()
+    _tracer = Tracer(path or _default_path(fmt), fmt)
+    logger.info("tracing to %s (%s)", _tracer.path, fmt)
+    return _tracer.path
+
+
+def disable_tracing() -> None:
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.flush()
+
+
+def flush_tracing() -> None:
+    """Queue every finished span for writing; flush_storage() then puts them on disk."""
+    if _tracer is not None:
+        _tracer.flush()
+
+
+# runs before the storage writer's own atexit hook (registered earlier), which drains the queue
+atexit.register(flush_tracing)
+
+_env = os.environ.get(TRACE_ENV)
+if _env and _env != "0":
+    enable_tracing(None if _env == "1" else _env, os.environ.get(TRACE_FORMAT_ENV) or "chrome")
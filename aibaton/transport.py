@@ -0,0 +1,117 @@
+"""
+How the prompt reaches the provider CLI: argv, stdin or a temp file.
+
+Linux caps a single argv string at MAX_ARG_STRLEN (128 KiB) and argv + environ
+together at ARG_MAX; exceeding either makes exec fail with E2BIG after the
+spawn was paid for. Providers list the transports they accept in
+`transports` (most preferred first). `choose_transport()` keeps the first one
+the prompt fits, and falls back to "file": the prompt is written to a temp
+file and the CLI gets a short instruction to read it.
+
+stdin is fed from a writer thread so a child that writes a lot of output
+before it has read all of its input can't deadlock against us.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+from typing import IO, Dict, Optional, Sequence
+
+from .logger import logger
+
+ARGV = "argv"
+STDIN = "stdin"
+FILE = "file"
+
+# Linux: 32 pages; a single argv string including its NUL must fit
+MAX_ARG_STRLEN = 32 * 4096
+# Windows: CreateProcess command line, in UTF-16 code units
+_WIN_CMDLINE_MAX = 32767
+# room for the loader's auxv, alignment and the argv/envp pointer arrays' slack
+_ARG_HEADROOM = 16 * 1024
+
+
+def arg_max() -> int:
+    try:
+        value = os.sysconf("SC_ARG_MAX")
+    except (AttributeError, ValueError, OSError):
+        value = -1
+    return value if value > 0 else 2 * 1024 * 1024
+
+
+def fits_argv(prompt: str, cmd: Sequence[str], env: Optional[Dict[str, str]] = None) -> bool:
+    """Whether appending prompt to cmd stays within the OS limits for exec."""
+    if sys.platform == "win32":
+        return len(prompt) + sum(len(a) + 3 for a in cmd) + 3 < _WIN_CMDLINE_MAX
+    size = len(prompt.encode("utf-8", "surrogateescape")) + 1
+    if size >= MAX_ARG_STRLEN:
+        return False
+    ptr = 8
+    for arg in cmd:
+        size += len(arg.encode("utf-8", "surrogateescape")) + 1 + ptr
+    environ = os.environ if env is None else env
+    for key, value in environ.items():
+        size += len(key.encode("utf-8", "surrogateescape")) + len(value.encode("utf-8", "surrogateescape")) + 2 + ptr
+    return size + _ARG_HEADROOM < arg_max()
+
+
+def choose_transport(
+    prompt: str,
+    supported: Sequence[str],
+    cmd: Sequence[str],
+    env: Optional[Dict[str, str]] = None,
+) -> str:
+    """First transport in `supported` that the prompt fits; FILE when none does."""
+    for name in supported:
+        if name == ARGV and not fits_argv(prompt, cmd, env):
+            continue
+        if name in (ARGV, STDIN):
+            return name
+    return FILE
+
+
+def write_prompt_file(prompt: str) -> str:
+    fd, path = tempfile.mkstemp(prefix="aibaton-prompt-", suffix=".md")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(prompt)
+    return path
+
+
+def file_reference(path: str, size: int) -> str:
+    """Short prompt handed to the CLI in place of a prompt stored in a file."""
+    return (
+        f"The full task is in the file {path} ({size} bytes). "
+        "Read the whole file first and follow its instructions exactly as if they had been given here."
+    )
+
+
+def remove_prompt_file(path: Optional[str]) -> None:
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except OSError as e:
+        logger.debug("prompt file not removed: %s: %s", path, e)
+
+
+def feed_stdin(stream: Optional[IO[str]], data: str) -> Optional[threading.Thread]:
+    """Write data to the child's stdin on a daemon thread, closing it when done."""
+    if stream is None:
+        return None
+
+    def write() -> None:
+        try:
+            stream.write(data)
+        except (BrokenPipeError, OSError, ValueError):
+            # child exited or closed its stdin early; its output tells what happened
+            pass
+        finally:
+            try:
+                stream.close()
+            except (BrokenPipeError, OSError, ValueError):
+                pass
+
+    t = threading.Thread(target=write, name="aibaton-stdin", daemon=True)
+    t.start()
+    return t
@@ -1,7 +1,14 @@
 import json
 import os
+import threading
 import time
-from typing import Any, Dict, Optional
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # no cross-process locking on Windows
+    fcntl = None  # type: ignore[assignment]
 
 
 def now_ms() -> int:
@@ -12,6 +19,38 @@ def ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
 
+def write_text_atomic(path: str, text: str, mode: int = 0o666) -> None:
+    """Write via a temp file and os.replace, so readers never see a partial file."""
+    # per writer, so concurrent writers never rename each other's half-written file
+    tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode), "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(path: str, data: Any, indent: Optional[int] = None, mode: int = 0o666) -> None:
+    write_text_atomic(path, json.dumps(data, ensure_ascii=False, indent=indent), mode)
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Exclusive lock on `path` shared with other processes (blocking)."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
 def safe_json_loads(line: str) -> Optional[Dict[str, Any]]:
     try:
         return json.loads(line)
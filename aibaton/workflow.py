@@ -0,0 +1,289 @@
+"""
+Small DAG workflow engine.
+
+Steps declare their dependencies and wrap a `run()` prompt, a `start_process()`
+command or a plain function. Steps whose dependencies have succeeded run
+concurrently (up to `max_parallel`); a dependency's value is substituted for
+`{dep_name}` in prompts/commands: the selected option of an AgentRes (falling
+back to its text) or a ProcessResult's output. In a shell command string the
+value is inserted shell-quoted (don't quote the placeholder yourself); argv
+lists get it verbatim.
+
+    wf = Workflow("bybit", max_parallel=3)
+    wf.step("index", prompt=gen_doc_index)
+    wf.step("plan", prompt=plan_prompt, deps=["index"])
+    wf.step("pick", prompt=pick_plan_step, deps=["plan"])
+    wf.step("implement", prompt="The part to integrate now is: {pick}", deps=["pick"])
+    wf.step("build", cmd="go build ./...", deps=["implement"], timeout_s=600)
+    results = wf.run()
+
+State is persisted to `~/.aibaton/workspaces/<id>/workflows/<name>.json` after
+every transition, including per-step timing and the current critical path.
+"""
+
+import concurrent.futures
+import os
+import shlex
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from .logger import logger
+from .process import ProcessResult, start_process
+from .prompts import PromptTemplate
+from .session import _workspace_dir
+from .storage import get_writer
+from .tracing import bind, span
+from .utils import ensure_dir, now_ms, write_json_atomic
+
+
+@dataclass
+class Step:
+    name: str
+    prompt: Optional[Union[str, PromptTemplate]] = None
+    cmd: Optional[Union[str, Sequence[str]]] = None
+    fn: Optional[Callable[[Dict[str, Any]], Any]] = None
+    deps: List[str] = field(default_factory=list)
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    status: str = "pending"  # pending | running | success | error | skipped
+    result: Any = None
+    error: Optional[str] = None
+    started_at: Optional[int] = None
+    finished_at: Optional[int] = None
+    elapsed_ms: int = 0
+
+
+def step_value(res: Any) -> str:
+    """The value a step passes downstream."""
+    from .runner import AgentRes
+
+    if isinstance(res, AgentRes):
+        return res.option or res.select() or res.text
+    if isinstance(res, ProcessResult):
+        return res.output
+    return "" if res is None else str(res)
+
+
+def _succeeded(res: Any) -> bool:
+    status = getattr(res, "status", None)
+    return status is None or status == "success"
+
+
+def _fill(template: str, values: Dict[str, str]) -> str:
+    # plain replace: prompts often contain literal braces (yaml, code)
+    for name, value in values.items():
+        template = template.replace("{" + name + "}", value)
+    return template
+
+
+class Workflow:
+    def __init__(self, name: str, max_parallel: int = 4, cwd: Optional[str] = None) -> None:
+        if cwd is None:
+            from . import runner
+
+            cwd = runner._DEFAULT_CWD or os.getcwd()
+        self.name = name
+        self.max_parallel = max(1, max_parallel)
+        self.cwd = cwd
+        self.steps: Dict[str, Step] = {}
+        self._lock = threading.Lock()
+        state_dir = os.path.join(_workspace_dir(os.path.abspath(cwd)), "workflows")
+        ensure_dir(state_dir)
+        self.state_path = os.path.join(state_dir, f"{name}.json")
+
+    def step(
+        self,
+        name: str,
+        prompt: Optional[Union[str, PromptTemplate]] = None,
+        cmd: Optional[Union[str, Sequence[str]]] = None,
+        fn: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        deps: Sequence[str] = (),
+        **kwargs: Any,
+    ) -> "Workflow":
+        """Add a step; extra kwargs go to run() / start_process()."""
+        if name in self.steps:
+            raise ValueError(f"duplicate step: {name}")
+        if sum(x is not None for x in (prompt, cmd, fn)) != 1:
+            raise ValueError(f"step {name}: exactly one of prompt, cmd, fn is required")
+        self.steps[name] = Step(name=name, prompt=prompt, cmd=cmd, fn=fn, deps=list(deps), kwargs=kwargs)
+        return self
+
+    def _validate(self) -> None:
+        for st in self.steps.values():
+            for dep in st.deps:
+                if dep not in self.steps:
+                    raise ValueError(f"step {st.name}: unknown dependency {dep}")
+        visiting: Dict[str, bool] = {}
+
+        def visit(name: str) -> None:
+            if visiting.get(name) is False:
+                return
+            if visiting.get(name) is True:
+                raise ValueError(f"dependency cycle at step: {name}")
+            visiting[name] = True
+            for dep in self.steps[name].deps:
+                visit(dep)
+            visiting[name] = False
+
+        for name in self.steps:
+            visit(name)
+
+    def _execute(self, st: Step) -> Any:
+        with span("step", step=st.name, workflow=self.name) as sp:
+            res = self._call(st)
+            sp.set(status=getattr(res, "status", None))
+        return res
+
+    def _call(self, st: Step) -> Any:
+        inputs = {dep: self.steps[dep].result for dep in st.deps}
+        values = {dep: step_value(res) for dep, res in inputs.items()}
+        if st.fn is not None:
+            return st.fn(inputs)
+        if st.cmd is not None:
+            cmd = st.cmd
+            if isinstance(cmd, str):
+                # agent output must never run as shell syntax
+                cmd = _fill(cmd, {dep: shlex.quote(v) for dep, v in values.items()})
+            else:
+                cmd = [_fill(c, values) for c in cmd]
+            kwargs = dict(st.kwargs)
+            kwargs.setdefault("cwd", self.cwd)
+            return start_process(cmd, **kwargs).wait()
+        from .runner import run
+
+        kwargs = dict(st.kwargs)
+        kwargs.setdefault("stream", False)  # concurrent token streams would interleave
+        kwargs.setdefault("group", self.name)  # fair share of the rate-limit queue per workflow
+        if isinstance(st.prompt, PromptTemplate):
+            return run(st.prompt.format(**values), **kwargs)
+        return run(_fill(st.prompt or "", values), **kwargs)
+
+    def _ready(self) -> List[Step]:
+        out = []
+        changed = True
+        while changed:
+            # repeat so a failure cascades through every downstream step
+            changed = False
+            for st in self.steps.values():
+                if st.status != "pending" or st in out:
+                    continue
+                dep_status = [self.steps[d].status for d in st.deps]
+                if any(s in ("error", "skipped") for s in dep_status):
+                    st.status = "skipped"
+                    changed = True
+                    logger.info("workflow %s: step %s skipped (dependency failed)", self.name, st.name)
+                elif all(s == "success" for s in dep_status):
+                    out.append(st)
+        return out
+
+    def critical_path(self) -> List[str]:
+        """Longest chain of dependent steps by elapsed time (running steps count so far)."""
+        cost: Dict[str, int] = {}
+        prev: Dict[str, Optional[str]] = {}
+        now = now_ms()
+
+        def elapsed(st: Step) -> int:
+            if st.status == "running" and st.started_at:
+                return now - st.started_at
+            return st.elapsed_ms
+
+        def visit(name: str) -> int:
+            if name in cost:
+                return cost[name]
+            st = self.steps[name]
+            best, best_dep = 0, None
+            for dep in st.deps:
+                c = visit(dep)
+                if c > best:
+                    best, best_dep = c, dep
+            cost[name] = best + elapsed(st)
+            prev[name] = best_dep
+            return cost[name]
+
+        if not self.steps:
+            return []
+        end = max(self.steps, key=visit)
+        path: List[str] = []
+        cur: Optional[str] = end
+        while cur is not None:
+            path.append(cur)
+            cur = prev[cur]
+        return list(reversed(path))
+
+    def state(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = {
+                st.name: {
+                    "status": st.status,
+                    "deps": st.deps,
+                    "kind": "prompt" if st.prompt is not None else ("cmd" if st.cmd is not None else "fn"),
+                    "started_at": st.started_at,
+                    "finished_at": st.finished_at,
+                    "elapsed_ms": st.elapsed_ms,
+                    "error": st.error,
+                    "run_id": ((getattr(st.result, "artifacts", None) or {}).get("run_id")),
+                }
+                for st in self.steps.values()
+            }
+            critical = self.critical_path()
+        return {
+            "workflow": self.name,
+            "max_parallel": self.max_parallel,
+            "updated_at": now_ms(),
+            "steps": steps,
+            "critical_path": critical,
+            "critical_path_ms": sum(steps[n]["elapsed_ms"] for n in critical),
+        }
+
+    def _persist(self) -> None:
+        get_writer().submit(_write_state, self.state_path, self.state())
+
+    def run(self) -> Dict[str, Any]:
+        """Run all steps; returns results by step name (None for skipped steps)."""
+        with span("workflow", workflow=self.name, steps=len(self.steps), max_parallel=self.max_parallel) as sp:
+            results = self._run()
+            sp.set(failed=[n for n, st in self.steps.items() if st.status == "error"] or None)
+        return results
+
+    def _run(self) -> Dict[str, Any]:
+        self._validate()
+        start = time.monotonic()
+        logger.info("workflow start: %s steps=%d max_parallel=%d", self.name, len(self.steps), self.max_parallel)
+        running: Dict[concurrent.futures.Future, Step] = {}
+        with concurrent.futures.ThreadPoolExecutor(self.max_parallel, thread_name_prefix=f"wf-{self.name}") as pool:
+            while True:
+                with self._lock:
+                    ready = self._ready()
+                    for st in ready:
+                        st.status = "running"
+                        st.started_at = now_ms()
+                for st in ready:
+                    logger.info("workflow %s: step %s started", self.name, st.name)
+                    running[pool.submit(bind(self._execute), st)] = st
+                self._persist()
+                if not running:
+                    break
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for fut in done:
+                    st = running.pop(fut)
+                    with self._lock:
+                        st.finished_at = now_ms()
+                        st.elapsed_ms = st.finished_at - (st.started_at or st.finished_at)
+                        try:
+                            st.result = fut.result()
+                            st.status = "success" if _succeeded(st.result) else "error"
+                            if st.status == "error":
+                                st.error = f"status={getattr(st.result, 'status', None)}"
+                        except Exception as e:
+                            st.status = "error"
+                            st.error = repr(e)
+                            logger.exception("workflow %s: step %s raised", self.name, st.name)
+                    logger.info("workflow %s: step %s %s (%dms)", self.name, st.name, st.status, st.elapsed_ms)
+        elapsed_ms = int((time.monotonic() - start) * 1000)
+        logger.info("workflow done: %s elapsed_ms=%d critical_path=%s", self.name, elapsed_ms, " -> ".join(self.critical_path()))
+        return {name: st.result for name, st in self.steps.items()}
+
+
+def _write_state(path: str, state: Dict[str, Any]) -> None:
+    write_json_atomic(path, state, indent=2)
@@ -0,0 +1,262 @@
+"""
+Git worktree pool so concurrent agents can edit one repository safely.
+
+Each acquired worktree is a detached checkout of the repository's current HEAD
+under `~/.aibaton/workspaces/<id>/worktrees/`. Released worktrees are kept and
+reset for the next run, which is much cheaper than a fresh checkout. A worktree
+in use is locked (`flock` on `<path>.lock`), so pools in other processes on the
+same repository skip it instead of resetting it under a running agent. On release
+the agent's changes are committed and merged back into the repository's current
+branch; on conflict the merge is aborted, the commit is kept on a branch and the
+conflicting paths are reported.
+
+    pool = WorktreePool("/app/banbot")
+    with pool.worktree() as wt:
+        run(prompt, cwd=wt.path)
+    # or simply: run(prompt, cwd="/app/banbot", isolate=True)
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from .logger import logger
+from .session import _workspace_dir
+from .utils import ensure_dir, now_ms
+
+try:
+    import fcntl
+except ImportError:  # no cross-process locking on Windows
+    fcntl = None  # type: ignore[assignment]
+
+
+class GitError(RuntimeError):
+    pass
+
+
+@dataclass
+class Worktree:
+    path: str
+    name: str
+    base: str = ""  # commit the worktree was reset to on acquire
+    merge: Optional["MergeResult"] = None  # set by WorktreePool.worktree() on exit
+
+
+@dataclass
+class MergeResult:
+    status: str  # clean (no changes) | merged | committed | conflict | error
+    commit: Optional[str] = None
+    branch: Optional[str] = None
+    conflicts: List[str] = field(default_factory=list)
+    message: str = ""
+
+
+def _git(cwd: str, *args: str, check: bool = True, env: Optional[Dict[str, str]] = None) -> str:
+    proc = subprocess.run(
+        ["git", "-C", cwd, *args],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        env=env,
+    )
+    if check and proc.returncode != 0:
+        raise GitError(f"git {' '.join(args)} failed: {proc.stderr.strip() or proc.stdout.strip()}")
+    return proc.stdout.strip()
+
+
+def _commit_env(cwd: str) -> Optional[Dict[str, str]]:
+    # fall back to a fixed identity only when the user has none configured
+    if _git(cwd, "config", "user.email", check=False):
+        return None
+    env = dict(os.environ)
+    env.setdefault("GIT_AUTHOR_NAME", "aibaton")
+    env.setdefault("GIT_AUTHOR_EMAIL", "aibaton@localhost")
+    env.setdefault("GIT_COMMITTER_NAME", env["GIT_AUTHOR_NAME"])
+    env.setdefault("GIT_COMMITTER_EMAIL", env["GIT_AUTHOR_EMAIL"])
+    return env
+
+
+def _try_lock(path: str) -> Optional[int]:
+    """Exclusive lock held through the returned fd; None if another holder has it."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    if fcntl is None:
+        return fd
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+class WorktreePool:
+    def __init__(self, repo: str, root: Optional[str] = None, max_size: Optional[int] = None) -> None:
+        self.repo = _git(os.path.abspath(repo), "rev-parse", "--show-toplevel")
+        self.root = root or os.path.join(_workspace_dir(self.repo), "worktrees")
+        ensure_dir(self.root)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._merge_lock = threading.Lock()
+        self._slots = threading.Condition(self._lock)
+        self._idle: List[Worktree] = []
+        self._busy: Dict[str, Worktree] = {}
+        # name -> fd holding the worktree's lock while it is busy
+        self._held: Dict[str, int] = {}
+
+    def _flock(self, wt_path: str) -> Optional[int]:
+        return _try_lock(wt_path + ".lock")
+
+    def _claim_idle(self) -> Optional[Worktree]:
+        for i in range(len(self._idle) - 1, -1, -1):
+            wt = self._idle[i]
+            fd = self._flock(wt.path)
+            if fd is not None:
+                del self._idle[i]
+                self._held[wt.name] = fd
+                return wt
+        return None
+
+    def _new_worktree(self) -> Worktree:
+        n = 0
+        while True:
+            name = f"wt-{n}"
+            path = os.path.join(self.root, name)
+            n += 1
+            if name in self._busy or any(w.name == name for w in self._idle):
+                continue
+            fd = self._flock(path)
+            if fd is not None:
+                break
+            logger.debug("worktree in use by another process: %s", path)
+        try:
+            registered = f"worktree {path}" in _git(self.repo, "worktree", "list", "--porcelain").split("\n")
+            if registered and os.path.isdir(path):
+                logger.debug("worktree reused from previous process: %s", path)
+            else:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)  # stale directory no longer registered with git
+                _git(self.repo, "worktree", "prune")
+                _git(self.repo, "worktree", "add", "--detach", "--force", path, "HEAD")
+                logger.debug("worktree created: %s", path)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._held[name] = fd
+        return Worktree(path=path, name=name)
+
+    def acquire(self, timeout: Optional[float] = None, ref: Optional[str] = None) -> Worktree:
+        """Check out `ref` (default: the repository's HEAD) in a free worktree."""
+        with self._slots:
+            while self.max_size and not self._idle and len(self._busy) >= self.max_size:
+                if not self._slots.wait(timeout):
+                    raise TimeoutError("no free worktree")
+            wt = self._claim_idle() or self._new_worktree()
+            self._busy[wt.name] = wt
+        try:
+            head = _git(self.repo, "rev-parse", "--verify", f"{ref or 'HEAD'}^{{commit}}")
+            _git(wt.path, "checkout", "--force", "--detach", head)
+            _git(wt.path, "reset", "--hard", head)
+            # -d only: ignored build caches survive between runs
+            _git(wt.path, "clean", "-fd")
+            wt.base = head
+        except Exception:
+            self._return(wt)
+            raise
+        logger.debug("worktree acquired: %s base=%s", wt.path, wt.base[:10])
+        return wt
+
+    def _return(self, wt: Worktree) -> None:
+        with self._slots:
+            self._busy.pop(wt.name, None)
+            fd = self._held.pop(wt.name, None)
+            if fd is not None:
+                os.close(fd)  # drops the lock
+            self._idle.append(wt)
+            self._slots.notify()
+
+    def discard(self, wt: Worktree) -> None:
+        """Give the worktree back without keeping its changes; the next acquire resets it."""
+        self._return(wt)
+
+    def release(self, wt: Worktree, merge: bool = True, message: Optional[str] = None) -> MergeResult:
+        """Commit the worktree's changes and merge them into the repo (merge=False keeps them on a branch)."""
+        try:
+            return self._collect(wt, merge, message or f"aibaton: changes from {wt.name}")
+        except GitError as e:
+            logger.error("worktree release failed: %s %s", wt.path, e)
+            return MergeResult(status="error", message=str(e))
+        finally:
+            self._return(wt)
+
+    def _collect(self, wt: Worktree, merge: bool, message: str) -> MergeResult:
+        _git(wt.path, "add", "-A")
+        if not _git(wt.path, "status", "--porcelain"):
+            return MergeResult(status="clean", commit=_git(wt.path, "rev-parse", "HEAD"))
+        _git(wt.path, "commit", "-q", "-m", message, env=_commit_env(wt.path))
+        commit = _git(wt.path, "rev-parse", "HEAD")
+        branch = f"aibaton/{wt.name}-{now_ms()}"
+        _git(self.repo, "branch", branch, commit)
+        if not merge:
+            return MergeResult(status="committed", commit=commit, branch=branch)
+        with self._merge_lock:
+            proc = subprocess.run(
+                ["git", "-C", self.repo, "merge", "--no-edit", "-m", message, branch],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                env=_commit_env(self.repo),
+            )
+            if proc.returncode == 0:
+                _git(self.repo, "branch", "-D", branch, check=False)
+                logger.info("worktree merged: %s commit=%s", wt.name, commit[:10])
+                return MergeResult(status="merged", commit=_git(self.repo, "rev-parse", "HEAD"), message=proc.stdout.strip())
+            conflicts = [p for p in _git(self.repo, "diff", "--name-only", "--diff-filter=U", check=False).splitlines() if p]
+            _git(self.repo, "merge", "--abort", check=False)
+        if not conflicts:
+            # refused before merging, e.g. local changes in the main working tree
+            logger.error("worktree merge failed: %s branch=%s %s", wt.name, branch, proc.stdout.strip())
+            return MergeResult(status="error", commit=commit, branch=branch, message=proc.stdout.strip())
+        logger.warning("worktree merge conflict: %s branch=%s files=%s", wt.name, branch, conflicts)
+        return MergeResult(status="conflict", commit=commit, branch=branch, conflicts=conflicts, message=proc.stdout.strip())
+
+    @contextmanager
+    def worktree(self, merge: bool = True, message: Optional[str] = None) -> Iterator[Worktree]:
+        wt = self.acquire()
+        try:
+            yield wt
+        except BaseException:
+            wt.merge = self.release(wt, merge=False, message=message)
+            raise
+        wt.merge = self.release(wt, merge=merge, message=message)
+
+    def cleanup(self) -> None:
+        """Remove all idle worktrees of this pool."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for wt in idle:
+            fd = self._flock(wt.path)
+            if fd is None:
+                continue  # in use by another process
+            try:
+                _git(self.repo, "worktree", "remove", "--force", wt.path, check=False)
+            finally:
+                os.close(fd)
+        _git(self.repo, "worktree", "prune", check=False)
+
+
+_pools: Dict[str, WorktreePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_worktree_pool(repo: str) -> WorktreePool:
+    """Process-wide pool per repository."""
+    key = os.path.abspath(repo)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = WorktreePool(key)
+        return pool
@@ -0,0 +1,158 @@
+"""
+Hook dispatch overhead: per-event cost of the runner's event pipeline with and
+without subscribers.
+
+Feeds a synthetic codex event stream through the same steps `_exec_once` runs
+for every stdout line (parse, tool tracking, normalize, hook dispatch, text
+extraction) and reports the best-of-N ns/event for each hook setup, plus the cost of
+on_event dispatch alone over pre-parsed events. After one warmup pass per mode
+the modes are timed round-robin, each pass after gc.collect() with the
+collector disabled, so the "none" baseline the overhead column is relative to
+sees the same conditions as the others:
+
+    none       nothing registered, dispatch skipped
+    other      one on_event() subscriber for a type that never occurs
+    typed      one on_event() subscriber for turn.completed (1 in 10 events)
+    wildcard   one on_event("*") subscriber
+    all        wildcard + on_tool_call + on_text + on_done subscribers
+
+    python benchmarks/bench_hooks.py --events 200000
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aibaton import hooks  # noqa: E402
+from aibaton.events import extract_text, normalize_event  # noqa: E402
+from aibaton.timing import RunTimer  # noqa: E402
+from aibaton.utils import safe_json_loads  # noqa: E402
+
+
+def _lines(n: int) -> list:
+    cycle = [
+        {"type": "item.started", "item": {"id": "c", "type": "command_execution", "command": "ls"}},
+        {"type": "item.completed", "item": {"id": "c", "type": "command_execution", "command": "ls"}},
+        {"type": "item.completed", "item": {"type": "reasoning", "text": "thinking"}},
+    ] + [{"type": "item.completed", "item": {"type": "agent_message", "text": "token "}}] * 6 + [
+        {"type": "turn.completed", "usage": {"input_tokens": 10, "output_tokens": 2}},
+    ]
+    encoded = [json.dumps(ev) for ev in cycle]
+    return [encoded[i % len(encoded)] for i in range(n)]
+
+
+def _noop(*args: object) -> None:
+    pass
+
+
+def _setup(mode: str) -> None:
+    hooks.clear_hooks()
+    if mode == "other":
+        hooks.on_event("never.seen", _noop)
+    elif mode == "typed":
+        hooks.on_event("turn.completed", _noop)
+    elif mode == "wildcard":
+        hooks.on_event("*", _noop)
+    elif mode == "all":
+        hooks.on_event("*", _noop)
+        hooks.on_tool_call(_noop)
+        hooks.on_text(_noop)
+        hooks.on_done(_noop)
+
+
+def _pipeline(lines: list) -> float:
+    timer = RunTimer()
+    events = []
+    text_parts = []
+    t0 = time.perf_counter()
+    h = hooks.get_hooks()
+    for line in lines:
+        raw = safe_json_loads(line)
+        tool_calls = timer.on_event(raw)
+        ev = normalize_event(raw, "codex")
+        events.append(ev)
+        if h is not None:
+            h.emit_event(ev)
+            for name in tool_calls:
+                h.emit_tool_call(name, ev)
+        txt = extract_text(raw)
+        if txt:
+            text_parts.append(txt)
+            if h is not None:
+                h.emit_text(txt, ev)
+    return time.perf_counter() - t0
+
+
+def _dispatch_only(events: list) -> float:
+    t0 = time.perf_counter()
+    h = hooks.get_hooks()
+    for ev in events:
+        if h is not None:
+            h.emit_event(ev)
+    return time.perf_counter() - t0
+
+
+def _timed(fn, arg: list) -> float:
+    gc.collect()
+    gc.disable()
+    try:
+        return fn(arg)
+    finally:
+        gc.enable()
+
+
+def bench(lines: list, modes: list, repeat: int) -> list:
+    events = [normalize_event(json.loads(line), "codex") for line in lines]
+    best = {mode: [float("inf"), float("inf")] for mode in modes}
+    for rnd in range(repeat + 1):
+        # round 0 warms up caches and the allocator and is not counted
+        for mode in modes:
+            _setup(mode)
+            pipeline = _timed(_pipeline, lines)
+            dispatch = _timed(_dispatch_only, events)
+            if rnd:
+                best[mode][0] = min(best[mode][0], pipeline)
+                best[mode][1] = min(best[mode][1], dispatch)
+    hooks.clear_hooks()
+    rows = []
+    for mode in modes:
+        elapsed, dispatch = best[mode]
+        rows.append({
+            "mode": mode,
+            "events": len(lines),
+            "ns_per_event": round(elapsed * 1e9 / len(lines), 1),
+            "dispatch_ns_per_event": round(dispatch * 1e9 / len(lines), 1),
+        })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5, help="best of N passes per mode")
+    parser.add_argument("--modes", nargs="+", default=["none", "other", "typed", "wildcard", "all"],
+                        choices=["none", "other", "typed", "wildcard", "all"])
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = parser.parse_args()
+    # the overhead column is always relative to "none"
+    modes = ["none"] + [m for m in args.modes if m != "none"]
+    rows = bench(_lines(args.events), modes, args.repeat)
+    base = rows[0]
+    for row in rows:
+        row["overhead_ns"] = round(row["ns_per_event"] - base["ns_per_event"], 1)
+        if row["mode"] not in args.modes:
+            continue
+        if args.json:
+            print(json.dumps(row))
+        else:
+            print(f"{row['mode']:9s} pipeline {row['ns_per_event']:8.1f} ns/event ({row['overhead_ns']:+7.1f})  "
+                  f"dispatch {row['dispatch_ns_per_event']:6.1f} ns/event")
+
+
+if __name__ == "__main__":
+    main()
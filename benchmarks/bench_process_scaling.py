@@ -0,0 +1,80 @@
+"""
+Scaling benchmark: thread-per-process vs. the shared ProcessManager reactor.
+
+Starts N concurrent shell processes that print a few lines over ~1s and reports
+wall time, parent CPU time and peak thread count for each mode.
+
+    python benchmarks/bench_process_scaling.py --sizes 10 100 1000
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aibaton.process import start_process  # noqa: E402
+from aibaton.reactor import ProcessManager  # noqa: E402
+
+CHILD = "echo start; sleep 0.5; echo middle; sleep 0.5; echo end"
+
+
+def _raise_nofile(n: int) -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    want = min(hard, max(soft, n * 4 + 256))
+    if want > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (want, hard))
+
+
+def bench(n: int, mode: str) -> dict:
+    mgr = ProcessManager() if mode == "reactor" else None
+    peak_threads = threading.active_count()
+    cpu0 = time.process_time()
+    t0 = time.monotonic()
+    handles = [start_process(["sh", "-c", CHILD], manager=mgr) for _ in range(n)]
+    spawn_s = time.monotonic() - t0
+    peak_threads = max(peak_threads, threading.active_count())
+    lines = 0
+    for h in handles:
+        res = h.wait()
+        lines += res.stdout.count("\n")
+    wall_s = time.monotonic() - t0
+    cpu_s = time.process_time() - cpu0
+    if mgr is not None:
+        mgr.close(timeout=5)
+    return {
+        "mode": mode,
+        "processes": n,
+        "lines": lines,
+        "spawn_s": round(spawn_s, 3),
+        "wall_s": round(wall_s, 3),
+        "parent_cpu_s": round(cpu_s, 3),
+        "peak_threads": peak_threads,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--modes", nargs="+", default=["thread", "reactor"], choices=["thread", "reactor"])
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = parser.parse_args()
+    _raise_nofile(max(args.sizes))
+    for n in args.sizes:
+        for mode in args.modes:
+            row = bench(n, mode)
+            if args.json:
+                print(json.dumps(row))
+            else:
+                print(
+                    f"{mode:8s} n={n:5d} wall={row['wall_s']:7.3f}s spawn={row['spawn_s']:6.3f}s "
+                    f"cpu={row['parent_cpu_s']:6.3f}s threads={row['peak_threads']}"
+                )
+
+
+if __name__ == "__main__":
+    main()
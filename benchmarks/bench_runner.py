@@ -0,0 +1,256 @@
+"""
+Runner pipeline benchmarks on the fake provider: aibaton's own overhead,
+without real codex/claude runs.
+
+    run_once_small     runs/s of _run_once for a 10-chunk codex stream (spawn dominated)
+    run_once_stream    events/s through _run_once for a long codex stream with tools
+    run_once_claude    events/s through _run_once for a claude delta stream
+    parse_codex        events/s of parse + normalize + extract_text, in-process
+    parse_claude       same for a claude stream with tool calls
+    progress           events/s through ProgressPrinter with token streaming (output discarded)
+    storage            MB/s writing events.jsonl/output.txt/run.json through the storage writer
+    session            session updates/s
+    parallel_N         runs/s of N concurrent run() calls
+
+Results are written to / compared against a JSON baseline:
+
+    python benchmarks/bench_runner.py --save benchmarks/baseline.json
+    python benchmarks/bench_runner.py --compare benchmarks/baseline.json [--tolerance 0.25]
+
+--compare exits with 1 when a case is slower than the baseline by more than
+the tolerance. Each case reports the best of --repeat passes; every value is
+"higher is better".
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aibaton import runner  # noqa: E402
+from aibaton.events import extract_text, normalize_event  # noqa: E402
+from aibaton.progress import ProgressPrinter  # noqa: E402
+from aibaton.providers.fake import FAKE_ENV, generate, parse_config  # noqa: E402
+from aibaton.session import get_or_resume_session, update_session  # noqa: E402
+from aibaton.storage import flush_storage, get_writer, make_run_dir, write_events, write_summary, write_text  # noqa: E402
+from aibaton.utils import safe_json_loads  # noqa: E402
+
+SMALL = "chunks=10"
+STREAM = "chunks=5000,size=80,tools=50"
+CLAUDE = "format=claude,chunks=5000,size=20,deltas=1,tools=50"
+
+
+def _event_count(spec: str) -> int:
+    return sum(1 for stream, _, _ in generate(parse_config(spec)) if stream == "stdout")
+
+
+def _run_once(spec: str, cwd: str) -> None:
+    os.environ[FAKE_ENV] = spec
+    res = runner._run_once(
+        "benchmark", "fake", None, cwd, None, None, json_mode=True, stream=False,
+        dangerous_permissions=False, log_dir=None, session_meta=None,
+    )
+    if res.status != "success":
+        raise RuntimeError(f"fake run failed: {res.status}")
+
+
+def case_run_once_small(cwd: str) -> Tuple[float, str]:
+    n = 10
+    t0 = time.perf_counter()
+    for _ in range(n):
+        _run_once(SMALL, cwd)
+    return n / (time.perf_counter() - t0), "runs/s"
+
+
+def _stream_case(spec: str, cwd: str) -> Tuple[float, str]:
+    events = _event_count(spec)
+    t0 = time.perf_counter()
+    _run_once(spec, cwd)
+    return events / (time.perf_counter() - t0), "events/s"
+
+
+def case_run_once_stream(cwd: str) -> Tuple[float, str]:
+    return _stream_case(STREAM, cwd)
+
+
+def case_run_once_claude(cwd: str) -> Tuple[float, str]:
+    return _stream_case(CLAUDE, cwd)
+
+
+def _parse_case(spec: str) -> Tuple[float, str]:
+    lines = [line for stream, line, _ in generate(parse_config(spec)) if stream == "stdout"] * 4
+    t0 = time.perf_counter()
+    for line in lines:
+        raw = safe_json_loads(line)
+        normalize_event(raw, "fake")
+        extract_text(raw)
+    return len(lines) / (time.perf_counter() - t0), "events/s"
+
+
+def case_parse_codex(cwd: str) -> Tuple[float, str]:
+    return _parse_case(STREAM)
+
+
+def case_parse_claude(cwd: str) -> Tuple[float, str]:
+    return _parse_case(CLAUDE)
+
+
+def case_progress(cwd: str) -> Tuple[float, str]:
+    raws = [safe_json_loads(line) for stream, line, _ in generate(parse_config(STREAM)) if stream == "stdout"]
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink), contextlib.redirect_stderr(sink):
+        progress = ProgressPrinter(stream_tokens=True)
+        progress.start("benchmark")
+        t0 = time.perf_counter()
+        for raw in raws:
+            progress.on_event(normalize_event(raw, "fake"))
+            txt = extract_text(raw)
+            if txt:
+                progress.on_event({"type": "message", "payload": {"text": txt}})
+        elapsed = time.perf_counter() - t0
+        progress.done("success", int(elapsed * 1000))
+    return len(raws) / elapsed, "events/s"
+
+
+def case_storage(cwd: str) -> Tuple[float, str]:
+    lines = [line for stream, line, _ in generate(parse_config(STREAM)) if stream == "stdout"]
+    events = [normalize_event(json.loads(line), "fake") for line in lines]
+    text = "".join(extract_text(ev["payload"]) or "" for ev in events)
+    summary = {"provider": "fake", "status": "success", "prompt": "benchmark " * 100}
+    runs = 5
+    base = os.path.join(cwd, "runs")
+    writer = get_writer()
+    t0 = time.perf_counter()
+    for i in range(runs):
+        run_dir = make_run_dir(base, f"bench_{time.time_ns()}_{i}")
+        writer.submit(write_events, run_dir, events)
+        writer.submit(write_text, run_dir, text)
+        writer.submit(write_summary, run_dir, summary)
+    flush_storage()
+    elapsed = time.perf_counter() - t0
+    size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(base) for f in files)
+    return size / 1e6 / elapsed, "MB/s"
+
+
+def case_session(cwd: str) -> Tuple[float, str]:
+    session, _ = get_or_resume_session(cwd)
+    n = 200
+    usage = {"input_tokens": 1000, "cached_input_tokens": 800, "output_tokens": 50}
+    timing = {"spawn_ms": 5, "first_event_ms": 40, "first_token_ms": 60, "tool_ms": 100, "model_ms": 300, "exit_ms": 450}
+    t0 = time.perf_counter()
+    for i in range(n):
+        update_session(cwd, session, f"bench_{i}", "success", False, template="bench", usage=usage, timing=timing)
+    flush_storage()
+    return n / (time.perf_counter() - t0), "updates/s"
+
+
+def _parallel_case(n: int) -> Callable[[str], Tuple[float, str]]:
+    def case(cwd: str) -> Tuple[float, str]:
+        os.environ[FAKE_ENV] = SMALL
+        runs = max(n, 8)
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            results = list(pool.map(lambda _: runner.run("benchmark", provider="fake", cwd=cwd, stream=False),
+                                    range(runs)))
+        flush_storage()
+        elapsed = time.perf_counter() - t0
+        if any(r.status != "success" for r in results):
+            raise RuntimeError("fake run failed")
+        return runs / elapsed, "runs/s"
+
+    return case
+
+
+CASES: Dict[str, Callable[[str], Tuple[float, str]]] = {
+    "run_once_small": case_run_once_small,
+    "run_once_stream": case_run_once_stream,
+    "run_once_claude": case_run_once_claude,
+    "parse_codex": case_parse_codex,
+    "parse_claude": case_parse_claude,
+    "progress": case_progress,
+    "storage": case_storage,
+    "session": case_session,
+    "parallel_1": _parallel_case(1),
+    "parallel_4": _parallel_case(4),
+    "parallel_16": _parallel_case(16),
+}
+
+
+def run_cases(names: List[str], repeat: int) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory() as home:
+        # keep sessions and run archives out of the real ~/.aibaton
+        os.environ["HOME"] = home
+        os.environ["AIBATON_NO_DAEMON"] = "1"
+        for name in names:
+            best, unit = 0.0, ""
+            for i in range(repeat):
+                cwd = os.path.join(home, f"{name}_{i}")
+                os.makedirs(cwd)
+                # progress lines of the runs themselves go to a sink, not the report
+                with contextlib.redirect_stderr(io.StringIO()):
+                    value, unit = CASES[name](cwd)
+                best = max(best, value)
+            results[name] = {"value": round(best, 2), "unit": unit}
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for name, row in results.items():
+        base = (baseline.get("results") or {}).get(name)
+        if not base or not base.get("value"):
+            print(f"{name:16s} {row['value']:12.2f} {row['unit']:9s} (no baseline)")
+            continue
+        ratio = row["value"] / base["value"]
+        flag = ""
+        if ratio < 1 - tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:16s} {row['value']:12.2f} {row['unit']:9s} baseline {base['value']:12.2f}  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3, help="best of N passes per case")
+    parser.add_argument("--save", metavar="PATH", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a case fails")
+    args = parser.parse_args()
+
+    results = run_cases(args.cases, args.repeat)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+    else:
+        regressions = []
+        for name, row in results.items():
+            print(f"{name:16s} {row['value']:12.2f} {row['unit']}")
+    if args.save:
+        doc = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+            f.write("\n")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
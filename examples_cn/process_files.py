@@ -1,4 +1,4 @@
-from aibaton import run, set_default, setup_logger, logger
+from aibaton import set_default, setup_logger, logger
 
 setup_logger("process_files.log")
 set_default(provider="codex", dangerous_permissions=True)
@@ -17,32 +17,23 @@ prompt_skill = '$code-refactor'
 
 par_dir = '/app/banbot'
 
-import os
+import argparse
 
-def count_lines(filepath: str) -> int:
-    """统计文件行数"""
-    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-        return sum(1 for _ in f)
-
-def get_go_files(root_dir: str, min_lines: int = 0) -> list[str]:
-    """递归获取目录下所有 .go 文件的绝对路径，可选过滤最小行数"""
-    go_files = []
-    for dirpath, _, filenames in os.walk(root_dir):
-        for f in filenames:
-            if f.endswith('.go'):
-                fpath = os.path.join(dirpath, f)
-                if min_lines <= 0 or count_lines(fpath) > min_lines:
-                    go_files.append(fpath)
-    return go_files
+from aibaton import map_files, scan_files
 
 if __name__ == '__main__':
-    go_files = get_go_files(par_dir, min_lines=300)
-    logger.info(f"共找到 {len(go_files)} 个 Go 文件")
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shard', help='只处理该分片，如 1/4（从 1 开始）')
+    parser.add_argument('--force', action='store_true', help='未变化的文件也重新处理')
+    args = parser.parse_args()
+
+    go_files = scan_files(par_dir, '*.go', min_lines=300)
+    logger.info(f"共有 {len(go_files)} 个 Go 文件待处理")
     confirm = input("是否继续处理？(y/n): ").strip().lower()
     if confirm != 'y':
         logger.info("已取消")
         exit(0)
-    
-    for fpath in go_files:
-        logger.info(f"Processing: {fpath}")
-        run(f"文件路径: {fpath}\n\n{prompt}", cwd=par_dir, add_dirs=[par_dir], stream=True)
+
+    # 上次成功处理后内容未变的文件会被跳过
+    map_files(go_files, f"文件路径: {{path}}\n\n{prompt}", root=par_dir, name='dry-refactor',
+              shard=args.shard, force=args.force, add_dirs=[par_dir], stream=True)
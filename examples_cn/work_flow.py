@@ -1,4 +1,4 @@
-from aibaton import run, set_default, start_process, setup_logger, logger
+from aibaton import run, set_default, start_process, setup_logger, logger, ContextIndex, PromptTemplate
 import os
 
 """
@@ -11,12 +11,8 @@ base_dir = os.path.dirname(os.path.abspath(__file__))
 setup_logger(filepath="aibaton.log")
 set_default(provider="codex", dangerous_permissions=True, cwd=os.path.dirname(base_dir))
 
-gen_doc_index = """
-请帮我创建 docs/bybit_index.md 文件，这个文件应该用于描述 docs/bybit_v5 下的所有文件的路径和每个文件的简单单行介绍。
-用于AI通过此文件快速定位所需功能的路径。请使用最少的文本简要概括每个markdown文件的主要作用。
-bybit_v5下的每个文件只需读取前20~40行左右即可，每个文件都是一个接口，了解其大概作用即可。
-最后创建bybit_index.md ，减少冗余的文字，每个文件都要介绍到。应当分批进行，阅读一批，更新一次文件，然后继续阅读下一批。
-"""
+# docs/bybit_v5 下每个接口文档的单行摘要，带缓存，只重读变化的文件
+doc_index = ContextIndex(os.path.join(os.path.dirname(base_dir), "docs/bybit_v5"), "*.md")
 
 pick_plan_step = """
 @docs/help.md @docs/contribute.md  @docs/bybit_dev.md  @docs/bybit_index.md 
@@ -24,24 +20,21 @@ pick_plan_step = """
 在响应的末尾以<option>这是要实现的部分标题</option>格式输出。如果所有部分都已完成，则不要输出<option>部分。
 """
 
-run_plan_step = """
-@docs/help.md @docs/contribute.md  @docs/bybit_dev.md  @docs/bybit_index.md 
+# 共享说明放在不变的前缀里，{section} 只出现在后缀，provider 可复用前缀缓存
+run_plan_step = PromptTemplate("run_plan_step", refs=["docs/help.md", "docs/contribute.md", "docs/bybit_dev.md", "docs/bybit_index.md"], prefix="""
 目前需要对接bybit交易所，实现banexg中需要的相关接口。请根据bybit_dev.md 这个详细的实施计划，帮我开始逐步对接bybit交易所。
 根据banexg的已有接口规范和币安、okx的参考，从bybit_index中查找需要的接口，实现接口时根据接口路径从docs/bybit_v5 下阅读详细文档。
 对接过程中始终遵循DRY准则，检查是否有冗余或相似代码，有则提取公共部分，方便维护。
 确保始终遵循banexg的规范要求，和根结构体的相关规范，如果有几个交易所共同的逻辑，则提取到外部公共包的代码文件中。
-现在需要对接的部分是：{section}
-"""
+""", suffix="现在需要对接的部分是：{section}")
 
-run_plan_check = """
-@contribute.md @help.md @docs/bybit_dev.md @docs/bybit_index.md 
-目前正在对接bybit，目前已完成 {section} 部分，需要检查是否实现有错误或不完善的地方。
+run_plan_check = PromptTemplate("run_plan_check", refs=["contribute.md", "help.md", "docs/bybit_dev.md", "docs/bybit_index.md"], prefix="""
+目前正在对接bybit，下面给出的部分已完成，需要检查是否实现有错误或不完善的地方。
 请阅读banexg接口和参数要求，适当参考binance中的处理，了解哪些参数和逻辑需要处理。
 然后根据bybit_index定位接口文件路径，阅读docs/bybit_v5下的详细接口文档。
 注意一些常见重要的参数都需要支持，但部分不常用的，交易所特有的参数无需支持。可参考binance/okx等接口相关方法。
 最后把发现的需要修改或完善的地方总结给我。如果此部分的实现均正确且无缺漏，则在响应最后输出<promise>DONE</promise>。
-请注意只关注 {section} 部分。
-"""
+""", suffix="已完成的部分是：{section}\n请注意只关注 {section} 部分。")
 
 run_code_refactor = """
 使用`git status -s`查看当前修改的文件，重点对这些文件进行代码审查并优化。
@@ -53,24 +46,23 @@ run_code_refactor = """
 * 对于大部分相似但细微不同的，提取为带参数的可复用函数、组件或片段
 """
 
-run_plan_test = """
-@docs/contribute.md @docs/help.md @docs/bybit_dev.md @docs/bybit_index.md 
-目前正在对接bybit，目前已完成 {section} 部分，现在需要对这部分完善单元测试用例并确保测试通过。
+run_plan_test = PromptTemplate("run_plan_test", refs=["docs/contribute.md", "docs/help.md", "docs/bybit_dev.md", "docs/bybit_index.md"], prefix="""
+目前正在对接bybit，下面给出的部分已完成，现在需要对这部分完善单元测试用例并确保测试通过。
 单元测试需要两类：一类是简单的函数测试（不发出接口请求）；另一类是实际提交到交易所的接口测试（统一使用`TestApi_`前缀）。可参考binance中的相关单元测试；
 然后根据bybit_index定位接口文件路径，阅读docs/bybit_v5下的详细接口文档。
 首先确保第一类测试完整并全部通过，如果有错误自行分析解决，重复测试直到通过。
 然后开始第二类测试，这些测试应该使用local.json中配置的apiKey和apiSecret创建一个有效的交易所对象，然后调用实际的接口方法和交易所生产环境接口进行交互。
 第二类测试有些需要提前有仓位，可以先执行某个单元测试下单创建仓位，然后测试相关的接口。
-请注意只关注 {section} 部分。如果确信测试全部通过且均无缺漏和错误，则在响应最后输出<promise>DONE</promise>。
-"""
+如果确信测试全部通过且均无缺漏和错误，则在响应最后输出<promise>DONE</promise>。
+""", suffix="已完成的部分是：{section}\n请注意只关注 {section} 部分。")
 
 run_plan_mark = """
 @docs/bybit_dev.md 请帮我把此文档中 {section} 部分的实现标记为完成
 """
 
 
-logger.info('开始生成文档索引...')
-run(gen_doc_index)
+logger.info('更新文档索引...')
+doc_index.write(os.path.join(os.path.dirname(base_dir), "docs/bybit_index.md"))
 
 logger.info('开始生成实施计划...')
 run("""
@@ -1,4 +1,4 @@
-from aibaton import run, set_default, setup_logger, logger
+from aibaton import set_default, setup_logger, logger
 
 setup_logger("process_files.log")
 set_default(provider="codex", dangerous_permissions=True)
@@ -17,32 +17,23 @@ prompt_skill = '$code-refactor'
 
 par_dir = '/app/banbot'
 
-import os
+import argparse
 
-def count_lines(filepath: str) -> int:
-    """Count file lines"""
-    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-        return sum(1 for _ in f)
-
-def get_go_files(root_dir: str, min_lines: int = 0) -> list[str]:
-    """Recursively get absolute paths of all .go files in directory, optionally filter by minimum lines"""
-    go_files = []
-    for dirpath, _, filenames in os.walk(root_dir):
-        for f in filenames:
-            if f.endswith('.go'):
-                fpath = os.path.join(dirpath, f)
-                if min_lines <= 0 or count_lines(fpath) > min_lines:
-                    go_files.append(fpath)
-    return go_files
+from aibaton import map_files, scan_files
 
 if __name__ == '__main__':
-    go_files = get_go_files(par_dir, min_lines=300)
-    logger.info(f"Found {len(go_files)} Go files in total")
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shard', help='Shard to process, e.g. 1/4 (1-based)')
+    parser.add_argument('--force', action='store_true', help='Reprocess files that did not change')
+    args = parser.parse_args()
+
+    go_files = scan_files(par_dir, '*.go', min_lines=300)
+    logger.info(f"Found {len(go_files)} Go files to process")
     confirm = input("Continue processing? (y/n): ").strip().lower()
     if confirm != 'y':
         logger.info("Cancelled")
         exit(0)
-    
-    for fpath in go_files:
-        logger.info(f"Processing: {fpath}")
-        run(f"File path: {fpath}\n\n{prompt}", cwd=par_dir, add_dirs=[par_dir], stream=True)
+
+    # files whose content is unchanged since their last successful run are skipped
+    map_files(go_files, f"File path: {{path}}\n\n{prompt}", root=par_dir, name='dry-refactor',
+              shard=args.shard, force=args.force, add_dirs=[par_dir], stream=True)
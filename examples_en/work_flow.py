@@ -1,4 +1,4 @@
-from aibaton import run, set_default, start_process, setup_logger, logger
+from aibaton import run, set_default, start_process, setup_logger, logger, ContextIndex, PromptTemplate
 import os
 
 """
@@ -11,12 +11,8 @@ base_dir = os.path.dirname(os.path.abspath(__file__))
 setup_logger(filepath="aibaton.log")
 set_default(provider="codex", dangerous_permissions=True, cwd=os.path.dirname(base_dir))
 
-gen_doc_index = """
-Please help me create the docs/bybit_index.md file. This file should describe the paths of all files under docs/bybit_v5 and a brief single-line description of each file.
-It will be used by AI to quickly locate the path of the required functionality through this file. Please use minimal text to briefly summarize the main purpose of each markdown file.
-For each file under bybit_v5, just read the first 20~40 lines, as each file is an API endpoint and understanding its general purpose is sufficient.
-Finally, create bybit_index.md with minimal redundant text, ensuring every file is introduced. This should be done in batches: read a batch, update the file once, then continue reading the next batch.
-"""
+# One-line summary per API doc under docs/bybit_v5, cached; only changed files are re-read
+doc_index = ContextIndex(os.path.join(os.path.dirname(base_dir), "docs/bybit_v5"), "*.md")
 
 pick_plan_step = """
 @docs/help.md @docs/contribute.md  @docs/bybit_dev.md  @docs/bybit_index.md 
@@ -24,24 +20,21 @@ Currently need to integrate bybit exchange and implement relevant interfaces req
 Output in the format <option>This is the title of the part to implement</option> at the end of the response. If all parts are completed, do not output the <option> part.
 """
 
-run_plan_step = """
-@docs/help.md @docs/contribute.md  @docs/bybit_dev.md  @docs/bybit_index.md 
+# Shared instructions go in the stable prefix and {section} only in the suffix, so providers can reuse their prefix cache
+run_plan_step = PromptTemplate("run_plan_step", refs=["docs/help.md", "docs/contribute.md", "docs/bybit_dev.md", "docs/bybit_index.md"], prefix="""
 Currently need to integrate bybit exchange and implement relevant interfaces required in banexg. Please help me start integrating bybit exchange step by step according to the detailed implementation plan in bybit_dev.md.
 Based on the existing interface specifications in banexg and references from Binance and OKX, find the required interfaces from bybit_index. When implementing interfaces, read detailed documentation from docs/bybit_v5 based on the interface path.
 Always follow the DRY principle during integration, check for redundant or similar code, and extract common parts if any for easier maintenance.
 Always ensure compliance with banexg's specification requirements and related specifications of the root structure. If there is common logic for several exchanges, extract it to code files in external common packages.
-The part to integrate now is: {section}
-"""
+""", suffix="The part to integrate now is: {section}")
 
-run_plan_check = """
-@contribute.md @help.md @docs/bybit_dev.md @docs/bybit_index.md 
-Currently integrating bybit, the {section} part has been completed and needs to be checked for errors or incomplete implementation.
+run_plan_check = PromptTemplate("run_plan_check", refs=["contribute.md", "help.md", "docs/bybit_dev.md", "docs/bybit_index.md"], prefix="""
+Currently integrating bybit, the part given below has been completed and needs to be checked for errors or incomplete implementation.
 Please read the banexg interface and parameter requirements, appropriately refer to the handling in binance to understand which parameters and logic need to be handled.
 Then locate the interface file path based on bybit_index and read the detailed interface documentation under docs/bybit_v5.
 Note that some common important parameters need to be supported, but some uncommon, exchange-specific parameters do not need support. Can refer to related methods in binance/okx interfaces.
 Finally, summarize the places that need to be modified or improved. If the implementation of this part is all correct and without omissions, output <promise>DONE</promise> at the end of the response.
-Please only focus on the {section} part.
-"""
+""", suffix="The completed part is: {section}\nPlease only focus on the {section} part.")
 
 run_code_refactor = """
 Use `git status -s` to view currently modified files and focus on code review and optimization of these files.
@@ -53,24 +46,23 @@ When redundant code is found, extract it into subfunctions to ensure adherence t
 * For mostly similar but slightly different cases, extract into parameterized reusable functions, components or fragments
 """
 
-run_plan_test = """
-@docs/contribute.md @docs/help.md @docs/bybit_dev.md @docs/bybit_index.md 
-Currently integrating bybit, the {section} part has been completed. Now need to improve unit test cases for this part and ensure tests pass.
+run_plan_test = PromptTemplate("run_plan_test", refs=["docs/contribute.md", "docs/help.md", "docs/bybit_dev.md", "docs/bybit_index.md"], prefix="""
+Currently integrating bybit, the part given below has been completed. Now need to improve unit test cases for this part and ensure tests pass.
 Unit tests need two types: one is simple function tests (no API requests); the other is actual interface tests submitted to the exchange (uniformly use `TestApi_` prefix). Can refer to related unit tests in binance;
 Then locate the interface file path based on bybit_index and read the detailed interface documentation under docs/bybit_v5.
 First ensure the first type of tests are complete and all pass. If there are errors, analyze and resolve them yourself, and repeat testing until they pass.
 Then start the second type of tests. These tests should use apiKey and apiSecret configured in local.json to create a valid exchange object, then call actual interface methods to interact with the exchange production environment.
 Some of the second type of tests need prior positions, you can first execute a unit test to place orders to create positions, then test related interfaces.
-Please only focus on the {section} part. If you are confident that all tests pass without omissions or errors, output <promise>DONE</promise> at the end of the response.
-"""
+If you are confident that all tests pass without omissions or errors, output <promise>DONE</promise> at the end of the response.
+""", suffix="The completed part is: {section}\nPlease only focus on the {section} part.")
 
 run_plan_mark = """
 @docs/bybit_dev.md Please help me mark the implementation of the {section} part in this document as completed
 """
 
 
-logger.info('Starting to generate doc index...')
-run(gen_doc_index)
+logger.info('Updating doc index...')
+doc_index.write(os.path.join(os.path.dirname(base_dir), "docs/bybit_index.md"))
 
 logger.info('Starting to generate implementation plan...')
 run("""